@@ -1,7 +1,5 @@
-from datetime import datetime
-import os, sys, argparse, numpy as np, numpy
+import sys, argparse
 from pathlib import Path
-from sklearn.gaussian_process.kernels import Matern
 
 base_path = Path(__file__).parent.parent
 script_path = base_path / "Scripts"
@@ -9,144 +7,100 @@ submodule_path = base_path / "BayesianOptimization"
 if str(script_path) not in sys.path: sys.path.append(str(script_path))
 if str(submodule_path) not in sys.path: sys.path.append(str(submodule_path))
 
-from bayes_opt import BayesianOptimization, SequentialDomainReductionTransformer
-from bayes_opt.logger import JSONLogger # Log progress
-from bayes_opt.util import load_logs # Allow pause/start
-from bayes_opt.event import Events # Subscription to Optimisation events
-
-from Utils.Optimization import CaseInfo
-from Utils.Enum import Color as C, CommonDirs
-from Utils.Params import HyperParameters, SimParam
-from Utils.Case_Handling import find_simulation_parameters, swap_params, swap_duration_and_freq, update_case_file
-from Utils.Simulation import run_simulation
-from Utils.Post_Processing import sim_real_difference, plot_measurement_by_loc, extract_points
-
-OS = "win64" if os.name == "nt" else "linux64"
-TERMINATED = False # Used for error-catching
-COLUMNS = None
-SESSION_ID = datetime.now().strftime("%d_%m_%Y_%Hh_%Mm_%Ss")
-REAL_DURATION = 15.0 # In Seconds
-DELAY = 600 # In Time Steps (~120 steps per second)
-if (DELAY / 120.0) > REAL_DURATION:
-    raise ValueError("Delay too large relative to the simulation duration")
-RUN_TIMES = []
-BATCH_NO = 0 # Real data batch index to compare simulated data to
-case = CaseInfo()
-
-params, _, file_name = find_simulation_parameters(case.tree, hyp_name=None, return_name=True, record=0, verbose=False)
-SESSION_NAME = file_name.split(".")[0].split("-")[1]
-
-class TerminationObserver:
-    """Broadcasts when a Termination event is registered"""
-    def update(self, instance=None):
-        global TERMINATED
-        print(f"{C.BOLD}{C.GREEN}Info{C.END} Termination Event Registered, Stopping Maximisation")
-        TERMINATED = True
-
-class StepObserver:
-    """Logs hyper-parameter settings to file for specific Optimization step"""
-    def update(self, instance=None):
-        global COLUMNS, SESSION_NAME, SESSION_ID
-        
-        latest = instance.res[len(instance.res)-1]
-        params, target = latest["params"], latest["target"]
-        print(f"{C.BOLD}{C.GREEN}Info{C.END} Optimisation Step ({C.BOLD}Target{C.END}: {target})")
-        with open(CommonDirs.LOGS / f"{SESSION_ID}_{SESSION_NAME}_OPTIMIZATION_LOG.csv", "a+") as f:
-            if COLUMNS is None:
-                COLUMNS = [col for col in params.keys()]
-                f.write("Target," + ",".join(COLUMNS)) # Header
-            f.write(f"\n{target}," + ",".join([f"{params[col]}" for col in COLUMNS]))
-
-def objective(**kwargs):
-    global BATCH_NO, DELAY, REAL_DURATION, OS, RUN_TIMES, SESSION_NAME, SESSION_ID
-    # >> Convert Kwargs to Simulation Parameters <<
-    params = HyperParameters()
-    for SimParamStr, value in kwargs.items(): # Kwargs are ORDERED, see PEP 468
-        param = SimParam.from_slug(SimParamStr)
-        if param.type in [float, np.float16, np.float32, np.float64, np.double, np.longdouble]: # Continuous
-            params[param] = str(value) # String ensures it is serialisable
-        else:
-            params[param] = str(param.type(value)) # Cast to discrete parameter
-    swap_params(case.tree.getroot(), params)
-    swap_duration_and_freq(case.tree, duration=REAL_DURATION, freq=1.0/120.0) # Should be fixed
-    update_case_file(case.tree, case.case_def, case.case_name)
-    
-    timestamp = datetime.now().strftime("%d_%m_%Y_%Hh_%Mm_%Ss")
-    # >> Run the simulation (warning: SLOW) <<
-    duration = run_simulation(case.case_def, case.case_name, identifier=f"{SESSION_NAME}-{SESSION_ID}", 
-                             export_vtk=False, batch=BATCH_NO,
-                             os=OS, timestamp=timestamp, copy_measurements=True, verbose=False)
-    RUN_TIMES.append(duration)
-
-    measure_dir = CommonDirs.MEASURES / f"{SESSION_NAME}-{SESSION_ID}" / f"{case.case_name}-{timestamp}-Batch{BATCH_NO}"
-    file_path = measure_dir / (case.case_path.name + "_Vel.csv")
-
-    points, columns = extract_points(file_path, verbose=False)
-    
-    target = sim_real_difference(file_path, points, method="mse", delay=DELAY, batch=BATCH_NO)
-    df = sim_real_difference(file_path, points, method=None, delay=DELAY, batch=BATCH_NO)
-    plot_measurement_by_loc(df, points, save_path=file_path.parent / f"Figure.jpg", show=False) # Save Figure
-    BATCH_NO = BATCH_NO + 1
-    return target
-    
-# Use panning and zooming on initial bounds to encourage faster convergence
-# bounds_transformer = SequentialDomainReductionTransformer()
-optimizer = BayesianOptimization(    
-    f=objective, # Want to control optimisation more finely
-    pbounds=params.get_bounds(),
-    verbose=2, # verbose = 1 prints only when a maximum is observed, verbose = 0 is silent
-    random_state=1,
-    # bounds_transformer=bounds_transformer,
-)
-
-# >> Logging / Pausing <<
-log_path = CommonDirs.LOGS / f"{SESSION_ID}_{SESSION_NAME}_OPTIMIZATION_LOG.json"
-if not log_path.parent.exists():
-    log_path.parent.mkdir()
-logger = JSONLogger(path=str(log_path))
-optimizer.subscribe(Events.OPTIMIZATION_STEP, logger) 
-optimizer.subscribe(event=Events.OPTIMIZATION_STEP, subscriber=StepObserver, callback=None)
-optimizer.subscribe(event=Events.OPTIMIZATION_END, subscriber=TerminationObserver, callback=None)
-
-
-while (resp := input("Load previous session? 'Y' (yes) 'N' (no)")).strip().lower() not in ["y", "n"]:
-    continue
-if resp.strip().lower() == "y":
-    load_logs(optimizer, logs=[CommonDirs.LOGS / select_log()])
-    print(f"{C.CYAN}{C.BOLD}INFO{C.END}: Optimizer is now aware of {len(optimizer.space)} points.")  
-
-
-#  Init_points: How many steps of **random** exploration you want to perform.
-#  n_iter: How many steps of bayesian optimization you want to perform.
-init_points = max(0, 1 - len(optimizer.space)) # If previous session already explored space, don't do it again
-n_iter = 1
-no_error_recovery_attempts = 5
-
-while TERMINATED is False and no_error_recovery_attempts > 0:
-    # try:
-    optimizer.maximize(
-        init_points=init_points, 
-        n_iter=n_iter,
-        acq='ucb', # UCB: Upper Confidence Bound, EI: Expected Improvement, # POI: Probability of Improvement 
-        kappa=2.576, # High: Prefer Exploration, Low: Prefer Exploitation
-        kappa_decay=1, # Kappa is multiplied by this every iteration
-        kappa_decay_delay=0, # Wait before starting with decay
-        xi=0.0, # Used by EI and POI, 0.1=Exploration, 0.0=Exploitation
-        # Parameters for internal Gaussian Process Regressor:
-        kernel=Matern(nu=2.5), #  [Default: Mattern 2.5 kernel]. Specific to problem. Recommended not to change.
-        alpha=1e-3, # [Default 1e-6] Controls how much noise GP can handle, increase for discrete parameters. 
-        normalize_y=True, # [Default: True] Normalise mean 0 variance 1, recommended for unit-normalized priors
-        n_restarts_optimizer=5, # [Default: 5] Used to optimize kernel hyperparameters!
-    )
-    # except:
-    #    print(f"{C.BOLD}{C.RED}Warning{C.END}: Invalid hyper-parameter combination was suggested, trying again.")
-    #    n_iter = n_iter if len(optimizer.space) <= init_points else n_iter - (len(optimizer.space) - init_points)
-    #    # Ensure next suggestion is random, so we don't re-suggest the failing parameter combination
-    #    init_points = 1 if len(optimizer.space) >= init_points else init_points - len(optimizer.space) 
-    #    no_error_recovery_attempts -= 1
-
-if no_error_recovery_attempts == 0:
-    print(f"{C.BOLD}{C.RED}ERROR{C.END}: Was unable to recover from errors in Objective")
-
-print(f"{C.BOLD}Run Times (HH:MM:SS){C.END}:\n", "\n".join([f"Iter {i}: {rt}" for i, rt in enumerate(RUN_TIMES)]))
-print(f"{C.BOLD}{C.PURPLE}Max of Optimized Combinations{C.END}:\n{optimizer.max}")
\ No newline at end of file
+from Utils.Enum import CommonDirs
+from Utils.Scoring import METRICS, ALIGNED_METRICS
+
+parser = argparse.ArgumentParser(description='>> Bayesian Optimisation of Simulation Hyperparameters <<')
+parser.add_argument('-q', dest="batch_size", type=int, default=1,
+                    help='Number of trials to suggest and simulate concurrently, 0 with the CPU solver: as many as ' +
+                         'the cores and memory fit [Default: 1]')
+parser.add_argument('-s', dest="strategy", type=str, default="cl_min", choices=["cl_min", "cl_mean", "cl_max", "kb"],
+                    help='How running trials are treated when suggesting a batch (Constant Liar or Kriging Believer)')
+parser.add_argument('-n', dest="n_iter", type=int, default=1,
+                    help='Number of Bayesian Optimisation steps to perform [Default: 1]')
+parser.add_argument('--no-cache', dest="use_cache", action="store_false",
+                    help='Always simulate, even if an identical Case (Def)inition was simulated before')
+parser.add_argument('-m', dest="metric", type=str, default="mse", choices=list(METRICS) + list(ALIGNED_METRICS),
+                    help='Metric minimised, averaged over all batches of the real data [Default: mse]')
+parser.add_argument('--max-lag', dest="max_lag", type=int, default=0,
+                    help='Largest phase shift (time steps) between simulated and real data that aligned metrics ' +
+                         'compensate for, using FFT cross-correlation per point [Default: 0]')
+parser.add_argument('-p', dest="prune", type=str, default="none", choices=["none", "median", "threshold"],
+                    help='Stop running simulations early whose partial error is worse than the median of previous ' +
+                         'trials, or worse than a multiple of the best error so far [Default: none]')
+parser.add_argument('--prune-factor', dest="prune_factor", type=float, default=3.0,
+                    help='Multiple of the best error above which the threshold rule prunes a trial [Default: 3.0]')
+parser.add_argument('-f', dest="fidelity", type=str, default="none", choices=["none", "sh", "hyperband"],
+                    help='Multi-fidelity mode: screen candidates with short simulations and only promote the best ' +
+                         'to longer ones, using successive halving or Hyperband [Default: none]')
+parser.add_argument('--min-duration', dest="min_duration", type=float, default=None,
+                    help='Simulated duration (s) of the lowest fidelity, must exceed the delay ' +
+                         '[Default: REAL_DURATION / eta^2, at least 1s more than the delay]')
+parser.add_argument('--eta', dest="eta", type=int, default=3,
+                    help='Factor by which candidates are reduced and durations grow between fidelities [Default: 3]')
+parser.add_argument('--candidates', dest="candidates", type=int, default=9,
+                    help='Number of candidates at the lowest fidelity (successive halving only) [Default: 9]')
+parser.add_argument('--coarsen', dest="coarsen", type=float, default=1.0,
+                    help='Particle spacing (dp) multiplier per fidelity below the highest [Default: 1.0, unchanged]')
+parser.add_argument('--surrogate', dest="surrogate", type=str, default="dense", choices=["dense", "incremental"],
+                    help='Gaussian Process refit from scratch every step, or updated incrementally (with inducing ' +
+                         'points for large histories) so suggestions stay fast [Default: dense]')
+parser.add_argument('--cost', dest="cost", type=str, default="none", choices=["none", "eips"],
+                    help='Weigh suggestions by their predicted run time (a model fitted on the run times of this and ' +
+                         "earlier sessions' trials): expected improvement per second [Default: none]")
+parser.add_argument('--cost-weight', dest="cost_weight", type=float, default=1.0,
+                    help='Exponent of the predicted run time, lower values prefer cheap settings less [Default: 1.0]')
+parser.add_argument('--acceptable', dest="acceptable", type=float, default=0.1,
+                    help='Relative error above the best at which the fastest acceptable settings are reported ' +
+                         '[Default: 0.1]')
+parser.add_argument('--trace', dest="trace", action="store_true",
+                    help='Time every phase of every trial (patching, solver, copying, scoring, plotting) and save a ' +
+                         'Chrome trace (chrome://tracing) and summary table to Logs/')
+parser.add_argument('--queue', dest="queue", type=Path, default=None,
+                    help='Work queue directory on a file system shared with workers (python Worker.py serve DIR), ' +
+                         'which then simulate and score the trials. Use -q to keep several running')
+parser.add_argument('--lease', dest="lease", type=float, default=120.0,
+                    help='Seconds a worker may stay silent before its trial is given to another worker [Default: 120]')
+parser.add_argument('-d', dest="device", type=str, default="GPU", choices=["GPU", "CPU"],
+                    help="Solver variant, launch script '<case>_<os>_<device>'. Concurrent CPU trials are pinned to " +
+                         "disjoint cores [Default: GPU]")
+parser.add_argument('-t', dest="threads", type=int, default=None,
+                    help='OpenMP threads per CPU trial [Default: the usable cores split between concurrent trials]')
+parser.add_argument('-c', dest="case", type=str, default=None,
+                    help='Name of the case to optimise [Default: choose interactively]')
+parser.add_argument('-k', dest="contract", type=str, default=None,
+                    help='Hyperparameter contract file in HyperParameters/ [Default: choose interactively]')
+parser.add_argument('-r', dest="resume", type=str, default=None,
+                    help="'new', 'latest' or a log file name in Logs/ [Default: ask]")
+if __name__ == "__main__": # Importing this file (e.g. from a worker) neither prompts nor loads the optimiser
+    args = parser.parse_args()
+    # Heavy (sklearn, bayes_opt, ...), loaded once the arguments are valid
+    from Utils.Optimization import CaseInfo
+    from Utils.Case_Handling import find_simulation_parameters
+    from Utils.Study import Study, study_settings
+    from Utils.Interaction import select_log
+
+    settings = study_settings(case=args.case, contract=args.contract, budget=dict(n_iter=args.n_iter, init_points=1),
+                              metric=args.metric,
+                              batch_size=args.batch_size if args.batch_size > 0 else "auto", strategy=args.strategy,
+                              use_cache=args.use_cache, max_lag=args.max_lag, prune=args.prune,
+                              prune_factor=args.prune_factor, fidelity=args.fidelity, min_duration=args.min_duration,
+                              eta=args.eta, candidates=args.candidates, coarsen=args.coarsen,
+                              surrogate=args.surrogate, trace=args.trace,
+                              queue=args.queue, lease=args.lease, device=args.device, threads=args.threads,
+                              cost=args.cost, cost_weight=args.cost_weight, acceptable=args.acceptable)
+    case = CaseInfo(case_name=args.case)
+    params, _, file_name = find_simulation_parameters(
+        case.tree, hyp_name=CommonDirs.HYPERPARAMS / args.contract if args.contract else None,
+        return_name=True, record=0, verbose=False)
+    SESSION_NAME = file_name.split(".")[0].split("-")[1]
+    study = Study(case, params, SESSION_NAME, settings=settings)
+
+    resume = args.resume
+    if resume is None:
+        while (resp := input("Load previous session? 'Y' (yes) 'N' (no)")).strip().lower() not in ["y", "n"]:
+            continue
+        resume = [select_log()] if resp.strip().lower() == "y" else "new"
+
+    study.run(resume=resume)
+    study.report()
@@ -0,0 +1,223 @@
+import sys, json, time, shutil, platform, argparse, tempfile, statistics, subprocess, numpy as np
+from pathlib import Path
+
+bench_path = Path(__file__).parent
+script_path = bench_path.parent
+for path in [script_path, bench_path]:
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
+
+from Utils.Enum import Color as C, CommonDirs
+import Fake_Solver
+
+BASELINES = bench_path / "baselines.json"
+CASE = "TestCase"
+PARAMS = [("Visco", 0.001, 0.1), ("ViscoBoundFactor", 0.5, 2.0), ("DensityDTvalue", 0.01, 0.5), ("CoefDtMin", 0.01, 0.1)]
+
+parser = argparse.ArgumentParser(description='>> Per-trial orchestration overhead, measured with a fake solver <<')
+parser.add_argument('--save', dest="save", action="store_true",
+                    help=f'Store the results as the new baselines ({BASELINES.name})')
+parser.add_argument('--only', dest="only", type=str, nargs='+', default=None,
+                    help='Run only benchmarks whose name starts with one of these')
+parser.add_argument('--trials', dest="trials", type=int, nargs='+', default=[1, 4, 16],
+                    help='Trial counts of the end-to-end objective benchmark [Default: 1 4 16]')
+parser.add_argument('--runtime', dest="runtime", type=float, default=0.0,
+                    help='Wall-clock seconds each fake simulation takes [Default: 0]')
+parser.add_argument('--tolerance', dest="tolerance", type=float, default=1.5,
+                    help='Slowdown relative to the baseline reported as a regression [Default: 1.5]')
+parser.add_argument('--trace', dest="trace", action="store_true",
+                    help='Trace the end-to-end trials and print where their time goes (see Utils/Tracing.py)')
+parser.add_argument('--keep', dest="keep", action="store_true", help='Keep the sandbox directory')
+
+def sandbox(root, runtime):
+    """Redirects every common directory into 'root', with a copy of the case running the fake solver and synthetic
+    real data. Must run before other Utils modules are imported, some of them bind these paths as defaults."""
+    case_src = CommonDirs.CASES / CASE
+    for name in ["MEASURES", "REAL", "LOGS", "HYPERPARAMS", "CACHE", "STUDIES", "CASES"]:
+        setattr(CommonDirs, name, root / name.title())
+    shutil.copytree(case_src, CommonDirs.CASES / CASE, ignore=shutil.ignore_patterns("*_out", "*.sh", "*.bat"))
+    Fake_Solver.install(CommonDirs.CASES / CASE, CASE, runtime=runtime)
+    Fake_Solver.write_real_data(CommonDirs.REAL)
+
+def measure(fn, repeat=5, setup=None):
+    """Median wall-clock seconds of 'fn(setup())' over 'repeat' runs (setup is not timed)"""
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        fn(arg) if setup is not None else fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def startup(bench, results):
+    """Startup time of each worker role (see Worker.py), next to importing a full Study. Also counts the heavy packages
+    a role imports beyond what the interpreter itself loads (e.g. through sitecustomize), which should stay 0."""
+    worker = script_path / "Worker.py"
+    probe = f"import sys, json; sys.path.insert(0, {str(script_path)!r}); from Worker import HEAVY; " + \
+             "print(json.dumps([name for name in HEAVY if name in sys.modules]))"
+    preloaded = set(json.loads(subprocess.run([sys.executable, "-c", probe], capture_output=True, check=True).stdout))
+    heavy = {}
+    for role in ["run", "score", "plot"]:
+        command = [sys.executable, str(worker), role, "--imports-only"]
+        bench(f"startup_{role}", lambda: heavy.update({role: subprocess.run(command, capture_output=True, check=True)}),
+              repeat=5)
+        if role in heavy:
+            extra = set(json.loads(heavy[role].stdout.splitlines()[-1])["heavy"]) - preloaded
+            results[f"startup_{role}_heavy"] = len(extra)
+            if extra:
+                print(f"{C.BOLD}{C.RED}Warning{C.END}: Worker role '{role}' imports {sorted(extra)}")
+    bench("startup_study", lambda: subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0, "
+                                                   f"{str(script_path)!r}); import Utils.Study"], check=True), repeat=3)
+
+def run(args):
+    # Imported only now, see 'sandbox'
+    from Utils.Optimization import CaseInfo
+    from Utils.Params import HyperParameters, SimParam
+    from Utils.Case_Handling import parse_case, swap_params, swap_duration_and_freq, update_case_file
+    from Utils.Bindings import CaseTemplate
+    from Utils.Workspace import TrialWorkspace
+    from Utils.Simulation import run_simulation
+    from Utils.Storage import ingest_measurements
+    from Utils.Post_Processing import extract_points, sim_real_difference, plot_measurement_by_loc
+    from Utils.Scoring import load_simulated, comparison_frame
+    from Utils.Rendering import RenderQueue, render_comparison
+    from Utils.Study import Study, study_settings
+    from Utils.Tracing import span, enable, disable
+
+    case = CaseInfo(CASE)
+    params = HyperParameters(*[SimParam("./execution/parameters/parameter", "value", default=case.tree.getroot().find(
+                 f".//parameter[@key='{key}']").get("value"), bound=(np.float64(lo), np.float64(hi)), sec_key=("key", key))
+                               for key, lo, hi in PARAMS], use_defaults=True)
+    tree = parse_case(case.case_path)[1]
+    swap_duration_and_freq(tree, duration=15.0)
+    template = CaseTemplate(tree, list(params.keys()))
+    scratch = CommonDirs.CASES.parent / "Scratch"
+    scratch.mkdir()
+    results = {}
+
+    def bench(name, fn, repeat=5, setup=None):
+        if args.only is None or any(name.startswith(prefix) for prefix in args.only):
+            results[name] = measure(fn, repeat=repeat, setup=setup)
+            print(f"{name:<28} {1e3 * results[name]:10.3f} ms")
+    # >> Worker startup <<
+    startup(bench, results)
+
+    def workspace():
+        ws = TrialWorkspace(case.case_def, CASE, trial_id=f"Bench{time.perf_counter_ns()}").create()
+        ws.write_case(template.render(params))
+        return ws
+
+    # >> Tracing, per 1000 spans (should be negligible while disabled) <<
+    def spans():
+        for _ in range(1000):
+            with span("bench"):
+                pass
+    bench("span_disabled", spans, repeat=20)
+    enable()
+    bench("span_enabled", spans, repeat=20)
+    disable()
+
+    # >> Case handling <<
+    bench("parse_case", lambda: parse_case(case.case_path), repeat=20)
+    bench("swap_params", lambda: swap_params(tree.getroot(), params), repeat=50)
+    bench("render_case", lambda: template.render(params), repeat=200)
+    bench("write_case", lambda _: update_case_file(tree, scratch / f"{CASE}_Def.xml", CASE), repeat=20,
+          setup=lambda: shutil.copyfile(case.case_def, scratch / f"{CASE}_Def.xml"))
+    bench("workspace", lambda: workspace().cleanup(), repeat=10)
+
+    # >> Runner (fake solver) and measurements <<
+    ran = []
+    def simulate(ws):
+        run_simulation(ws.case_def, CASE, identifier="Bench-Runner", os="linux64" if sys.platform != "win32" else "win64",
+                       copy_measurements=False, verbose=False, sudo=False)
+        ran.append(ws)
+    bench("run_simulation", simulate, repeat=5, setup=workspace)
+    if not ran: # Later benchmarks need one simulated output
+        simulate(workspace())
+    out_dir = ran[-1].out_path / "measurements"
+    csv_path = out_dir / f"{CASE}_Vel.csv"
+    bench("copy_measurements_raw", lambda dest: shutil.copytree(out_dir, dest), repeat=10,
+          setup=lambda: scratch / f"raw{time.perf_counter_ns()}")
+    bench("ingest_measurements", lambda dest: ingest_measurements(out_dir, dest), repeat=10,
+          setup=lambda: scratch / f"table{time.perf_counter_ns()}")
+    table_dir = ingest_measurements(out_dir, scratch / "table")
+    bench("extract_points_csv", lambda: extract_points(csv_path, verbose=False), repeat=50)
+    bench("extract_points_table", lambda: extract_points(table_dir / csv_path.name, verbose=False), repeat=50)
+    points = extract_points(csv_path, verbose=False)[0]
+    bench("sim_real_difference_csv", lambda: sim_real_difference(csv_path, points, method="mse", delay=600), repeat=20)
+    bench("sim_real_difference_table", lambda: sim_real_difference(table_dir / csv_path.name, points, method="mse",
+                                                                   delay=600), repeat=20)
+
+    # >> Plotting <<
+    sim = load_simulated(csv_path, points, delay=600)
+    df = comparison_frame(sim, points, batch=0)
+    bench("plot_direct", lambda: plot_measurement_by_loc(df, points, save_path=scratch / "Figure.jpg", show=False),
+          repeat=3)
+    queue = RenderQueue(workers=1, max_pending=64)
+    bench("plot_queued", lambda: render_comparison(sim, points, batch=0, save_path=scratch / "Queued.jpg", queue=queue),
+          repeat=10)
+    queue.wait()
+    queue.close()
+    for ws in ran:
+        ws.cleanup()
+
+    # >> End to end: objective per trial, and how it scales with the number of trials <<
+    if args.only is None or any("objective".startswith(prefix) or prefix.startswith("objective") for prefix in args.only):
+        study = Study(case, params, "Bench", settings=study_settings(use_cache=False, sudo=False, trace=args.trace), verbose=False)
+        vectors = np.random.default_rng(0).uniform([lo for _, lo, _ in PARAMS], [hi for _, _, hi in PARAMS],
+                                                   size=(max(args.trials), len(PARAMS)))
+        keys = [repr(param) for param in params.keys()]
+        for n in args.trials:
+            start = time.perf_counter()
+            for vector in vectors[:n]:
+                study.objective(**dict(zip(keys, vector)))
+            study.renderer.wait() # Figures of these trials count too, they share the CPU with the next trials
+            results[f"objective_per_trial@{n}"] = (time.perf_counter() - start) / n
+            print(f"{f'objective_per_trial@{n}':<28} {1e3 * results[f'objective_per_trial@{n}']:10.3f} ms")
+        if len(args.trials) > 1: # Per-trial cost should not grow with the number of trials (ratio, not seconds)
+            results["objective_scaling"] = results[f"objective_per_trial@{max(args.trials)}"] / \
+                                           results[f"objective_per_trial@{min(args.trials)}"]
+            print(f"{'objective_scaling':<28} {results['objective_scaling']:10.3f} x")
+        if study.tracer is not None:
+            print(f"\n{study.tracer.format_summary()}")
+    return results
+
+def compare(results, baselines, tolerance):
+    """Prints each result next to its baseline. Returns (list): Names of regressed benchmarks"""
+    regressed = []
+    print(f"\n{C.BOLD}{'Benchmark':<28} {'Baseline':>12} {'Now':>12} {'Ratio':>7}{C.END}")
+    for name, value in results.items():
+        base = baselines.get(name)
+        if base is None:
+            print(f"{name:<28} {'-':>12} {value:12.6f} {'new':>7}")
+            continue
+        ratio = value / base if base > 0 else 1.0 if value == base else float("inf")
+        slack = 0.0 if name == "objective_scaling" else 1e-3 # Ignore sub-millisecond jitter
+        bad = value > base * tolerance and value - base > slack
+        regressed += [name] if bad else []
+        status = f"{C.RED}{ratio:7.2f}{C.END}" if bad else f"{ratio:7.2f}"
+        print(f"{name:<28} {base:12.6f} {value:12.6f} {status}")
+    return regressed
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    root = Path(tempfile.mkdtemp(prefix="DSPH-Bench-"))
+    try:
+        sandbox(root, args.runtime)
+        results = run(args)
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+        else:
+            print(f"Sandbox kept at {root}")
+    stored = json.loads(BASELINES.read_text()) if BASELINES.exists() else {"results": {}}
+    regressed = compare(results, stored["results"], args.tolerance)
+    if args.save:
+        stored = {"machine": platform.platform(), "processor": platform.processor() or platform.machine(),
+                  "python": platform.python_version(), "runtime": args.runtime,
+                  "results": {**stored["results"], **results}}
+        BASELINES.write_text(json.dumps(stored, indent=4) + "\n")
+        print(f"{C.BOLD}{C.GREEN}Info{C.END} Baselines saved to {BASELINES}")
+    elif regressed:
+        print(f"{C.BOLD}{C.RED}Regression{C.END} in {', '.join(regressed)} (more than {args.tolerance}x the baseline)")
+        sys.exit(1)
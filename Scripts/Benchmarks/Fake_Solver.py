@@ -0,0 +1,108 @@
+"""
+Stand-in for DualSPHysics (plus MeasureTool), for measuring this project's orchestration overhead without the solver
+or a GPU. 'install' writes '<case>_<os>_GPU' and '<case>_<os>_CPU' launch scripts into a case directory that run this
+file instead. Like the real scripts, it runs in the case directory, reads the duration ('TimeMax') and output
+interval ('TimeOut') from '<case>_Def.xml', and writes '<case>_out/measurements/<case>_Vel.csv' progressively over the
+requested wall-clock runtime. Velocities follow a simple flume model (mean flow, vortex shedding, AR(1) turbulence)
+whose mean depends on the case's 'Visco', so optimising against 'write_real_data' recordings has a true optimum.
+
+Only the standard library is used, so starting the fake solver costs about as little as starting a shell script.
+"""
+import sys, math, time, random, argparse
+from pathlib import Path
+from xml.etree.ElementTree import parse
+
+VISCO_REF = 0.01 # Viscosity at which the fake solver reproduces the synthetic real data
+FREQ = 120.0 # Hz, sampling frequency of the real data
+POINTS = [(4.0, 0.5, 0.3), (4.0, 0.5, 1.0), (6.0, 0.5, 0.3), (6.0, 0.5, 1.0)] # Bottom/Middle at 4m and 6m upstream
+
+def velocity(point, times, visco=VISCO_REF, noise=0.02, seed=0):
+    """X velocity (m/s) at a point over time: mean flow slowed by viscosity, vortex shedding and AR(1) turbulence"""
+    rng = random.Random(seed)
+    x, _, z = point
+    mean = (0.25 + 0.1 * z) * (1.0 - 4.0 * (visco - VISCO_REF))
+    freq, phase = 0.5 + 0.05 * x, 0.7 * x # Shedding frequency (Hz) and phase differ per location
+    u, out = 0.0, []
+    for t in times:
+        u = 0.9 * u + noise * rng.gauss(0.0, 1.0)
+        out.append(mean + 0.05 * math.sin(2.0 * math.pi * freq * t + phase) + u)
+    return out
+
+def write_real_data(real_dir, points=POINTS, duration=120.0, noise=0.02, seed=1, depth=1000):
+    """Synthetic LDV recordings ('Data_Depth<depth>mm_Upstream<x>m_<height>.txt', tab-separated Time and Velocity)
+    for the given points, matching what the fake solver simulates at the reference viscosity.
+    Returns (list): Paths of the written recordings"""
+    real_dir = Path(real_dir)
+    real_dir.mkdir(parents=True, exist_ok=True)
+    times = [i / FREQ for i in range(int(duration * FREQ))]
+    paths = []
+    for i, point in enumerate(points):
+        height = "Bottom" if point[2] < 0.8 else "Top" if point[2] > 1.2 else "Middle" # See Real_Data.height_label
+        path = real_dir / f"Data_Depth{depth}mm_Upstream{int(point[0])}m_{height}.txt"
+        u = velocity(point, times, noise=noise, seed=seed + i)
+        path.write_text("".join(f"{t:.5f}\t{v:.5f}\n" for t, v in zip(times, u)))
+        paths.append(path)
+    return paths
+
+def install(case_dir, case_name, runtime=0.0, noise=0.02, points=POINTS, seed=0):
+    """Writes launch scripts running the fake solver into a case directory (or trial workspace template).
+    runtime (float): Wall-clock seconds the fake simulation takes [Default: 0.0]
+    noise (float): Standard deviation of the turbulence increments (m/s) [Default: 0.02]
+    Returns (list): Paths of the written scripts"""
+    case_dir = Path(case_dir)
+    args = f'--case "{case_name}" --runtime {runtime} --noise {noise} --seed {seed} ' + \
+           f'--points "{";".join(",".join(str(c) for c in point) for point in points)}"'
+    scripts = []
+    for device in ["GPU", "CPU"]:
+        sh, bat = case_dir / f"{case_name}_linux64_{device}.sh", case_dir / f"{case_name}_win64_{device}.bat"
+        sh.write_text(f'#!/bin/sh\n# Stand-in for DualSPHysics, see {Path(__file__).name}\n'
+                      f'exec "{sys.executable}" "{Path(__file__).resolve()}" {args} "$@"\n')
+        sh.chmod(0o755)
+        bat.write_text(f'@echo off\nrem Stand-in for DualSPHysics, see {Path(__file__).name}\n'
+                       f'"{sys.executable}" "{Path(__file__).resolve()}" {args} %*\n')
+        scripts += [sh, bat]
+    return scripts
+
+def _parameter(root, key, default):
+    node = root.find(f".//parameters/parameter[@key='{key}']")
+    return float(node.get("value")) if node is not None else default
+
+def simulate(case_name, runtime=0.0, noise=0.02, points=POINTS, seed=0, chunks=20):
+    """Runs the fake simulation of the case in the working directory. Returns (Path): The written MeasureTool CSV"""
+    root = parse(f"{case_name}_Def.xml").getroot()
+    duration, interval = _parameter(root, "TimeMax", 1.0), _parameter(root, "TimeOut", 1.0 / FREQ)
+    visco = _parameter(root, "Visco", VISCO_REF)
+    times = [i * interval for i in range(int(round(duration / interval)) + 1)]
+    # Velocity of every point, with the (small) Y and Z components of the flow
+    columns = []
+    for i, point in enumerate(points):
+        columns += [velocity(point, times, visco, noise, seed + i),
+                    velocity((point[0], 0.0, 0.0), times, 0.0, noise / 2, seed + 100 + i),
+                    velocity((point[0], 0.0, 0.0), times, 0.0, noise / 2, seed + 200 + i)]
+    out_dir = Path(f"{case_name}_out") / "measurements"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    csv_path = out_dir / f"{case_name}_Vel.csv"
+    with open(csv_path, "w") as f:
+        f.write("PointsPos;;" + ";".join(f"{c:g}" for point in points for c in point) + "\n")
+        f.write("Part;Time [s];" + ";".join(f"Vel_{i}.{axis} [m/s]" for i in range(len(points)) for axis in "xyz") + "\n")
+        step = max(1, math.ceil(len(times) / chunks))
+        for start in range(0, len(times), step): # Written progressively, like the real output
+            if runtime > 0:
+                time.sleep(runtime / chunks)
+            for row in range(start, min(start + step, len(times))):
+                values = [0.0] * len(columns) if row == 0 else [column[row] for column in columns] # 1st step is empty
+                f.write(f"{row};{times[row]:.6f};" + ";".join(f"{v:.6f}" for v in values) + "\n")
+            f.flush()
+    return csv_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='>> Fake DualSPHysics solver <<')
+    parser.add_argument('export_vtk', nargs='?', default="0", help='Ignored, as passed to the real launch scripts')
+    parser.add_argument('--case', dest="case", type=str, required=True, help='Case name')
+    parser.add_argument('--runtime', dest="runtime", type=float, default=0.0, help='Wall-clock seconds [Default: 0]')
+    parser.add_argument('--noise', dest="noise", type=float, default=0.02, help='Turbulence (m/s) [Default: 0.02]')
+    parser.add_argument('--seed', dest="seed", type=int, default=0, help='Random seed [Default: 0]')
+    parser.add_argument('--points', dest="points", type=str, default=None, help='"x,y,z;x,y,z;..." [Default: POINTS]')
+    args = parser.parse_args()
+    points = [tuple(float(c) for c in point.split(",")) for point in args.points.split(";")] if args.points else POINTS
+    simulate(args.case, runtime=args.runtime, noise=args.noise, points=points, seed=args.seed)
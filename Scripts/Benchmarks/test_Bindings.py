@@ -0,0 +1,83 @@
+"""
+Checks that Case (Def)initions rendered from a template (Utils/Bindings.py) are byte-identical to swapping the same
+values into the tree and writing it, as 'swap_params' and 'update_case_file' do. Uses the benchmark case, read only.
+Run directly or with pytest:
+    python Scripts/Benchmarks/test_Bindings.py
+"""
+import io, sys, copy, unittest
+import numpy as np
+from pathlib import Path
+
+script_path = Path(__file__).parent.parent
+if str(script_path) not in sys.path:
+    sys.path.append(str(script_path))
+
+from Utils.Enum import CommonDirs
+from Utils.Params import HyperParameters, SimParam, ParamSpace
+from Utils.Case_Handling import parse_case, swap_params, swap_duration_and_freq
+from Utils.Bindings import CaseTemplate
+
+CASE = "TestCase"
+FLOATS = [("Visco", 0.001, 0.1), ("ViscoBoundFactor", 0.5, 2.0), ("DensityDTvalue", 0.01, 0.5), ("CoefDtMin", 0.01, 0.1)]
+INTEGERS = [("VerletSteps", 10, 80), ("StepAlgorithm", 1, 2)] # Discrete values are cast before they are written
+
+def param(tree, key, lo, hi):
+    node = tree.getroot().find(f".//parameter[@key='{key}']")
+    return SimParam("./execution/parameters/parameter", "value", default=node.get("value"), bound=(lo, hi),
+                    sec_key=("key", key))
+
+def written(tree, params, values):
+    """Case (Def)inition as written after swapping 'values' into a copy of 'tree'"""
+    tree = copy.deepcopy(tree)
+    point = HyperParameters(*params, use_defaults=True)
+    point.set_with_vector(list(values))
+    swap_params(tree, point)
+    out = io.BytesIO()
+    tree.write(out, method="xml") # As 'update_case_file' does
+    return out.getvalue()
+
+class CaseTemplateTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tree = parse_case(CommonDirs.CASES / CASE)[1]
+        swap_duration_and_freq(cls.tree, duration=15.0)
+        cls.params = [param(cls.tree, key, np.float64(lo), np.float64(hi)) for key, lo, hi in FLOATS] + \
+                     [param(cls.tree, key, np.int64(lo), np.int64(hi)) for key, lo, hi in INTEGERS]
+        cls.template = CaseTemplate(cls.tree, cls.params)
+        cls.rng = np.random.default_rng(0)
+
+    def vectors(self, n):
+        """Random points within the bounds, as suggested by the optimizer (floats, also for discrete parameters)"""
+        bounds = np.array([param.bounds for param in self.params], dtype=np.float64)
+        return self.rng.uniform(bounds[:, 0], bounds[:, 1], size=(n, len(self.params)))
+
+    def cast(self, vector):
+        return [param.type(value) for param, value in zip(self.params, vector)]
+
+    def test_defaults(self):
+        self.assertEqual(self.template.render(self.template.defaults),
+                         written(self.tree, self.params, self.template.defaults))
+
+    def test_render(self):
+        for vector in self.vectors(25):
+            vector = self.cast(vector)
+            self.assertEqual(self.template.render(vector), written(self.tree, self.params, vector))
+            point = {repr(param): value for param, value in zip(self.params, vector)} # As logged, keyed on slugs
+            self.assertEqual(self.template.render(point), written(self.tree, self.params, vector))
+
+    def test_render_many(self):
+        vectors = self.vectors(25)
+        for xml, vector in zip(self.template.render_many(vectors), vectors):
+            self.assertEqual(xml, written(self.tree, self.params, self.cast(vector)))
+
+    def test_param_space(self):
+        """Values of a suggestion as the study writes them (see 'ParamSpace.strings')"""
+        space = ParamSpace(self.params)
+        for vector in self.vectors(25):
+            suggestion = {repr(param): value for param, value in zip(self.params, vector)}
+            self.assertEqual(self.template.render(space.strings(suggestion)),
+                             written(self.tree, self.params, self.cast(vector)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Checks the incremental Gaussian Process (Utils/Surrogate.py) against sklearn's GaussianProcessRegressor with the same
+kernel: exact after appending observations, within tolerance once inducing points are used. Run directly or with pytest:
+    python Scripts/Benchmarks/test_Surrogate.py
+"""
+import sys, warnings, unittest
+import numpy as np
+from pathlib import Path
+
+script_path = Path(__file__).parent.parent
+if str(script_path) not in sys.path:
+    sys.path.append(str(script_path))
+
+from sklearn.gaussian_process import GaussianProcessRegressor
+from Utils.Surrogate import IncrementalGP
+
+def objective(X):
+    """Smooth target over the unit square, roughly the shape of a simulation's score"""
+    return -np.sum((X - 0.3)**2, axis=1) + 0.2 * np.sin(6 * X[:, 0]) * np.cos(4 * X[:, 1])
+
+def reference(gp, X, y):
+    """Exact GP with the (fixed) kernel hyperparameters of 'gp'"""
+    return GaussianProcessRegressor(kernel=gp.kernel_, alpha=gp.alpha, normalize_y=gp.normalize_y,
+                                    optimizer=None).fit(X, y)
+
+class IncrementalGPTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.X = rng.uniform(size=(400, 2))
+        self.y = objective(self.X)
+        self.X_test = rng.uniform(size=(50, 2))
+        warnings.simplefilter("ignore") # Sklearn warns about hyperparameters close to their bounds
+
+    def tearDown(self):
+        warnings.resetwarnings()
+
+    def test_dense_appends(self):
+        gp = IncrementalGP(random_state=0, n_restarts_optimizer=0, refit_every=100)
+        for n in range(30, 56, 5): # Below the doubling that re-optimises the kernel, so the factor is extended
+            gp.fit(self.X[:n], self.y[:n])
+            exact = reference(gp, self.X[:n], self.y[:n])
+            mean, std = gp.predict(self.X_test, return_std=True)
+            exact_mean, exact_std = exact.predict(self.X_test, return_std=True)
+            np.testing.assert_allclose(mean, exact_mean, rtol=1e-6, atol=1e-8)
+            np.testing.assert_allclose(std, exact_std, rtol=1e-4, atol=1e-6)
+            np.testing.assert_allclose(gp.predict(self.X_test, return_cov=True)[1],
+                                       exact.predict(self.X_test, return_cov=True)[1], rtol=1e-4, atol=1e-8)
+        self.assertFalse(gp.sparse_)
+        self.assertEqual(gp._opt_n, 30) # Fitted once, every later fit appended
+
+    def test_sparse_tolerance(self):
+        gp = IncrementalGP(random_state=0, n_restarts_optimizer=0, refit_every=1000, sparse_threshold=200,
+                           n_inducing=100)
+        gp.fit(self.X[:250], self.y[:250])
+        for n in [250, 300, 400]: # Appended to the inducing point statistics
+            gp.fit(self.X[:n], self.y[:n])
+            self.assertTrue(gp.sparse_)
+            exact = reference(gp, self.X[:n], self.y[:n])
+            mean, std = gp.predict(self.X_test, return_std=True)
+            exact_mean, exact_std = exact.predict(self.X_test, return_std=True)
+            scale = np.std(self.y[:n])
+            self.assertLess(np.max(np.abs(mean - exact_mean)), 0.02 * scale)
+            self.assertLess(np.max(np.abs(std - exact_std)), 0.02 * scale)
+        self.assertEqual(gp._opt_n, 250)
+
+    def test_sparse_all_inducing(self):
+        """With every observation an inducing point, the approximation is the exact GP"""
+        gp = IncrementalGP(random_state=0, n_restarts_optimizer=0, sparse_threshold=200, n_inducing=250)
+        gp.fit(self.X[:250], self.y[:250])
+        self.assertTrue(gp.sparse_)
+        exact = reference(gp, self.X[:250], self.y[:250])
+        mean, std = gp.predict(self.X_test, return_std=True)
+        exact_mean, exact_std = exact.predict(self.X_test, return_std=True)
+        scale = np.std(self.y[:250])
+        self.assertLess(np.max(np.abs(mean - exact_mean)), 1e-3 * scale)
+        self.assertLess(np.max(np.abs(std - exact_std)), 1e-3 * scale)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+"""
+Localhost checks of the shared-directory work queue (Utils/Work_Queue.py): coordinator, workers and dead workers all
+run as threads of one process against a temporary queue directory. Run directly or with pytest:
+    python Scripts/Benchmarks/test_Work_Queue.py
+"""
+import os, sys, time, tempfile, threading, unittest
+from pathlib import Path
+
+script_path = Path(__file__).parent.parent
+if str(script_path) not in sys.path:
+    sys.path.append(str(script_path))
+
+from Utils import Work_Queue
+from Utils.Work_Queue import WorkQueue, RemoteTrialFailed, serve
+
+def expire(queue, trial_id):
+    """Backdates a lease so the next 'requeue_expired' treats it as abandoned"""
+    path = queue.path / "leased" / f"{trial_id}.json"
+    old = time.time() - 10 * queue.lease
+    os.utime(path, (old, old))
+
+def states(queue, trial_id):
+    """States (pending / leased / done) holding the trial, should always be exactly one until it is polled"""
+    return [state for state in Work_Queue.STATES if (queue.path / state / f"{trial_id}.json").exists()]
+
+class WorkQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.queue = WorkQueue(self.dir.name, lease=60.0, max_attempts=3)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_claim_and_complete(self):
+        self.queue.submit("T0", {"x": 1})
+        lease = self.queue.claim("w0")
+        self.assertEqual((lease.item["x"], lease.item["attempt"]), (1, 1))
+        self.assertIsNone(self.queue.claim("w1")) # Nothing else pending
+        self.assertTrue(lease.renew())
+        self.assertTrue(self.queue.complete(lease, {"target": 2.0}))
+        self.assertEqual(self.queue.poll("T0")["target"], 2.0)
+        self.assertEqual(self.queue.counts(), {"pending": 0, "leased": 0, "done": 0})
+
+    def test_claim_while_requeueing(self):
+        """A worker claiming the trial in the middle of 'requeue_expired' keeps its lease"""
+        self.queue.submit("T0", {})
+        dead = self.queue.claim("dead")
+        expire(self.queue, "T0")
+        other, claimed = WorkQueue(self.queue.path, lease=60.0), []
+        write = Work_Queue._write_json
+        def interleaved(path, data): # Another worker polls after every write of the coordinator
+            write(path, data)
+            Work_Queue._write_json = write # Not for the claim's own writes
+            claimed.append(other.claim("w1"))
+            Work_Queue._write_json = interleaved
+        Work_Queue._write_json = interleaved
+        try:
+            self.assertEqual(self.queue.requeue_expired(verbose=False), ["T0"])
+        finally:
+            Work_Queue._write_json = write
+        lease = next((lease for lease in claimed if lease is not None), None) or other.claim("w1")
+        self.assertEqual(states(self.queue, "T0"), ["leased"])
+        self.assertTrue(lease.renew())
+        self.assertFalse(dead.renew())
+        self.assertEqual(lease.item["attempt"], 2)
+        expire(self.queue, "T0") # The new worker dies too, the trial must still be dispatched again
+        self.assertEqual(self.queue.requeue_expired(verbose=False), ["T0"])
+        self.assertEqual(states(self.queue, "T0"), ["pending"])
+
+    def test_concurrent_requeue(self):
+        """Trial threads requeueing the same expired lease at once dispatch it once, racing workers never lose it"""
+        for _ in range(20):
+            self.queue.submit("T0", {})
+            self.queue.claim("dead")
+            expire(self.queue, "T0")
+            barrier, requeued, leases, finished = threading.Barrier(6), [], [], threading.Event()
+            def coordinator():
+                barrier.wait()
+                requeued.extend(self.queue.requeue_expired(verbose=False))
+            def worker():
+                barrier.wait()
+                while True: # Until the trial is claimed, at the latest once the coordinators are done
+                    stop = finished.is_set()
+                    if (lease := self.queue.claim("w")) is not None:
+                        leases.append(lease)
+                    if lease is not None or stop:
+                        return
+            coordinators = [threading.Thread(target=coordinator) for _ in range(4)]
+            workers = [threading.Thread(target=worker) for _ in range(2)]
+            [thread.start() for thread in coordinators + workers]
+            [thread.join() for thread in coordinators]
+            finished.set()
+            [thread.join() for thread in workers]
+            self.assertEqual(requeued, ["T0"])
+            self.assertEqual(len(leases), 1)
+            self.assertEqual(states(self.queue, "T0"), ["leased"])
+            self.assertTrue(leases[0].renew())
+            self.assertTrue(self.queue.complete(leases[0], {}))
+            self.queue.poll("T0")
+
+    def test_complete_after_requeue(self):
+        """A late result of an expired lease is accepted, without removing the lease of the worker now running it"""
+        self.queue.submit("T0", {})
+        late = self.queue.claim("late")
+        expire(self.queue, "T0")
+        self.queue.requeue_expired(verbose=False)
+        lease = self.queue.claim("w1")
+        self.assertTrue(self.queue.complete(late, {"target": 1.0}))
+        self.assertTrue(lease.renew())
+        self.assertFalse(self.queue.complete(lease, {"target": 3.0})) # First result wins
+        self.assertEqual(self.queue.poll("T0")["target"], 1.0)
+        self.assertEqual(self.queue.counts(), {"pending": 0, "leased": 0, "done": 0})
+
+    def test_gives_up_after_max_attempts(self):
+        self.queue.submit("T0", {})
+        for _ in range(self.queue.max_attempts):
+            self.queue.claim("dead")
+            expire(self.queue, "T0")
+            self.queue.requeue_expired(verbose=False)
+        self.assertIn("expired", self.queue.poll("T0")["error"])
+
+    def test_run_with_dead_worker(self):
+        """End to end: one worker dies holding a trial, which is dispatched to the live workers and finished"""
+        queue = WorkQueue(self.queue.path, lease=1.0)
+        def execute(item, lease):
+            lease.results_dir.mkdir(parents=True)
+            (lease.results_dir / "out.txt").write_text(str(item["x"]))
+            return {"target": item["x"] * 2}
+        def dead():
+            while queue.claim("dead") is None:
+                time.sleep(0.05)
+        threading.Thread(target=dead, daemon=True).start()
+        workers = [threading.Thread(target=serve, args=(WorkQueue(queue.path),), daemon=True,
+                                    kwargs=dict(execute=execute, worker_id=f"w{i}", poll=0.05, idle_exit=5.0,
+                                                verbose=False)) for i in range(2)]
+        threading.Timer(0.2, lambda: [worker.start() for worker in workers]).start()
+        results = {}
+        def run(i):
+            results[i] = queue.run(f"T{i}", {"x": i}, measure_dir=Path(self.dir.name) / "measures" / f"T{i}",
+                                   poll=0.05)
+        runs = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+        [thread.start() for thread in runs]
+        [thread.join(timeout=30.0) for thread in runs]
+        self.assertEqual({i: result["target"] for i, result in results.items()}, {i: 2 * i for i in range(4)})
+        for i in range(4):
+            self.assertEqual((Path(self.dir.name) / "measures" / f"T{i}" / "out.txt").read_text(), str(i))
+        self.assertEqual(list((queue.path / "results").iterdir()), [])
+
+    def test_remote_failure(self):
+        self.queue.submit("T0", {})
+        lease = self.queue.claim("w0")
+        self.queue.complete(lease, {"error": "ValueError()"})
+        with self.assertRaises(RemoteTrialFailed):
+            self.queue.run("T0", {}, poll=0.01) # Resubmits, but the error is already there
+
+if __name__ == "__main__":
+    unittest.main()
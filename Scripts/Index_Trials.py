@@ -0,0 +1,59 @@
+import sys, argparse, pandas as pd
+from pathlib import Path
+
+base_path = Path(__file__).parent.parent
+script_path = base_path / "Scripts"
+if str(script_path) not in sys.path:
+    sys.path.append(str(script_path))
+
+from Utils.Enum import Color as C
+from Utils.Trial_Index import TrialIndex, INDEX_PATH, backfill
+
+EXAMPLE = """
+Examples:
+  python Index_Trials.py --backfill                       Index the trials of every earlier session in Logs/
+  python Index_Trials.py -c Flume -w "Visco < 0.02" -n 20  Best 20 trials of case Flume with Visco below 0.02
+  python Index_Trials.py --sessions                       Trials and best target per session
+"""
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='>> Query (and fill) the trial index of all sessions <<', epilog=EXAMPLE,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backfill', dest="backfill", action="store_true",
+                        help='Index trials of earlier sessions from their logs, journals and measurements first')
+    parser.add_argument('--overwrite', dest="overwrite", action="store_true",
+                        help='When backfilling, replace trials that are already indexed')
+    parser.add_argument('--sessions', dest="sessions", action="store_true",
+                        help='List sessions instead of trials')
+    parser.add_argument('-c', dest="case", type=str, default=None, help='Case name [Default: any]')
+    parser.add_argument('-s', dest="session", type=str, default=None, help='Session ID or contract name [Default: any]')
+    parser.add_argument('-w', dest="where", type=str, action="append", default=[],
+                        help='Condition on a parameter, e.g. "Visco < 0.02" (repeatable)')
+    parser.add_argument('--state', dest="state", type=str, default="completed",
+                        help='Trial state, "any" for all [Default: completed]')
+    parser.add_argument('--legacy', dest="legacy", action="store_true",
+                        help='Include trials of logs whose parameters were written to the wrong XML nodes')
+    parser.add_argument('-o', dest="order", type=str, default="target DESC",
+                        help='Column to sort by, optionally followed by ASC or DESC [Default: "target DESC"]')
+    parser.add_argument('-n', dest="n", type=int, default=20, help='Number of trials shown, 0 for all [Default: 20]')
+    parser.add_argument('--csv', dest="csv", type=Path, default=None, help='Also write the trials to a CSV file')
+    parser.add_argument('--db', dest="db", type=Path, default=INDEX_PATH, help=f'Index database [Default: {INDEX_PATH}]')
+    args = parser.parse_args()
+
+    index = TrialIndex(args.db)
+    if args.backfill:
+        backfill(index, overwrite=args.overwrite)
+    if args.sessions:
+        print(pd.DataFrame(index.sessions()).to_string(index=False))
+        sys.exit(0)
+    trials = index.query(case=args.case, session=args.session, where=args.where, order=args.order,
+                         state=None if args.state == "any" else args.state, limit=args.n or None,
+                         legacy=args.legacy)
+    df = pd.DataFrame([{**{k: trial[k] for k in ["trial_id", "case_name", "target", "run_time"]}, **trial["params"]}
+                       for trial in trials])
+    print(f"{C.BOLD}{len(trials)} trial(s){C.END} of {len(index)} indexed ({args.db})")
+    if len(df):
+        print(df.to_string(index=False))
+    if args.csv is not None:
+        pd.DataFrame([{**{k: v for k, v in trial.items() if k != "params"}, **trial["params"]} for trial in trials]
+                     ).to_csv(args.csv, index=False)
@@ -0,0 +1,37 @@
+import sys, argparse
+from pathlib import Path
+
+base_path = Path(__file__).parent.parent
+script_path = base_path / "Scripts"
+if str(script_path) not in sys.path:
+    sys.path.append(str(script_path))
+
+from Utils.Enum import Color as C, CommonDirs
+from Utils.Storage import ingest_csv
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='>> Convert stored MeasureTool CSVs into columnar tables <<')
+    parser.add_argument('dirs', type=Path, nargs='*', default=[CommonDirs.MEASURES],
+                        help='Directories searched (recursively) for MeasureTool CSVs [Default: Measurements/]')
+    parser.add_argument('-f', dest="fmt", type=str, default="npy", choices=["npy", "npz"],
+                        help='Memory-mappable column files, or a single compressed archive per CSV [Default: npy]')
+    parser.add_argument('--keep-raw', dest="keep_raw", action="store_true",
+                        help='Keep the CSV files after converting them')
+    args = parser.parse_args()
+
+    files = [file for directory in args.dirs for file in sorted(Path(directory).rglob("*.csv"))]
+    before, after, converted = 0, 0, 0
+    for file in files:
+        size = file.stat().st_size
+        try:
+            table = ingest_csv(file, file.with_suffix(""), fmt=args.fmt)
+        except Exception as e:
+            print(f"{C.BOLD}{C.RED}Warning{C.END}: Could not convert {file} ({e!r})")
+            continue
+        before += size
+        after += sum(f.stat().st_size for f in table.iterdir())
+        converted += 1
+        if not args.keep_raw:
+            file.unlink()
+    print(f"{C.BOLD}{C.GREEN}Info{C.END} Converted {converted} of {len(files)} CSV file(s): " +
+          f"{before / 1024**2:.1f} MB -> {after / 1024**2:.1f} MB")
@@ -1,9 +1,18 @@
+import sys
 import matplotlib as mlt
 import matplotlib.pyplot as plt
 import pandas as pd, math, numpy as np
 from pathlib import Path
+
+script_path = Path(__file__).parent
+if str(script_path) not in sys.path:
+    sys.path.append(str(script_path))
+
+from Utils.Rendering import downsample
+
 plt.style.use("seaborn-paper")
 # Sampling Frequency: 120hz
+MAX_POINTS = 2000 # Samples plotted per line, recordings are downsampled with LTTB (peaks are kept)
 
 data_dir = Path(__file__).parent / "Real_Data"
 dfs = {}
@@ -24,7 +33,7 @@ for i, (name, df) in enumerate(dfs.items()):
     deviations += y.std()
 
     zoom_start, zoom_end = round(0.45*len(df)), round(0.55*len(df))
-    ax.plot(x, y, color="blue", alpha=0.8)
+    ax.plot(*downsample(x, y, MAX_POINTS), color="blue", alpha=0.8)
     for xcoord in [x[zoom_start], x[zoom_end]]:
         ax.axvline(x=xcoord, color="black", alpha=0.5, zorder=5, linestyle="--", label="_nolegend_")
     ax.axhline(y=np.mean(y), color="red", alpha=0.5)
@@ -35,7 +44,7 @@ for i, (name, df) in enumerate(dfs.items()):
     ax.legend(["LDV Reading", "Mean"], loc="lower right")
     sub_ax = axes[i//2][(2*j)+1]
     x2, y2 = x.iloc[zoom_start:zoom_end], y.iloc[zoom_start:zoom_end]
-    sub_ax.plot(x2, y2)
+    sub_ax.plot(*downsample(x2, y2, MAX_POINTS // 4))
     sub_ax.set(title="Zoomed In", xlim=(min(x2),max(x2)))
     # sub_ax.set(xticks=[0.45*len(df), 0.55*len(df)])
     # sub_ax.set_xticks([]); sub_ax.set_yticks([])
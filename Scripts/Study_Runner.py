@@ -0,0 +1,84 @@
+import os, sys, json, time, argparse, traceback
+from pathlib import Path
+
+base_path = Path(__file__).parent.parent
+script_path = base_path / "Scripts"
+submodule_path = base_path / "BayesianOptimization"
+if str(script_path) not in sys.path: sys.path.append(str(script_path))
+if str(submodule_path) not in sys.path: sys.path.append(str(submodule_path))
+
+from Utils.Enum import Color as C, CommonDirs
+from Utils.Study import Study, load_studies
+
+EXAMPLE = """example study file (a list of such objects runs back to back, omitted settings use their defaults):
+  {"case": "WaterTunnel-Cylinder", "contract": "HyperParameter_Contract-Default.txt",
+   "budget": {"n_iter": 40, "init_points": 2, "hours": 10}, "metric": "mse", "batch_size": 2, "resume": "latest"}
+"""
+parser = argparse.ArgumentParser(description='>> Headless runner for queued optimisation studies <<', epilog=EXAMPLE,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('studies', type=Path, nargs="*",
+                    help='Study files (JSON) to run in order. Without any, studies are taken from the queue ' +
+                         'directory (oldest first) and moved to Running/, then Done/ or Failed/')
+parser.add_argument('-d', dest="queue", type=Path, default=CommonDirs.STUDIES,
+                    help=f'Queue directory [Default: {CommonDirs.STUDIES}]')
+parser.add_argument('-w', dest="watch", type=float, default=None,
+                    help='Keep polling the queue for new studies every WATCH seconds [Default: stop when empty]')
+parser.add_argument('-k', dest="keep_going", action="store_true",
+                    help='Continue with the next study in a file if one fails')
+args = parser.parse_args()
+
+def run_file(path):
+    """Runs every study in a file back to back. Returns (list): Summary (or error) of each study"""
+    results = []
+    for i, settings in enumerate(load_studies(path)):
+        print(f"{C.BOLD}{C.CYAN}>> Study {i+1} of {path.name}{C.END}: {settings['case']} / {settings['contract']}")
+        try:
+            study = Study.from_settings(settings)
+            results.append(study.run())
+            study.report()
+        except Exception as e:
+            if not args.keep_going:
+                raise
+            print(f"{C.BOLD}{C.RED}Warning{C.END}: Study failed ({e!r}), continuing with the next")
+            results.append({"error": repr(e), "traceback": traceback.format_exc()})
+    return results
+
+def claim(queue):
+    """Moves the oldest queued study file to Running/, returning its new path (None if the queue is empty).
+    Renaming is atomic, so several runners can share one queue directory."""
+    (queue / "Running").mkdir(parents=True, exist_ok=True)
+    for path in sorted(queue.glob("*.json"), key=lambda p: p.stat().st_mtime):
+        try:
+            os.rename(path, queue / "Running" / path.name)
+            return queue / "Running" / path.name
+        except OSError: # Claimed by another runner
+            continue
+    return None
+
+def finish(queue, path, outcome, results):
+    """Moves a study file out of Running/ (to Done/ or Failed/) together with its results"""
+    (queue / outcome).mkdir(parents=True, exist_ok=True)
+    with open(queue / outcome / f"{path.stem}.result.json", "w") as f:
+        json.dump(results, f, indent=2, default=str)
+    os.replace(path, queue / outcome / path.name)
+
+if args.studies: # Explicit files, left where they are
+    for path in args.studies:
+        print(json.dumps(run_file(path), indent=2, default=str))
+else:
+    args.queue.mkdir(parents=True, exist_ok=True)
+    while True:
+        if (path := claim(args.queue)) is None:
+            if args.watch is None:
+                break
+            time.sleep(args.watch)
+            continue
+        try:
+            finish(args.queue, path, "Done", run_file(path))
+        except KeyboardInterrupt: # Return the study to the queue
+            os.replace(path, args.queue / path.name)
+            raise
+        except Exception as e:
+            print(f"{C.BOLD}{C.RED}ERROR{C.END}: Study file {path.name} failed ({e!r})")
+            finish(args.queue, path, "Failed", [{"error": repr(e), "traceback": traceback.format_exc()}])
+    print(f"{C.BOLD}{C.GREEN}Info{C.END} Study queue {args.queue} is empty")
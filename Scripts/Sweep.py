@@ -0,0 +1,61 @@
+import sys, argparse
+from pathlib import Path
+
+base_path = Path(__file__).parent.parent
+script_path = base_path / "Scripts"
+submodule_path = base_path / "BayesianOptimization"
+if str(script_path) not in sys.path: sys.path.append(str(script_path))
+if str(submodule_path) not in sys.path: sys.path.append(str(submodule_path))
+
+from Utils.Optimization import CaseInfo
+from Utils.Enum import Color as C, CommonDirs
+from Utils.Case_Handling import find_simulation_parameters
+from Utils.Scoring import METRICS, ALIGNED_METRICS
+from Utils.Study import Study, study_settings
+from Utils.Design import DESIGNS, make_design, run_design
+
+parser = argparse.ArgumentParser(description='>> Design of Experiments sweep over Simulation Hyperparameters <<')
+parser.add_argument('-d', dest="design", type=str, default="lhs", choices=DESIGNS,
+                    help='Latin hypercube, scrambled Sobol sequence or full factorial design [Default: lhs]')
+parser.add_argument('-n', dest="n", type=int, default=16,
+                    help='Number of points of a Latin hypercube / Sobol design [Default: 16]')
+parser.add_argument('-l', dest="levels", type=int, default=3,
+                    help='Values per parameter of a full factorial design [Default: 3]')
+parser.add_argument('--seed', dest="seed", type=int, default=1,
+                    help='Random seed of the design, rerunning the same design resumes it [Default: 1]')
+parser.add_argument('-w', dest="workers", type=int, default=1,
+                    help='Number of points simulated concurrently [Default: 1]')
+parser.add_argument('-m', dest="metric", type=str, default="mse", choices=list(METRICS) + list(ALIGNED_METRICS),
+                    help='Metric minimised, averaged over all batches of the real data [Default: mse]')
+parser.add_argument('--no-cache', dest="use_cache", action="store_false",
+                    help='Always simulate, even if an identical Case (Def)inition was simulated before')
+parser.add_argument('--trace', dest="trace", action="store_true",
+                    help='Time every phase of every trial and save a Chrome trace and summary table to Logs/')
+parser.add_argument('-c', dest="case", type=str, default=None,
+                    help='Name of the case to sweep [Default: choose interactively]')
+parser.add_argument('-k', dest="contract", type=str, default=None,
+                    help='Hyperparameter contract file in HyperParameters/ [Default: choose interactively]')
+args = parser.parse_args()
+
+case = CaseInfo(case_name=args.case)
+params, _, file_name = find_simulation_parameters(
+    case.tree, hyp_name=CommonDirs.HYPERPARAMS / args.contract if args.contract else None,
+    return_name=True, record=0, verbose=False)
+SESSION_NAME = file_name.split(".")[0].split("-")[1]
+study = Study(case, params, SESSION_NAME, settings=study_settings(metric=args.metric, use_cache=args.use_cache,
+                                                                            trace=args.trace))
+
+# Named after the design (not the time), so rerunning the same sweep resumes it. Matches the optimisation logs, so a
+# later study can load it as prior observations (e.g. "resume": "Sweep-lhs-16-1_<contract>_OPTIMIZATION_LOG.json")
+size = f"{args.levels}l" if args.design == "factorial" else f"{args.n}-{args.seed}"
+log_path = CommonDirs.LOGS / f"Sweep-{args.design}-{size}_{SESSION_NAME}_OPTIMIZATION_LOG.json"
+points = make_design(params, method=args.design, n=args.n, levels=args.levels, seed=args.seed)
+results = run_design(study.objective, points, log_path, workers=args.workers)
+
+study.renderer.wait()
+print(f"{C.BOLD}Sweep log{C.END}: {log_path}")
+if (trace_path := study.save_trace()) is not None:
+    print(f"{C.BOLD}Trace{C.END}: {trace_path}\n{study.tracer.format_summary()}")
+if results:
+    target, best = max(results, key=lambda r: r[0])
+    print(f"{C.BOLD}{C.PURPLE}Best of {len(results)} Swept Combinations{C.END}:\n{{'target': {target}, 'params': {best}}}")
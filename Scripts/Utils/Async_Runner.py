@@ -0,0 +1,210 @@
+from .Enum import Color as C, CommonDirs
+from .Simulation import kill_process_tree
+
+import os as _os, time, signal, asyncio, psutil as ps
+from pathlib import Path
+from datetime import datetime, timedelta
+from functools import partial
+from collections import namedtuple
+
+TrialResult = namedtuple("TrialResult", ["trial_id", "returncode", "duration", "log_path", "out_path"])
+
+class SimulationTimeout(Exception):
+    """Raised when a simulation exceeds its wall-clock time, or stops making progress"""
+    def __init__(self, trial_id, reason, duration):
+        super().__init__(f"Trial {trial_id} stopped: {reason} after {duration}")
+        self.trial_id, self.reason, self.duration = trial_id, reason, duration
+
+class SimulationFailed(Exception):
+    """Raised when the launch script exits with a non-zero return code"""
+    def __init__(self, result):
+        super().__init__(f"Trial {result.trial_id} failed with return code {result.returncode}, see {result.log_path}")
+        self.result = result
+
+def _dir_size(path):
+    try:
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    except OSError: # Files may disappear while the solver runs
+        return -1
+
+def _group_members(pgid):
+    """Returns (list): Processes of a process group (e.g. root-owned solvers left behind by a dead sudo)"""
+    members = []
+    for p in ps.process_iter():
+        try:
+            if _os.getpgid(p.pid) == pgid:
+                members.append(p)
+        except (ProcessLookupError, ps.Error):
+            pass
+    return members
+
+async def _kill_group(process, grace=5.0, sudo=False):
+    """Terminates the launch script and everything it started (its whole process group/session). Never raises, a
+    failure is reported instead, so it cannot replace the timeout or cancellation that stops the trial.
+    sudo (bool): The script was launched with sudo, see 'Simulation.kill_process_tree' [Default: False]"""
+    if process.returncode is not None:
+        return
+    try:
+        if _os.name != "nt":
+            for sig, wait in [(signal.SIGTERM, grace), (signal.SIGKILL, None)]:
+                try:
+                    _os.killpg(process.pid, sig)
+                except ProcessLookupError:
+                    return
+                except PermissionError: # Owned by root (sudo), e.g. once sudo itself has died
+                    members = _group_members(process.pid)
+                    await asyncio.get_running_loop().run_in_executor(None, lambda: [
+                        kill_process_tree(p, timeout=grace, sudo=sudo) for p in members])
+                    await asyncio.wait_for(process.wait(), timeout=grace)
+                    return
+                try:
+                    await asyncio.wait_for(process.wait(), timeout=wait)
+                    return
+                except asyncio.TimeoutError:
+                    continue
+        else: # No process groups, walk the tree instead
+            try:
+                procs = ps.Process(process.pid).children(recursive=True) + [ps.Process(process.pid)]
+            except ps.NoSuchProcess:
+                return
+            for p in procs:
+                try: p.kill()
+                except ps.NoSuchProcess: pass
+            await process.wait()
+    except Exception as e:
+        print(f"{C.BOLD}{C.RED}Warning{C.END}: Could not stop the simulation (PID {process.pid}): {e!r}")
+
+class TrialHandle():
+    """
+    Awaitable handle of a simulation launched by 'launch_trial'.
+    'await handle' returns a TrialResult, or raises SimulationTimeout / SimulationFailed / asyncio.CancelledError.
+    """
+
+    def __init__(self, trial_id, log_path, out_path):
+        self.trial_id, self.log_path, self.out_path = trial_id, log_path, out_path
+        self.process = None
+        self.start = time.monotonic()
+        self.last_progress = self.start
+        self._task = None
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process is not None else None
+
+    def done(self):
+        return self._task.done()
+
+    def cancel(self):
+        """Stops the simulation, killing its whole process group"""
+        return self._task.cancel()
+
+    def __await__(self):
+        return self._task.__await__()
+
+async def _stream(handle, stream, log):
+    """Copies the solver's output to the trial log, recording when it last printed anything"""
+    while line := await stream.readline():
+        log.write(line)
+        log.flush()
+        handle.last_progress = time.monotonic()
+
+async def _supervise(handle, process, stdin, wall_timeout, idle_timeout, poll_interval, sudo=False):
+    if stdin and process.stdin is not None:
+        try: # Answer the script's prompts, then close stdin so any further prompt ends instead of blocking
+            process.stdin.write(stdin)
+            await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        process.stdin.close()
+    with open(handle.log_path, "ab") as log:
+        streamer = asyncio.ensure_future(_stream(handle, process.stdout, log))
+        out_size = _dir_size(handle.out_path)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(asyncio.shield(process.wait()), timeout=poll_interval)
+                    break
+                except asyncio.TimeoutError:
+                    pass
+                now = time.monotonic()
+                if (size := _dir_size(handle.out_path)) != out_size: # Solver output growing counts as progress
+                    out_size, handle.last_progress = size, now
+                reason = None
+                if wall_timeout is not None and now - handle.start > wall_timeout:
+                    reason = f"wall-clock timeout ({wall_timeout}s)"
+                elif idle_timeout is not None and now - handle.last_progress > idle_timeout:
+                    reason = f"no progress for {idle_timeout}s"
+                if reason is not None:
+                    await _kill_group(process, sudo=sudo)
+                    raise SimulationTimeout(handle.trial_id, reason, timedelta(seconds=now - handle.start))
+            await streamer
+        except BaseException: # Includes cancellation
+            await _kill_group(process, sudo=sudo)
+            streamer.cancel()
+            raise
+    result = TrialResult(handle.trial_id, process.returncode, timedelta(seconds=time.monotonic() - handle.start),
+                         handle.log_path, handle.out_path)
+    if process.returncode != 0:
+        raise SimulationFailed(result)
+    return result
+
+def _index_outcome(index, handle, case_name, started, task):
+    """Records how a supervised trial ended in the trial index (done callback of its task)"""
+    error = None if task.cancelled() else task.exception()
+    index.record(handle.trial_id, case_name=case_name, state="cancelled" if task.cancelled() else
+                 "failed" if error is not None else "completed", error=repr(error) if error is not None else None,
+                 started=started, finished=datetime.now().isoformat(timespec="seconds"),
+                 run_time=time.monotonic() - handle.start, log_path=str(handle.log_path),
+                 measure_dir=str(handle.out_path), source="async_runner")
+
+async def launch_trial(case_def, case_name, trial_id, os="linux64", device="GPU", export_vtk=False,
+                       wall_timeout=None, idle_timeout=None, poll_interval=1.0, log_dir=None, sudo=False, env=None,
+                       index=None):
+    """
+    Launches a Case's solver script as an asyncio subprocess in its own process group and returns immediately.
+    case_def (Path): Case (Def)inition XML, its directory (e.g. a TrialWorkspace) is the working directory
+    case_name (str): Name of the case
+    trial_id (str): Identifier of the trial, names the log file
+    os (str): 'win64' or 'linux64' [Default: 'linux64']
+    device (str): Launch script variant, 'GPU' or 'CPU' [Default: 'GPU']
+    export_vtk (bool): Whether the script should also export VTK files [Default: False]
+    wall_timeout (float): Seconds after which the trial is killed [Default: None, no limit]
+    idle_timeout (float): Seconds without output on stdout or growth of '<case>_out' after which the trial is killed
+        [Default: None, no limit]
+    poll_interval (float): Seconds between timeout checks [Default: 1.0]
+    log_dir (Path): Directory for the per-trial stdout log [Default: CommonDirs.LOGS / 'Trials']
+    sudo (bool): Run the script with sudo, its processes are then stopped through 'sudo kill' [Default: False]
+    env (dict): Environment variables of the solver [Default: None, inherit]
+    index (TrialIndex): Index the trial's outcome, run time and log are recorded in [Default: None]
+    Returns (TrialHandle): Awaitable handle of the running trial
+    """
+    script = case_def.parent / (case_name + f"_{os}_{device}" + (".bat" if os == "win64" else ".sh"))
+    out_path = case_def.parent / f"{case_name}_out"
+    log_dir = Path(log_dir) if log_dir is not None else CommonDirs.LOGS / "Trials"
+    log_dir.mkdir(parents=True, exist_ok=True)
+    handle = TrialHandle(trial_id, log_dir / f"{trial_id}.log", out_path)
+    stdin = (b"1" if out_path.exists() else b"") + (b"A" if os != "win64" else b"") # Overwrite prompt, final pause
+    args = (["sudo"] if sudo and os != "win64" else []) + [str(script), "1" if export_vtk else "0"]
+    handle.process = await asyncio.create_subprocess_exec(
+        *args, cwd=str(case_def.parent), env=env, stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+        start_new_session=(os != "win64"))
+    handle._task = asyncio.ensure_future(
+        _supervise(handle, handle.process, stdin, wall_timeout, idle_timeout, poll_interval,
+                   sudo=sudo and os != "win64"))
+    if index is not None:
+        handle._task.add_done_callback(
+            partial(_index_outcome, index, handle, case_name, datetime.now().isoformat(timespec="seconds")))
+    return handle
+
+async def run_trials(trials, max_concurrent=1, return_exceptions=True):
+    """Runs many trials from one event loop, at most 'max_concurrent' at a time.
+    trials (list): Keyword-argument dictionaries for 'launch_trial'
+    Returns (list): TrialResult (or exception, if 'return_exceptions') for each trial, in order"""
+    semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def run(kwargs):
+        async with semaphore:
+            return await (await launch_trial(**kwargs))
+
+    return await asyncio.gather(*[run(kwargs) for kwargs in trials], return_exceptions=return_exceptions)
@@ -0,0 +1,120 @@
+from .Params import HyperParameters, SimParam
+from .Case_Handling import find_node
+
+import re, copy, numpy as np
+from pathlib import Path
+from xml.etree.ElementTree import tostring
+from xml.sax.saxutils import escape
+
+SLOT = "@@SLOT{}@@" # Placeholder of a bound attribute value while the template is serialised
+CONTINUOUS = [float, np.float16, np.float32, np.float64, np.double, np.longdouble]
+
+def cast_value(param, value):
+    """String written to the Case (Def)inition for a (suggested) parameter value, as done by the optimisation objective:
+    continuous values are written as given, discrete values are cast to the parameter's type first"""
+    return str(value) if param.type in CONTINUOUS else str(param.type(value))
+
+def _encode(value):
+    """Attribute value escaped and encoded as 'ElementTree.write' would"""
+    value = escape(str(value), {'"': "&quot;", "\n": "&#10;", "\r": "&#13;", "\t": "&#09;"})
+    return value.encode("ascii", "xmlcharrefreplace")
+
+def _as_params(params):
+    params = list(params.keys()) if isinstance(params, HyperParameters) else list(params)
+    return [SimParam.from_slug(p) if isinstance(p, str) else p for p in params]
+
+class CaseBinding():
+    """
+    Resolves each Simulation parameter to its XML node once, so values can be swapped into the same tree repeatedly
+    without searching it again (see 'swap_params', which searches for every swap).
+
+    tree (ElementTree): Case (Def)inition tree the parameters are bound to (modified in place by 'apply')
+    params (HyperParameters / list): Simulation parameters (SimParam objects or their slugs) to bind, in order
+    """
+
+    def __init__(self, tree, params):
+        self.tree = tree
+        self.params = _as_params(params)
+        self.index = {param: i for i, param in enumerate(self.params)}
+        self.nodes = [find_node(tree.getroot(), param) for param in self.params]
+
+    def _ordered(self, values):
+        """Values in binding order, from a vector, or a dictionary keyed on SimParam objects or slugs"""
+        if isinstance(values, (dict, HyperParameters)):
+            ordered = [None] * len(self.params)
+            for key, value in values.items():
+                ordered[self.index[SimParam.from_slug(key) if isinstance(key, str) else key]] = value
+            if any(value is None for value in ordered):
+                raise KeyError(f"Missing values for {[repr(p) for p, v in zip(self.params, ordered) if v is None]}")
+            return ordered
+        if len(values) != len(self.params): raise ValueError("Length of parameter vector does not match")
+        return list(values)
+
+    def apply(self, values):
+        """Writes values into the bound tree (No effect on file!). Returns (ElementTree): The bound tree"""
+        for param, node, value in zip(self.params, self.nodes, self._ordered(values)):
+            node.set(param.attr, str(value)) # String conversion ensures it is serialisable
+        return self.tree
+
+    def values(self):
+        """Returns (list): Current values (strings) of the bound attributes"""
+        return [node.get(param.attr) for param, node in zip(self.params, self.nodes)]
+
+class CaseTemplate():
+    """
+    Case (Def)inition serialised once, with the values of bound parameters left as slots, so case variants are rendered
+    by joining strings instead of patching and re-serialising the XML tree. Rendering a variant gives the same bytes
+    as swapping its values into the tree and writing it with 'update_case_file'.
+    Apply fixed changes (e.g. 'swap_duration_and_freq') to the tree before compiling the template, or bind them too.
+    As with consecutive calls to 'swap_params', the last of several parameters bound to the same attribute wins.
+
+    tree (ElementTree): Case (Def)inition tree, not modified
+    params (HyperParameters / list): Simulation parameters (SimParam objects or their slugs) with a slot each
+    """
+
+    def __init__(self, tree, params):
+        binding = CaseBinding(copy.deepcopy(tree), params)
+        self.params, self.index, self.defaults = binding.params, binding.index, binding.values()
+        self._ordered = binding._ordered
+        binding.apply([SLOT.format(i) for i in range(len(self.params))])
+        xml = tostring(binding.tree.getroot(), encoding="us-ascii", method="xml") # As 'ElementTree.write' does
+        parts = re.split(rb"@@SLOT(\d+)@@", xml)
+        self.fragments = parts[0::2] # Text between slots, one more than there are slots
+        self.slots = [int(i) for i in parts[1::2]] # Parameter filling each slot (if several bind one attribute, the last)
+
+    def _fill(self, strings):
+        out = [self.fragments[0]]
+        for slot, fragment in zip(self.slots, self.fragments[1:]):
+            out += [strings[slot], fragment]
+        return b"".join(out)
+
+    def render(self, values):
+        """Returns (bytes): Case (Def)inition with the given values (vector or dictionary, see 'CaseBinding.apply')"""
+        return self._fill([_encode(value) for value in self._ordered(values)])
+
+    def render_many(self, vectors, cast=True):
+        """Renders one Case (Def)inition per row of 'vectors' (n × parameters).
+        cast (bool): Convert values as the optimisation objective does, see 'cast_value' [Default: True]
+        Returns (list): Rendered Case (Def)initions (bytes), in row order"""
+        vectors = np.asarray(vectors, dtype=object)
+        if vectors.ndim != 2 or vectors.shape[1] != len(self.params):
+            raise ValueError(f"Expected an (n × {len(self.params)}) array of parameter vectors")
+        columns = [[_encode(cast_value(param, v) if cast else v) for v in vectors[:, i]]
+                   for i, param in enumerate(self.params)] # Format column by column, one type per column
+        return [self._fill(strings) for strings in zip(*columns)]
+
+    def write(self, values, case_def):
+        """Renders a variant straight to a Case (Def)inition file. Returns (Path): 'case_def'"""
+        Path(case_def).write_bytes(self.render(values))
+        return case_def
+
+    def write_many(self, vectors, out_dir, case_name, cast=True):
+        """Writes each variant to '<out_dir>/<case_name>-<row>/<case_name>_Def.xml'.
+        Returns (list): Paths of the written Case (Def)initions, in row order"""
+        paths = []
+        for i, xml in enumerate(self.render_many(vectors, cast=cast)):
+            path = Path(out_dir) / f"{case_name}-{i}" / f"{case_name}_Def.xml"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(xml)
+            paths.append(path)
+        return paths
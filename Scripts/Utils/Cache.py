@@ -0,0 +1,139 @@
+from .Enum import Color as C, CommonDirs
+from .Workspace import link_or_copy
+
+import os, re, json, time, shutil, hashlib, threading
+from pathlib import Path
+from xml.etree.ElementTree import tostring, canonicalize
+
+ACCESS_FILE = ".last_access" # mtime records the most recent hit, used for LRU eviction
+META_FILE = "meta.json"
+
+def solver_version(case_def, case_name, os="linux64", device="GPU"):
+    """
+    Fingerprint of the solver used to run a case, so cached results are invalidated when DualSPHysics is updated.
+    Hashes the launch script and the name, size and modification time of the binaries in its 'dirbin' directory.
+    case_def (Path): Path to the Case (Def)inition XML
+    case_name (str): Name of the case
+    os (str): Operating system the launch script targets, 'win64' or 'linux64' [Default: 'linux64']
+    device (str): Launch script variant, 'GPU' or 'CPU' [Default: 'GPU']
+    Returns (str): Hexadecimal digest
+    """
+    script = case_def.parent / (case_name + f"_{os}_{device}" + (".bat" if os == "win64" else ".sh"))
+    digest = hashlib.sha256()
+    if not script.exists():
+        return digest.hexdigest()
+    content = script.read_text(errors="ignore")
+    digest.update(content.encode())
+    match = re.search(r"dirbin=([^\s\"']+)", content) # Both 'export dirbin=...' and 'set dirbin=...'
+    if match:
+        dirbin = (case_def.parent / match.group(1).replace("\\", "/")).resolve()
+        for binary in sorted(dirbin.glob("*")) if dirbin.is_dir() else []:
+            if binary.is_file():
+                stat = binary.stat()
+                digest.update(f"{binary.name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+class ResultCache():
+    """
+    Persistent, content-addressed store of MeasureTool outputs.
+    Entries are keyed on the canonical form of the fully patched Case (Def)inition plus the solver version, so any
+    trial that would produce an identical simulation can reuse a previous result instead of running DualSPHysics.
+    Least recently used entries are evicted once the cache exceeds 'max_bytes'.
+
+    root (Path): Directory in which entries are stored [Default: CommonDirs.CACHE]
+    max_bytes (int): Maximum total size of all entries [Default: 20 GiB]
+    """
+
+    def __init__(self, root=CommonDirs.CACHE, max_bytes=20 * 1024**3):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits, self.misses = 0, 0
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def key(self, tree, solver_version=""):
+        """Canonical hash of a (patched) XML Element Tree, or rendered Case (Def)inition (bytes), and solver version.
+        Attribute order, whitespace and comments do not affect the key."""
+        xml = canonicalize(tree if isinstance(tree, bytes) else tostring(tree.getroot()), strip_text=True)
+        return hashlib.sha256((xml + "\n" + solver_version).encode()).hexdigest()
+
+    def _entry(self, key):
+        return self.root / key[:2] / key
+
+    def get(self, key, dest):
+        """Restores the cached MeasureTool output for 'key' into directory 'dest'.
+        Returns (Path): 'dest' on a hit, None on a miss"""
+        entry = self._entry(key)
+        if not (entry / META_FILE).exists():
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            shutil.copytree(entry / "measurements", dest, copy_function=link_or_copy)
+            (entry / ACCESS_FILE).touch()
+        except FileNotFoundError: # Evicted by another process in the meantime
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return dest
+
+    def put(self, key, measure_dir, **meta):
+        """Stores the MeasureTool output in 'measure_dir' under 'key', then evicts entries if the cache is too large.
+        measure_dir (Path): Directory containing the MeasureTool CSV files of a finished trial
+        meta (kwargs): Additional JSON-serialisable information stored alongside the entry, e.g. parameters"""
+        entry = self._entry(key)
+        if (entry / META_FILE).exists():
+            return entry
+        staging = entry.parent / f".{key}-{os.getpid()}-{threading.get_ident()}"
+        shutil.copytree(measure_dir, staging / "measurements", copy_function=link_or_copy)
+        size = sum(f.stat().st_size for f in (staging / "measurements").rglob("*") if f.is_file())
+        with open(staging / META_FILE, "w") as f:
+            json.dump({"created": time.time(), "size": size, **meta}, f, default=str)
+        (staging / ACCESS_FILE).touch()
+        try:
+            os.replace(staging, entry) # Atomic, readers never see a partially written entry
+        except OSError: # Another trial stored the same key first
+            shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+        return entry
+
+    def entries(self):
+        """Lists (last access time, size, path) of every entry, least recently used first"""
+        entries = []
+        for meta_path in self.root.glob(f"*/*/{META_FILE}"):
+            entry = meta_path.parent
+            try:
+                with open(meta_path) as f:
+                    size = json.load(f)["size"]
+                entries.append(((entry / ACCESS_FILE).stat().st_mtime, size, entry))
+            except (OSError, ValueError, KeyError):
+                continue
+        return sorted(entries)
+
+    def evict(self, max_bytes=None):
+        """Removes least recently used entries until the total size is within 'max_bytes'
+        Returns (int): Number of entries removed"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total, removed = sum(size for _, size, _ in entries), 0
+        for _, size, entry in entries:
+            if total <= max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self):
+        """Hit/miss statistics of this session and current size of the cache"""
+        entries = self.entries()
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(entries), "bytes": sum(size for _, size, _ in entries), "max_bytes": self.max_bytes}
+
+    def __str__(self):
+        s = self.stats()
+        return (f"{C.BOLD}Cache{C.END}: {s['hits']} hits, {s['misses']} misses ({100*s['hit_rate']:.1f}%), " +
+                f"{s['entries']} entries, {s['bytes'] / 1024**2:.1f}/{s['max_bytes'] / 1024**2:.0f} MB")
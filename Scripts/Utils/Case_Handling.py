@@ -1,6 +1,7 @@
 from .Enum import Color as C, CommonDirs
 from .Interaction import select_hyperparameters
 from .Params import HyperParameters, SimParam
+from .Tracing import traced
 
 import numpy as np, numpy
 from xml.etree.ElementTree import ElementTree, XMLParser, TreeBuilder
@@ -8,6 +9,7 @@ from shutil import copyfile
 from pathlib import Path
 
 # >> Parse Case (Def)inition XML Tree <<<
+@traced("case.parse")
 def parse_case(case_path, verbose=False):
     """Parse Case (Def)inition XML file as an Element Tree"""
     case_defs = [f for f in case_path.glob("*.xml") if case_path.name in f.name and "backup" not in f.name]
@@ -118,7 +120,7 @@ def find_simulation_parameters(tree, hyp_name=None, return_name=False, record=0,
     with open(CommonDirs.HYPERPARAMS / hyp_name.name, "r") as f:
         for line in f.readlines():
             param_str, value = line.strip().split("=>")
-            param = SimParam.from_slug(param_str) 
+            param = SimParam.from_slug(param_str)
 
             count = 0
             while params.get(param) is not None: # ToDo: Check if this works
@@ -135,6 +137,7 @@ def find_simulation_parameters(tree, hyp_name=None, return_name=False, record=0,
     else:
         return params, param_vector
 
+@traced("case.write")
 def update_case_file(tree, case_def, case_name):
     """Generates a new Case (Def)inition file from an XML Element Tree"""
     backup_path = case_def.parent / (case_name + "_Def_backup.xml")
@@ -143,34 +146,42 @@ def update_case_file(tree, case_def, case_name):
     # >> Overwrite existing case with swapped tree <<
     tree.write(case_def, method="xml")
 
-def swap_duration_and_freq(tree, duration=None, freq=1.0/120.0):
-    """Swaps CaseDef's XML Element Tree's duration and frequency with new values"""
+def duration_and_freq_params(duration=None, freq=1.0/120.0):
+    """Simulation parameters (with the new values as defaults) of a CaseDef's duration and output frequency"""
     DurationNode = SimParam(id="./execution/parameters/parameter", attr="value", count=0,
                             default=duration if duration else input("Duration in seconds"),
                             bound=np.float32, sec_key=("key", "TimeMax"))
     TimeStepNode = SimParam(id="./execution/parameters/parameter", attr="value", count=0,
                             default=str(round(freq, 15)), # 120 Hz
                             bound=np.float32, sec_key=("key", "TimeOut"))
-    swap_params(tree, HyperParameters(DurationNode, TimeStepNode, use_defaults=True)) # 120 Hz
+    return DurationNode, TimeStepNode
+
+def swap_duration_and_freq(tree, duration=None, freq=1.0/120.0):
+    """Swaps CaseDef's XML Element Tree's duration and frequency with new values"""
+    swap_params(tree, HyperParameters(*duration_and_freq_params(duration, freq), use_defaults=True)) # 120 Hz
 
+def find_node(root, param):
+    """Finds the XML node a Simulation parameter refers to: the 'count'-th element matching its id (XPath) and,
+    if it has one, its secondary (attribute-value) key.
+    root (node): Root of tree, must be iterable.
+    param (SimParam): Simulation parameter to resolve
+    """
+    nodes = root.findall(param.id)
+    if nodes == []: raise KeyError(f"XML id: '{param.id}' not found in Tree")
+    if param.sec_key is not None and param.sec_key[0] is not None:
+        nodes = [node for node in nodes if node.get(param.sec_key[0]) == param.sec_key[1]]
+    if len(nodes) < param.count + 1:
+        raise KeyError(f"Full key: ({param}) is not unique")
+    node = nodes[param.count]
+    if node.get(param.attr) is None:
+        raise KeyError(f"Attribute {param.attr} not in node with id: {param.id}")
+    return node
+
+@traced("case.swap")
 def swap_params(root, params):
     """Swaps list of Simulation parameters into tree (No effect on file!), using full XML paths.
     root (node): Root of tree, must be iterable.
     params(list): List of SimParam objects
     """
     for param, v in params.items():
-        nodes = root.findall(param.id)
-        if nodes == []: raise KeyError(f"XML id: '{param.id}' not found in Tree")
-        if param.sec_key:
-            for node in nodes:
-                if node.get(param.sec_key[0]) == param.sec_key[1]:
-                    break
-        elif len(nodes) >= param.count + 1:
-            node = nodes[param.count]
-        else:
-            raise KeyError(f"Full key: ({param}) is not unique")
-        
-        if node.get(param.attr) is not None:
-            node.set(param.attr, str(v)) # String conversion ensures it is serialisable
-        else:
-            raise KeyError(f"Attribute {param.attr} not in node with id: {param.id}")
\ No newline at end of file
+        find_node(root, param).set(param.attr, str(v)) # String conversion ensures it is serialisable
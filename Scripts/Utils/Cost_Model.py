@@ -0,0 +1,149 @@
+from .Trial_Index import param_name
+
+import threading, warnings, numpy as np
+from sklearn.gaussian_process import GaussianProcessRegressor
+from sklearn.gaussian_process.kernels import Matern
+from bayes_opt import UtilityFunction
+
+COST_MODES = ["none", "eips"]
+
+class CostModel():
+    """
+    Gaussian Process of trial run times (log seconds) over the optimizer's parameters, see 'CostAwareUtility' and
+    'pareto_front'. Run times are recorded as trials finish (from any thread), the model is refit lazily.
+
+    bounds (ndarray): Bounds of the optimizer's parameters (parameters × 2), see 'TargetSpace.bounds'
+    min_points (int): Observations needed before run times are predicted, until then all points cost the same
+        [Default: 3]
+    random_state (int / RandomState): Source of randomness of the kernel optimisation restarts [Default: None]
+    """
+
+    def __init__(self, bounds, min_points=3, random_state=None):
+        self.bounds = np.asarray(bounds, dtype=np.float64)
+        self.min_points, self.random_state = min_points, random_state
+        self.X, self.seconds, self.targets = [], [], []
+        self._gp, self._fitted = None, 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.X)
+
+    def __repr__(self):
+        return f"CostModel({len(self)} run time(s)" + \
+               (f", median {np.median(self.seconds):.1f}s)" if self.seconds else ")")
+
+    def _unit(self, X):
+        span = self.bounds[:, 1] - self.bounds[:, 0]
+        return (np.atleast_2d(X) - self.bounds[:, 0]) / np.where(span > 0, span, 1.0)
+
+    def record(self, x, seconds, target=None):
+        """Adds the run time (and target) of a finished trial at point 'x' (optimizer's parameter array)"""
+        if seconds is None or not np.isfinite(seconds) or seconds <= 0:
+            return
+        with self._lock:
+            self.X.append(np.asarray(x, dtype=np.float64))
+            self.seconds.append(float(seconds))
+            self.targets.append(np.nan if target is None else float(target))
+
+    def load(self, index, keys, metric=None, **criteria):
+        """Records the run times of completed (not pruned) trials in a trial index, e.g. of previous sessions.
+        keys (list): Optimizer's parameter slugs, in order (trials missing one of them are skipped)
+        metric (str): Only trials scored with this metric keep their target [Default: None, any]
+        criteria (kwargs): Selection of trials, see 'TrialIndex.query' (e.g. case, session)
+        Returns (int): Number of trials recorded"""
+        names, count = [param_name(key) for key in keys], 0
+        for trial in index.query(**criteria):
+            values = [trial["params"].get(name) for name in names]
+            if trial["run_time"] is None or trial["pruned"] or any(v is None for v in values):
+                continue
+            target = trial["target"] if metric is None or trial["metric"] == metric else None
+            self.record(np.asarray(values, dtype=np.float64), trial["run_time"], target)
+            count += 1
+        return count
+
+    def _model(self):
+        """Fitted GP of log run times, None while there are fewer than 'min_points' observations"""
+        with self._lock:
+            n = len(self.X)
+            if n < self.min_points:
+                return None
+            if n == self._fitted:
+                return self._gp
+            X, y = self._unit(np.vstack(self.X)), np.log(self.seconds)
+        gp = GaussianProcessRegressor(kernel=Matern(nu=2.5, length_scale=np.ones(X.shape[1]),
+                                                    length_scale_bounds=(1e-2, 1e2)),
+                                      alpha=1e-2, normalize_y=True, n_restarts_optimizer=2,
+                                      random_state=self.random_state)
+        with warnings.catch_warnings(): # Sklearn warns about hyperparameters at their bounds on few points
+            warnings.simplefilter("ignore")
+            gp.fit(X, y)
+        with self._lock:
+            self._gp, self._fitted = gp, n
+        return gp
+
+    def predict(self, X, return_std=False):
+        """Expected run time (seconds) at points X (points × parameters).
+        Returns (ndarray): Seconds, ones while too few run times are known (and the std. dev. of log seconds)"""
+        X = np.atleast_2d(X)
+        gp = self._model()
+        if gp is None:
+            return (np.ones(len(X)), np.zeros(len(X))) if return_std else np.ones(len(X))
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            mean, std = gp.predict(self._unit(X), return_std=True)
+        return (np.exp(mean), std) if return_std else np.exp(mean)
+
+    def observations(self):
+        """Returns (3-tuple): Points (observations × parameters), run times (s) and targets (NaN if unknown)"""
+        with self._lock:
+            X = np.vstack(self.X) if self.X else np.empty((0, len(self.bounds)))
+            return X, np.asarray(self.seconds), np.asarray(self.targets)
+
+class CostAwareUtility():
+    """
+    Acquisition weighing expected improvement against predicted run time, usable wherever a bayes_opt UtilityFunction
+    is (e.g. 'suggest_batch'):
+        'eips' : Expected improvement per second, EI(x) / cost(x)^weight
+
+    utility (UtilityFunction): Base acquisition, supplies 'xi' (and the kappa decay of 'update_params')
+    cost_model (CostModel): Predicts run times
+    kind (str): See above [Default: 'eips']
+    weight (float): Exponent of the predicted run time, 0 ignores run times [Default: 1.0]
+    """
+
+    def __init__(self, utility, cost_model, kind="eips", weight=1.0):
+        if kind not in COST_MODES[1:]:
+            raise ValueError(f"Unknown cost-aware acquisition '{kind}', choose from {COST_MODES[1:]}")
+        self.base, self.cost_model, self.kind, self.weight = utility, cost_model, kind, weight
+
+    def update_params(self):
+        self.base.update_params()
+
+    def utility(self, x, gp, y_max):
+        ei = UtilityFunction._ei(x, gp, y_max, self.base.xi)
+        if self.weight == 0:
+            return ei
+        return ei / self.cost_model.predict(x) ** self.weight
+
+def pareto_front(targets, seconds):
+    """Points not dominated in accuracy (higher target) and run time (fewer seconds).
+    Returns (ndarray): Indices of the front, fastest first"""
+    targets, seconds = np.asarray(targets, dtype=np.float64), np.asarray(seconds, dtype=np.float64)
+    order = np.lexsort((-targets, seconds)) # Fastest first, most accurate first among equally fast points
+    front, best = [], -np.inf
+    for i in order:
+        if np.isfinite(targets[i]) and targets[i] > best:
+            front.append(i)
+            best = targets[i]
+    return np.asarray(front, dtype=int)
+
+def fastest_acceptable(targets, seconds, tolerance=0.1):
+    """Fastest point whose error (1 / target) is at most 'tolerance' (relative) worse than the best point's.
+    Returns (int): Index of that point, None if no point has a target"""
+    targets, seconds = np.asarray(targets, dtype=np.float64), np.asarray(seconds, dtype=np.float64)
+    valid = np.isfinite(targets) & (targets > 0)
+    if not valid.any():
+        return None
+    error = 1.0 / np.where(valid, targets, 1.0)
+    acceptable = np.flatnonzero(valid & (error <= (1.0 + tolerance) / targets[valid].max()))
+    return int(acceptable[np.argmin(seconds[acceptable])])
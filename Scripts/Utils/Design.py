@@ -0,0 +1,114 @@
+from .Enum import Color as C
+from .Params import HyperParameters
+
+import json, math, numpy as np
+from datetime import datetime
+from pathlib import Path
+from itertools import product
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from scipy.stats import qmc
+
+DESIGNS = ["lhs", "sobol", "factorial"]
+
+def _kind(param):
+    """'int', 'bool' or 'float', following the type chosen by 'SimParam._set_bound'"""
+    if np.issubdtype(param.type, np.bool_):
+        return "bool"
+    if np.issubdtype(param.type, np.integer):
+        return "int"
+    return "float"
+
+def _scale(param, u):
+    """Maps unit samples to a parameter's bounds. Integer (and boolean) parameters get equally wide bins per value."""
+    lo, hi = float(param.bounds[0]), float(param.bounds[1])
+    if _kind(param) == "float":
+        return lo + u * (hi - lo)
+    return np.minimum(np.floor(lo + u * (hi - lo + 1)), hi)
+
+def _levels(param, levels):
+    """Values of a parameter in a full factorial design"""
+    lo, hi = float(param.bounds[0]), float(param.bounds[1])
+    if _kind(param) == "float":
+        return np.linspace(lo, hi, levels)
+    return np.unique(np.round(np.linspace(lo, hi, min(levels, int(hi - lo) + 1))))
+
+def make_design(params, method="lhs", n=16, levels=3, seed=1):
+    """
+    Space-filling (or full factorial) design over the bounds of the simulation hyperparameters.
+    The same arguments always give the same design, which is what allows a sweep to be resumed.
+    params (HyperParameters): Parameters (with bounds and types) to vary
+    method (str): 'lhs' (Latin hypercube), 'sobol' (scrambled Sobol sequence) or 'factorial' [Default: 'lhs']
+    n (int): Number of points (LHS / Sobol, Sobol uses the first n of the next power of two) [Default: 16]
+    levels (int): Values per parameter (full factorial, integer parameters may have fewer) [Default: 3]
+    seed (int): Random seed (LHS / Sobol) [Default: 1]
+    Returns (list): Dictionaries mapping parameter slugs (keys of 'params.get_bounds()') to values, without duplicates
+    """
+    params = list(params.keys()) if isinstance(params, HyperParameters) else list(params)
+    if method == "factorial":
+        values = np.asarray(list(product(*[_levels(param, levels) for param in params])), dtype=np.float64)
+    elif method in ["lhs", "sobol"]:
+        if method == "lhs":
+            u = qmc.LatinHypercube(d=len(params), seed=seed).random(n)
+        else:
+            u = qmc.Sobol(d=len(params), scramble=True, seed=seed).random_base2(m=max(0, math.ceil(math.log2(n))))[:n]
+        values = np.column_stack([_scale(param, u[:, i]) for i, param in enumerate(params)])
+    else:
+        raise ValueError(f"Unknown design '{method}', choose from {DESIGNS}")
+    _, first = np.unique(values, axis=0, return_index=True) # Integer binning may produce the same point twice
+    values = values[np.sort(first)]
+    return [{repr(param): float(v) for param, v in zip(params, row)} for row in values]
+
+def _point_key(params):
+    return json.dumps({k: round(float(v), 12) for k, v in sorted(params.items())})
+
+def read_sweep_log(log_path):
+    """Points already evaluated by a (partial) sweep, as written by 'run_design'. Returns (dict): point key -> target"""
+    done = {}
+    if Path(log_path).exists():
+        with open(log_path, "r") as f:
+            for line in f:
+                if line.strip():
+                    step = json.loads(line)
+                    done[_point_key(step["params"])] = step["target"]
+    return done
+
+def run_design(objective, points, log_path, workers=1, verbose=True):
+    """
+    Evaluates the points of a design on a bounded pool of workers, appending each result to a log as it completes.
+    The log uses the format of bayes_opt's JSONLogger, so it can be loaded as prior observations of an optimisation
+    (e.g. a Study's 'resume' setting). Points already in the log are skipped, so an interrupted sweep is resumed by
+    running it again with the same design and log; failed points are not logged and are retried.
+    objective (callable): Called with each point's parameters as keyword arguments, returns the target
+    points (list): Dictionaries mapping parameter slugs to values, see 'make_design'
+    log_path (Path): JSON lines log of the sweep
+    workers (int): Number of points evaluated concurrently [Default: 1]
+    Returns (list): (target, params) of every point of the design that has been evaluated, including earlier runs
+    """
+    log_path = Path(log_path)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    done = read_sweep_log(log_path)
+    todo = [params for params in points if _point_key(params) not in done]
+    if verbose:
+        print(f"{C.BOLD}{C.GREEN}Info{C.END} Sweep: {len(points) - len(todo)} of {len(points)} point(s) done, " +
+              f"{len(todo)} to run on {workers} worker(s)")
+    start = last = datetime.now()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Sweep") as pool:
+        futures = {pool.submit(objective, **params): params for params in todo}
+        for i, future in enumerate(as_completed(futures)):
+            params = futures[future]
+            try:
+                target = future.result()
+            except Exception as e:
+                print(f"{C.BOLD}{C.RED}Warning{C.END}: Sweep point failed ({e!r}), it will be retried on resume")
+                continue
+            now = datetime.now()
+            with open(log_path, "a") as f: # Results are only ever written from this thread
+                f.write(json.dumps({"target": target, "params": params,
+                                    "datetime": {"datetime": now.strftime("%Y-%m-%d %H:%M:%S"),
+                                                 "elapsed": (now - start).total_seconds(),
+                                                 "delta": (now - last).total_seconds()}}) + "\n")
+            last = now
+            done[_point_key(params)] = target
+            if verbose:
+                print(f"{C.BOLD}{C.GREEN}Info{C.END} Sweep point {i+1}/{len(todo)} (Target: {target})")
+    return [(done[_point_key(params)], params) for params in points if _point_key(params) in done]
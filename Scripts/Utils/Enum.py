@@ -17,4 +17,6 @@ class CommonDirs:
    REAL = Path(__file__).parent.parent / "Real_Data"
    LOGS = Path(__file__).parent.parent / "Logs"
    HYPERPARAMS = Path(__file__).parent.parent / "HyperParameters"
+   CACHE = Path(__file__).parent.parent / "Cache"
+   STUDIES = Path(__file__).parent.parent / "Studies"
    CASES = Path(__file__).parent.parent.parent / "Cases"
\ No newline at end of file
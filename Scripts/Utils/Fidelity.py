@@ -0,0 +1,134 @@
+from .Enum import Color as C
+from .Optimization import suggest_batch
+
+import math, numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from bayes_opt.event import Events
+
+FIDELITY_KEY = "Fidelity" # Extra surrogate dimension holding a trial's simulated duration (s)
+RESOLUTION_KEY = "Resolution" # Extra surrogate dimension if coarsened, scale applied to the particle spacing (dp)
+
+def fidelity_bounds(pbounds, min_duration, max_duration, coarsen=1.0, eta=3):
+    """Adds the fidelity (simulated duration) dimension to the parameter bounds, so all fidelities share one surrogate.
+    If trials are coarsened (see 'successive_halving'), their resolution is a dimension too: a coarse and a fine trial
+    at the same duration are different points"""
+    bounds = {**pbounds, FIDELITY_KEY: (min_duration, max_duration)}
+    if coarsen != 1.0:
+        scales = [coarsen**k for k in range(len(rungs(min_duration, max_duration, eta)))]
+        bounds[RESOLUTION_KEY] = (min(scales), max(scales))
+    return bounds
+
+def _config(params):
+    """Parameters of a point without its fidelity (duration and resolution)"""
+    return {k: v for k, v in params.items() if k not in [FIDELITY_KEY, RESOLUTION_KEY]}
+
+def rungs(min_duration, max_duration, eta=3):
+    """Durations (s) of successive halving rungs, growing geometrically (by about 'eta') from 'min_duration' to
+    'max_duration'. There are at least two rungs whenever 'min_duration' is shorter than 'max_duration'."""
+    if min_duration >= max_duration:
+        return [max_duration]
+    n = max(2, int(math.floor(math.log(max_duration / min_duration, eta) + 1e-9)) + 1)
+    return [round(float(d), 6) for d in np.geomspace(min_duration, max_duration, n)]
+
+def best_at_fidelity(optimizer, duration):
+    """Best registered point that was simulated for (at least) 'duration' seconds at full resolution, None if there
+    is none"""
+    res = [r for r in optimizer.res if r["params"].get(FIDELITY_KEY, 0.0) >= duration - 1e-9 and
+           abs(r["params"].get(RESOLUTION_KEY, 1.0) - 1.0) < 1e-9]
+    return max(res, key=lambda r: r["target"]) if res else None
+
+def _evaluate_rung(optimizer, candidates, duration, resolution, batch_size, verbose):
+    """Evaluates candidates at one fidelity concurrently, registering each result as soon as it is known"""
+    results = []
+    with ThreadPoolExecutor(max_workers=batch_size, thread_name_prefix="Trial") as pool:
+        futures = {}
+        for params in candidates:
+            params = {**params, FIDELITY_KEY: duration}
+            if RESOLUTION_KEY in optimizer.space.keys:
+                params[RESOLUTION_KEY] = resolution
+            futures[pool.submit(optimizer.space.target_func, **params)] = params
+        for future in as_completed(futures):
+            params = futures[future]
+            try:
+                target = future.result()
+            except Exception as e:
+                print(f"{C.BOLD}{C.RED}Warning{C.END}: Trial failed ({e!r}), it will not be promoted")
+                continue
+            try:
+                optimizer.register(params=params, target=target)
+            except KeyError: # Identical point was already registered
+                pass
+            results.append((target, params))
+    if verbose:
+        best = max([t for t, _ in results], default=float("nan"))
+        print(f"{C.BOLD}{C.GREEN}Info{C.END} Rung {duration:.3g}s: {len(results)} trial(s), best target {best:.5g}")
+    return results
+
+def successive_halving(optimizer, utility, n_candidates, min_duration, max_duration, eta=3, coarsen=1.0,
+                       batch_size=1, strategy="cl_min", verbose=True):
+    """
+    Evaluates many candidates at a short simulated duration and promotes the best 1/eta of them to the next (eta times
+    longer) duration, until 'max_duration' is reached. Results of every rung are registered with the optimizer, whose
+    bounds must include the FIDELITY_KEY dimension, and RESOLUTION_KEY if coarsened (see 'fidelity_bounds').
+    optimizer (BayesianOptimization): Optimizer whose target function accepts FIDELITY_KEY (and RESOLUTION_KEY)
+    utility (UtilityFunction): Acquisition function used to suggest the candidates
+    n_candidates (int): Number of candidates evaluated at the lowest fidelity
+    min_duration (float): Simulated duration (s) of the lowest rung
+    max_duration (float): Simulated duration (s) of the highest rung
+    eta (int): Reduction factor between rungs [Default: 3]
+    coarsen (float): Particle spacing at each rung is multiplied by coarsen^(rungs above it) [Default: 1.0, unchanged]
+    batch_size (int): Number of trials evaluated concurrently [Default: 1]
+    strategy (str): How pending candidates are treated when suggesting, see 'suggest_batch' [Default: 'cl_min']
+    Returns (list): (target, params) of the candidates that reached the highest rung
+    """
+    durations = rungs(min_duration, max_duration, eta)
+    if coarsen != 1.0 and RESOLUTION_KEY not in optimizer.space.keys:
+        raise ValueError(f"Coarsened trials need the '{RESOLUTION_KEY}' dimension, see 'fidelity_bounds'")
+    fixed = {FIDELITY_KEY: max_duration, **({RESOLUTION_KEY: 1.0} if RESOLUTION_KEY in optimizer.space.keys else {})}
+    # Candidates are chosen for how they would do at full length, the fidelity they are compared at in the end
+    suggestions = suggest_batch(optimizer, utility, n=n_candidates, strategy=strategy, fixed=fixed)
+    candidates = [_config(params) for params in suggestions]
+    results = []
+    for i, duration in enumerate(durations):
+        resolution = coarsen**(len(durations) - 1 - i)
+        results = _evaluate_rung(optimizer, candidates, duration, resolution, batch_size, verbose)
+        if i < len(durations) - 1: # Promote the best
+            results.sort(key=lambda r: r[0], reverse=True)
+            n_promoted = max(1, len(results) // eta) # Of the trials that succeeded
+            candidates = [_config(params) for _, params in results[:n_promoted]]
+    return results
+
+def hyperband(optimizer, utility, min_duration, max_duration, eta=3, coarsen=1.0, batch_size=1, strategy="cl_min",
+              verbose=True):
+    """
+    One round of Hyperband: runs successive halving brackets that trade off the number of candidates against the
+    duration they start at, from 'many short simulations' to 'few full-length simulations'.
+    See 'successive_halving' for the arguments.
+    """
+    durations = rungs(min_duration, max_duration, eta)
+    s_max = len(durations) - 1
+    for s in range(s_max, -1, -1):
+        n_candidates = int(math.ceil((s_max + 1) / (s + 1) * eta**s))
+        bracket_min = durations[s_max - s]
+        if verbose:
+            print(f"{C.BOLD}{C.GREEN}Info{C.END} Hyperband bracket {s_max - s + 1}/{s_max + 1}: " +
+                  f"{n_candidates} candidate(s) starting at {bracket_min:.3g}s")
+        successive_halving(optimizer, utility, n_candidates, bracket_min, max_duration, eta=eta, coarsen=coarsen,
+                           batch_size=batch_size, strategy=strategy, verbose=verbose)
+
+def maximize_multi_fidelity(optimizer, utility, min_duration, max_duration, mode="hyperband", n_iter=1, n_candidates=9,
+                            eta=3, coarsen=1.0, batch_size=1, strategy="cl_min", verbose=True):
+    """Multi-fidelity counterpart of BayesianOptimization.maximize, running 'n_iter' rounds of either
+    successive halving ('sh', starting with 'n_candidates' at 'min_duration') or Hyperband ('hyperband').
+    See 'successive_halving' for the remaining arguments."""
+    optimizer.dispatch(Events.OPTIMIZATION_START)
+    for _ in range(n_iter):
+        if mode == "sh":
+            successive_halving(optimizer, utility, n_candidates, min_duration, max_duration, eta=eta, coarsen=coarsen,
+                               batch_size=batch_size, strategy=strategy, verbose=verbose)
+        elif mode == "hyperband":
+            hyperband(optimizer, utility, min_duration, max_duration, eta=eta, coarsen=coarsen,
+                      batch_size=batch_size, strategy=strategy, verbose=verbose)
+        else:
+            raise ValueError(f"Unknown multi-fidelity mode '{mode}', choose from 'sh' or 'hyperband'")
+    optimizer.dispatch(Events.OPTIMIZATION_END)
@@ -1,4 +1,5 @@
 from .Enum import CommonDirs
+from .Storage import list_measurements
 
 def choose_from_folder(dir_path, condition = lambda x: True, item="item", glob_rule="**/*", choice=None):
     items =  [x for x in dir_path.glob(glob_rule) if condition(x)]
@@ -12,7 +13,7 @@ def choose_from_folder(dir_path, condition = lambda x: True, item="item", glob_r
     return items[int(resp)]
 
 def select_case():
-    case_name = choose_from_folder(CommonDirs.CASES, condition=lambda f: f.is_dir(),
+    case_name = choose_from_folder(CommonDirs.CASES, condition=lambda f: f.is_dir() and not f.name.startswith("."),
                                    item="case", glob_rule="*").name
     case_path = CommonDirs.CASES / case_name
     print(f"You selected the Case path: {case_path}")
@@ -29,7 +30,8 @@ def select_log():
 
 def choose_run_and_metric(preset=(None, None), verbose=True):
     measure_dir = CommonDirs.MEASURES / choose_from_folder(CommonDirs.MEASURES, condition=lambda x: x.is_dir(), choice=preset[0]) # 1
-    file = measure_dir / choose_from_folder(measure_dir, condition=lambda x: x.is_file(), choice=preset[1]) # 8
+    file = measure_dir / choose_from_folder(measure_dir, condition=lambda x: x in list_measurements(measure_dir),
+                                            choice=preset[1]) # 8
     if verbose:
         print(f"You selected the Measurement file: {file}")
     return measure_dir, file
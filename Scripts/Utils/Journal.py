@@ -0,0 +1,81 @@
+from .Enum import CommonDirs
+
+import os, json, threading, psutil as ps
+from datetime import datetime, timedelta
+from pathlib import Path
+
+JOURNAL_SUFFIX = "_JOURNAL.jsonl" # Replaces '_OPTIMIZATION_LOG.json' in the name of a session's optimisation log
+STATES = ["suggested", "launched", "completed", "failed"]
+WORKSPACE_MAX_AGE = 7.0 # Days the workspace of an unfinished trial is kept for recovery once its solver stopped
+
+def journal_path(log_path):
+    """Journal belonging to a session's optimisation log"""
+    log_path = Path(log_path)
+    return log_path.with_name(log_path.name.replace("_OPTIMIZATION_LOG.json", JOURNAL_SUFFIX))
+
+class TrialJournal():
+    """
+    Write-ahead log of a session's trials. Every change of a trial's state is appended (and synced to disk) before the
+    session acts on it, so a restarted session knows which trials were running and where:
+        'suggested' : params, batch number, measurement directory and simulated duration
+        'launched'  : PID (and creation time) of the launch script, trial workspace
+        'completed' : target
+        'failed'    : error
+    A trial's record is the union of its entries, later entries taking precedence.
+
+    path (Path): JSON lines file, created on the first entry
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def record(self, trial_id, state, **fields):
+        if state not in STATES:
+            raise ValueError(f"Unknown trial state '{state}', choose from {STATES}")
+        entry = {"trial": trial_id, "state": state, "time": datetime.now().isoformat(), **fields}
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno()) # Must survive the session dying right after
+
+    def trials(self):
+        """Returns (dict): Trial ID mapped to its merged record, in order of suggestion"""
+        trials = {}
+        if self.path.exists():
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError: # Entry cut short by a crash
+                        continue
+                    trials.setdefault(entry["trial"], {}).update(entry)
+        return trials
+
+    def unfinished(self):
+        """Returns (list): Records of trials that were suggested or launched, but never completed nor failed"""
+        return [trial for trial in self.trials().values() if trial["state"] in ["suggested", "launched"]]
+
+def solver_alive(trial):
+    """Whether the launch script recorded for a trial is still running (and is not a new process reusing its PID)"""
+    if trial.get("pid") is None:
+        return False
+    try:
+        process = ps.Process(trial["pid"])
+        return abs(process.create_time() - trial.get("create_time", process.create_time())) < 1.0 and \
+               process.status() != ps.STATUS_ZOMBIE
+    except ps.NoSuchProcess:
+        return False
+
+def unfinished_workspaces(log_dir=CommonDirs.LOGS, max_age=WORKSPACE_MAX_AGE):
+    """Workspaces of launched trials that no journal in 'log_dir' marks as completed or failed.
+    These may still be reattached to (or harvested), so they must not be removed as stale, as long as their solver runs
+    or the trial was last journaled less than 'max_age' days ago (older ones are never recovered in practice).
+    max_age (float): Days an unfinished trial's workspace is kept once its solver stopped [Default: WORKSPACE_MAX_AGE]"""
+    cutoff = datetime.now() - timedelta(days=max_age)
+    recent = lambda trial: datetime.fromisoformat(trial["time"]) >= cutoff if trial.get("time") else False
+    return {Path(trial["workspace"]) for path in Path(log_dir).glob(f"*{JOURNAL_SUFFIX}")
+            for trial in TrialJournal(path).unfinished()
+            if trial.get("workspace") and (recent(trial) or solver_alive(trial))}
@@ -0,0 +1,178 @@
+from .Enum import Color as C
+
+import time, atexit, threading, numpy as np, psutil as ps
+
+CPU_COLUMNS = ["Time (s)", "RAM Usage(MB)", "Virtual Memory(MB)", "CPU (%)", "No. Threads",
+               "CPU User Time (s)", "CPU System Time (s)", "No. Processes"]
+GPU_COLUMNS = ["GPU (%)", "GPU Memory Used (MB)", "GPU Memory (%)", "GPU Temp (C)"]
+LOG_COLUMNS = CPU_COLUMNS + GPU_COLUMNS # Of a new resource log, GPU columns stay empty (NaN) without a GPU
+_FLUSH_LOCK = threading.Lock() # Concurrent trials of one session append to the same log
+_GPU_LOCK = threading.Lock()
+_GPU = None
+
+class _GPUReader():
+    """Reads device-wide GPU statistics (summed/maxed over all GPUs) with whichever tooling is available.
+    The tooling is imported here, not with the module (GPUtil alone takes ~0.25s), so processes that never sample
+    start faster. One reader serves every trial of a process, see 'gpu_reader'."""
+
+    def __init__(self):
+        self.backend = None
+        try: # Preferred: queries the driver in-process
+            import pynvml
+            pynvml.nvmlInit()
+            atexit.register(pynvml.nvmlShutdown)
+            self.handles = [pynvml.nvmlDeviceGetHandleByIndex(i) for i in range(pynvml.nvmlDeviceGetCount())]
+            self.lib, self.backend = pynvml, "nvml"
+        except Exception: # Includes ImportError
+            pass
+        if self.backend is None:
+            try: # Fallback: shells out to nvidia-smi on every call
+                import GPUtil
+                if GPUtil.getGPUs():
+                    self.lib, self.backend = GPUtil, "gputil"
+            except Exception:
+                pass
+
+    def read(self):
+        if self.backend == "nvml":
+            nvml = self.lib
+            util = [nvml.nvmlDeviceGetUtilizationRates(h).gpu for h in self.handles]
+            mem = [nvml.nvmlDeviceGetMemoryInfo(h) for h in self.handles]
+            temp = [nvml.nvmlDeviceGetTemperature(h, nvml.NVML_TEMPERATURE_GPU) for h in self.handles]
+            return [max(util), sum(m.used for m in mem) / 1024**2,
+                    100.0 * sum(m.used for m in mem) / sum(m.total for m in mem), max(temp)]
+        if self.backend == "gputil":
+            gpus = self.lib.getGPUs()
+            return [max(g.load for g in gpus) * 100.0, sum(g.memoryUsed for g in gpus),
+                    100.0 * sum(g.memoryUsed for g in gpus) / sum(g.memoryTotal for g in gpus),
+                    max(g.temperature for g in gpus)]
+        return None
+
+def gpu_reader():
+    """Returns (_GPUReader): The process's GPU reader, created (and the GPU tooling initialised) on first use"""
+    global _GPU
+    with _GPU_LOCK:
+        if _GPU is None:
+            _GPU = _GPUReader()
+        return _GPU
+
+class ResourceSampler():
+    """
+    Samples the resource usage of a launched process and all of its descendants (e.g. launch script -> DualSPHysics)
+    on a background thread. Samples are kept in a fixed-size, in-memory ring of columns and written in bulk once the
+    trial ends, so sampling costs no file I/O and stays cheap even at sub-second intervals.
+    Missing GPU tooling (pynvml, GPUtil, or no GPU at all) only drops the GPU columns.
+
+    process (psutil.Process / psutil.Popen): Root of the process tree to follow
+    trial_id (str): Identifier written next to every sample
+    interval (float): Seconds between CPU/memory samples [Default: 1.0]
+    gpu_interval (float): Seconds between GPU samples, GPUtil starts a subprocess per sample [Default: 10.0]
+    capacity (int): Number of samples kept, older samples are overwritten first [Default: 4096]
+    """
+
+    def __init__(self, process, trial_id, interval=1.0, gpu_interval=10.0, capacity=4096):
+        self.root, self.trial_id = process, trial_id
+        self.interval, self.gpu_interval, self.capacity = interval, gpu_interval, capacity
+        self.gpu = gpu_reader()
+        self.columns = CPU_COLUMNS + (GPU_COLUMNS if self.gpu.backend else [])
+        self.samples = np.full((capacity, len(self.columns)), np.nan)
+        self.count = 0
+        self._procs = {} # pid -> Process, kept so cpu_percent() measures since the previous sample
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"ResourceSampler-{trial_id}", daemon=True)
+
+    def _tree(self):
+        try:
+            procs = [self.root] + self.root.children(recursive=True)
+        except ps.NoSuchProcess:
+            return []
+        for p in procs:
+            if p.pid not in self._procs:
+                self._procs[p.pid] = p
+                try: p.cpu_percent() # First call only sets the reference point
+                except ps.Error: pass
+        return [self._procs[p.pid] for p in procs]
+
+    def _sample(self, start, gpu_row):
+        rss = vms = cpu = threads = user = system = 0.0
+        procs = self._tree()
+        for p in procs:
+            try:
+                with p.oneshot():
+                    mem, times = p.memory_info(), p.cpu_times()
+                    cpu += p.cpu_percent()
+                    threads += p.num_threads()
+                rss, vms = rss + mem.rss, vms + mem.vms
+                user, system = user + times.user, system + times.system
+            except ps.Error: # Finished or inaccessible (e.g. started with sudo)
+                continue
+        row = [time.monotonic() - start, rss / 1024**2, vms / 1024**2, cpu, threads, user, system, len(procs)]
+        if self.gpu.backend:
+            row += gpu_row if gpu_row is not None else [np.nan] * len(GPU_COLUMNS)
+        self.samples[self.count % self.capacity] = row
+        self.count += 1
+
+    def _run(self):
+        start, last_gpu, gpu_row = time.monotonic(), -np.inf, None
+        while not self._stop.is_set():
+            if self.gpu.backend and time.monotonic() - last_gpu >= self.gpu_interval:
+                try:
+                    gpu_row = self.gpu.read()
+                except Exception:
+                    gpu_row = None
+                last_gpu = time.monotonic()
+            self._sample(start, gpu_row)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        return self
+
+    def data(self):
+        """Returns (ndarray): Retained samples in chronological order (samples × columns)"""
+        if self.count <= self.capacity:
+            return self.samples[:self.count]
+        split = self.count % self.capacity
+        return np.concatenate([self.samples[split:], self.samples[:split]])
+
+    def summary(self):
+        """Peak memory, mean/peak CPU and (if available) peak GPU usage of the trial"""
+        data = self.data()
+        if len(data) == 0:
+            return {}
+        col = {name: data[:, i] for i, name in enumerate(self.columns)}
+        summary = {"samples": self.count, "peak_ram_mb": float(np.nanmax(col["RAM Usage(MB)"])),
+                   "mean_cpu_percent": float(np.nanmean(col["CPU (%)"])),
+                   "peak_cpu_percent": float(np.nanmax(col["CPU (%)"]))}
+        if self.gpu.backend and not np.all(np.isnan(col["GPU (%)"])):
+            summary["peak_gpu_percent"] = float(np.nanmax(col["GPU (%)"]))
+            summary["peak_gpu_memory_mb"] = float(np.nanmax(col["GPU Memory Used (MB)"]))
+        return summary
+
+    def flush(self, path, batch=0):
+        """Appends all retained samples to a CSV file in one write, tagged with the trial ID and batch number.
+        Rows follow the columns of the file's header (LOG_COLUMNS if it is new), columns not sampled are NaN"""
+        data = self.data()
+        if len(data) == 0:
+            return
+        with _FLUSH_LOCK:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a+") as f:
+                f.seek(0)
+                header = f.readline().strip()
+                columns = header.split(",")[2:] if header else LOG_COLUMNS
+                if not header:
+                    f.write("Trial,Batch Number," + ",".join(columns) + "\n")
+                order = [self.columns.index(col) if col in self.columns else None for col in columns]
+                data = np.column_stack([data[:, i] if i is not None else np.full(len(data), np.nan) for i in order])
+                f.write("".join(f"{self.trial_id},{batch}," + ",".join(f"{v:.6g}" for v in row) + "\n"
+                                for row in data)) # Appended, whatever was read
+        if self.count > self.capacity:
+            print(f"{C.YELLOW}{C.BOLD}WARNING{C.END}::Trial {self.trial_id} kept only the last {self.capacity} " +
+                  f"of {self.count} resource samples")
@@ -2,14 +2,135 @@ from .Interaction import select_case
 from .Case_Handling import parse_case
 from .Enum import Color as C, CommonDirs
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import copy, time, numpy as np, warnings
+from bayes_opt.util import acq_max
+from bayes_opt.event import Events
 
 class CaseInfo():
-    """Stores information about a specific case"""
-    def __init__(self):
-        case_path, case_name = select_case()
+    """Stores information about a specific case.
+    case_name (str): Name of the case's directory in Cases/ [Default: None, choose interactively]"""
+    def __init__(self, case_name=None):
+        if case_name is None:
+            case_path, case_name = select_case()
+        else:
+            case_path = CommonDirs.CASES / case_name
+            if not case_path.is_dir():
+                raise FileNotFoundError(f"Case '{case_name}' not found in {CommonDirs.CASES}")
         case_def, tree = parse_case(case_path)
 
         self.case_path = case_path
         self.case_name = case_name
         self.case_def = case_def
-        self.tree = tree
\ No newline at end of file
+        self.tree = tree
+
+def _lie(strategy, gp, X_pending, targets):
+    """Fake target assumed for pending points until their real target is registered"""
+    if strategy == "kb": # Kriging Believer
+        return gp.predict(X_pending)
+    elif strategy in ["cl_min", "cl_mean", "cl_max"]: # Constant Liar
+        value = {"cl_min": np.min, "cl_mean": np.mean, "cl_max": np.max}[strategy](targets)
+        return np.full(len(X_pending), value)
+    raise ValueError(f"Unknown batch strategy '{strategy}', choose from 'cl_min', 'cl_mean', 'cl_max' or 'kb'")
+
+def suggest_batch(optimizer, utility, n=1, pending=(), strategy="cl_min", fixed=None):
+    """Suggests several points to probe concurrently, without modifying the optimizer's own observations.
+    Each suggestion is added to the pending points with a fake ('lie') target, so the next suggestion is pushed elsewhere.
+    optimizer (BayesianOptimization): Optimizer holding the observations and Gaussian Process settings
+    utility (UtilityFunction): Acquisition function to maximise
+    n (int): Number of new points to suggest [Default: 1]
+    pending (list): Points (dicts) that were suggested but whose target is not yet known [Default: ()]
+    strategy (str): Target assumed for pending points [Default: 'cl_min']
+        'cl_min'  : Constant Liar, worst target so far (pessimistic, spreads the batch out most)
+        'cl_mean' : Constant Liar, mean target so far
+        'cl_max'  : Constant Liar, best target so far (optimistic, favours exploitation)
+        'kb'      : Kriging Believer, Gaussian Process posterior mean at the pending point
+    fixed (dict): Parameters held at a value, points are suggested on that slice of the space [Default: None]
+    Returns (list): n dictionaries mapping parameter names to suggested values
+    """
+    space = optimizer.space
+    bounds = space.bounds.copy()
+    for key, value in (fixed or {}).items():
+        bounds[space.keys.index(key)] = value
+    if len(space) == 0: # Nothing to fit yet, explore randomly
+        return [space.array_to_params(np.clip(space.random_sample(), bounds[:, 0], bounds[:, 1])) for _ in range(n)]
+
+    X_obs, y_obs = space.params, space.target
+    X_pending = [space.params_to_array(p) for p in pending]
+    believer = copy.deepcopy(optimizer._gp) # Copies keep what an incremental surrogate already computed
+    suggestions = []
+    with warnings.catch_warnings(): # Sklearn's GP is noisy when refitting on few points
+        warnings.simplefilter("ignore")
+        if strategy == "kb":
+            believer.fit(X_obs, y_obs)
+        for _ in range(n):
+            gp = copy.deepcopy(optimizer._gp)
+            if X_pending:
+                X = np.vstack([X_obs, np.asarray(X_pending)])
+                y = np.concatenate([y_obs, _lie(strategy, believer, np.asarray(X_pending), y_obs)])
+            else:
+                X, y = X_obs, y_obs
+            gp.fit(X, y)
+            x = acq_max(ac=utility.utility, gp=gp, y_max=y_obs.max(), bounds=bounds,
+                        random_state=optimizer._random_state)
+            X_pending.append(x)
+            suggestions.append(space.array_to_params(x))
+    return suggestions
+
+def maximize_batch(optimizer, utility, init_points=0, n_iter=1, batch_size=1, strategy="cl_min", deadline=None,
+                   verbose=True):
+    """Asynchronous batch version of BayesianOptimization.maximize, keeping up to 'batch_size' trials running at once.
+    Whenever a trial finishes its target is registered and a replacement is suggested, taking running trials into account.
+    optimizer (BayesianOptimization): Optimizer whose target function is evaluated (must be thread-safe)
+    utility (UtilityFunction): Acquisition function to maximise
+    init_points (int): Number of random points to probe first [Default: 0]
+    n_iter (int): Number of points to probe using Bayesian Optimisation [Default: 1]
+    batch_size (int): Number of trials evaluated concurrently [Default: 1]
+    strategy (str): How pending points are treated when suggesting, see 'suggest_batch' [Default: 'cl_min']
+    deadline (float): time.monotonic() after which no trials are launched, running ones still finish [Default: None]
+    verbose (bool): Whether to print progress [Default: True]
+    Returns (int): Number of trials launched (random ones first), fewer than planned if the deadline passed
+    """
+    space = optimizer.space
+    if space.empty:
+        init_points = max(init_points, 1)
+    queue = [space.array_to_params(space.random_sample()) for _ in range(init_points)]
+    budget = len(queue) + n_iter
+    running, launched = {}, 0 # Future -> Parameters
+
+    optimizer.dispatch(Events.OPTIMIZATION_START)
+    with ThreadPoolExecutor(max_workers=batch_size, thread_name_prefix="Trial") as pool:
+        while budget > 0 or running:
+            if deadline is not None and time.monotonic() >= deadline: # Out of time, only wait for running trials
+                budget = 0
+            free = min(batch_size - len(running), budget)
+            if free > 0:
+                new = [queue.pop(0) for _ in range(min(free, len(queue)))]
+                if len(new) < free:
+                    for _ in range(free - len(new)):
+                        utility.update_params() # Kappa decay
+                    new += suggest_batch(optimizer, utility, n=free - len(new),
+                                         pending=list(running.values()) + new, strategy=strategy)
+                for params in new:
+                    running[pool.submit(space.target_func, **params)] = params
+                budget, launched = budget - len(new), launched + len(new)
+                if verbose:
+                    print(f"{C.BOLD}{C.GREEN}Info{C.END} Launched {len(new)} trial(s), {len(running)} running")
+
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                params = running.pop(future)
+                try:
+                    target = future.result()
+                except Exception as e:
+                    print(f"{C.BOLD}{C.RED}Warning{C.END}: Trial failed ({e!r}), continuing with remaining trials")
+                    continue
+                try:
+                    optimizer.register(params=params, target=target)
+                except KeyError: # Identical point was already registered
+                    print(f"{C.YELLOW}{C.BOLD}WARNING{C.END}::Duplicate point {params} not registered")
+    optimizer.dispatch(Events.OPTIMIZATION_END)
+    return launched
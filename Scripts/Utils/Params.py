@@ -1,7 +1,13 @@
 from .Enum import Color as C
 
+import copy
 import numpy as np, numpy
 from collections import OrderedDict
+from functools import lru_cache
+
+TYPE_KINDS = {elt: k for k, v in np.sctypes.items() for elt in v} # NumPy scalar type -> 'int', 'uint', 'float', ...
+# Type names as written in slugs ('<module>.<name>', see 'SimParam.__repr__'), resolved without 'eval'
+TYPE_NAMES = {f"{t.__module__}.{t.__name__}": t for t in list(TYPE_KINDS) + [int, float, bool]}
 
 class HyperParameters(object):
     """
@@ -102,7 +108,7 @@ class SimParam(object):
         self.sec_key = sec_key
 
     def _set_bound(self, bound):
-        type_lookup = {elt: k for k, v in np.sctypes.items() for elt in v}
+        type_lookup = TYPE_KINDS
         if bound is None: # Interactive
             name_lookup = {elt.__name__: elt for v in np.sctypes.values() for elt in v}
             type_str = "\n".join([f"{C.DARKCYAN}{C.BOLD}{k}{C.END}: " +
@@ -147,12 +153,74 @@ class SimParam(object):
         return (f"{self.id}::{self.attr}::{self.count}::{self.type.__module__}.{self.type.__name__}"+
                 f"::{self.default}::{self.sec_key}::{self.bounds}") 
 
-    def from_slug(slug): # Class Method
+    @staticmethod
+    def from_slug(slug):
+        """Parses a slug (see '__repr__') back into a SimParam. Each distinct slug is parsed once, every call returns
+        its own copy, which may be changed (e.g. its count)"""
+        return copy.copy(SimParam._parse_slug(slug))
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _parse_slug(slug):
+        """Returns (SimParam): Parsed slug, shared between calls, see 'from_slug'"""
         parts = slug.split("::")
         id, attr, count = parts[0], parts[1], int(parts[2])
-        param_type = eval(parts[3])
+        if parts[3] not in TYPE_NAMES:
+            raise ValueError(f"Unknown parameter type '{parts[3]}' in {slug}")
+        param_type = TYPE_NAMES[parts[3]]
         default = param_type(parts[4])
-        sec_key = tuple(parts[5].strip("()").split(",")) if parts[5].split(",") != "(None, None)" else (None, None)
+        # Quotes and 'None' are parsed back. Slugs of older logs (see 'legacy_slug') would resolve to the same key
+        sec_key = tuple([elt.strip(" '\"") for elt in parts[5].strip("()").split(",")])
+        sec_key = tuple([None if elt == "None" else elt for elt in sec_key])
         bounds = tuple([param_type(np.float64(elt)) for elt in parts[6].strip("()").split(",")]) # Casting ensures type is propagated correctly
         return SimParam(id, attr, default, count, bounds, sec_key)
-            
\ No newline at end of file
+
+def legacy_slug(slug):
+    """Whether a slug was written before secondary keys were parsed correctly, i.e. its secondary key holds quoted
+    strings or 'None' as a string. Values of such parameters were written to the last node with the same tag (e.g.
+    TimeMax instead of Visco), so results logged under them do not belong to the parameter they name"""
+    parts = slug.split("::")
+    if len(parts) != 7:
+        return False
+    elements = [elt.strip() for elt in parts[5].strip("()").split(",")]
+    return any(len(elt) > 1 and elt[0] == elt[-1] and elt[0] in "'\"" and
+               (elt[1:-1].strip() == "None" or any(quote in elt[1:-1] for quote in "'\"")) for elt in elements)
+
+class ParamSpace():
+    """
+    Simulation parameters compiled once (slug positions, types, which values are discrete), so the values of a
+    suggestion are written to a Case (Def)inition without parsing slugs or looking up SimParam objects for every trial.
+    Parameters keep the order of 'params', which is also the order of 'CaseTemplate' slots built from it.
+
+    params (HyperParameters / list): Simulation parameters (SimParam objects or their slugs)
+    """
+
+    def __init__(self, params):
+        params = list(params.keys()) if isinstance(params, HyperParameters) else list(params)
+        self.params = [SimParam.from_slug(p) if isinstance(p, str) else p for p in params]
+        self.slugs = [repr(param) for param in self.params]
+        self.index = {slug: i for i, slug in enumerate(self.slugs)} # Slug -> position
+        self.types = [param.type for param in self.params]
+        kinds = [TYPE_KINDS.get(t, "float" if t is float else "int" if t is int else "bool") for t in self.types]
+        self._discrete = [kind != "float" for kind in kinds]
+
+    def __len__(self):
+        return len(self.params)
+
+    def position(self, key):
+        """Returns (int): Position of a parameter, given as slug or SimParam"""
+        return self.index[key if isinstance(key, str) else repr(key)]
+
+    def strings(self, values):
+        """Values as written to the Case (Def)inition (see 'Bindings.cast_value'): continuous values as given,
+        discrete values cast to their type first.
+        values (dict / list): Point as dictionary (keys: slugs or SimParams) or vector
+        Returns (list): Strings in parameter order"""
+        items = values.items() if isinstance(values, dict) else enumerate(values)
+        out = [None] * len(self.params)
+        for key, value in items:
+            i = key if isinstance(key, int) else self.position(key)
+            out[i] = str(self.types[i](value)) if self._discrete[i] else str(value)
+        if None in out:
+            raise KeyError(f"Missing values for {[slug for slug, v in zip(self.slugs, out) if v is None]}")
+        return out
@@ -1,24 +1,31 @@
-import matplotlib.pyplot as plt,pandas as pd, csv, numpy as np, math
+import csv
 
-from .Enum import CommonDirs
+from .Scoring import load_simulated, real_batches, score, comparison_frame, ALIGNED_METRICS
+from .Storage import read_header, find_table, MeasurementTable
+from .Rendering import plot_series
+from .Tracing import traced
 
+@traced("measurements.points")
 def extract_points(file, verbose=True):
-    with open(file) as csvfile:
-        measure_reader = csv.reader(csvfile, delimiter=";")
-        point_list = [float(point) for point in measure_reader.__next__()[2:]]
-        points = {i: (point_list[3*i:3*i+3]) for i in range(len(point_list) // 3)}
-        columns = measure_reader.__next__()
-        if verbose:
-            print("Points: ", points)            
-            width = len(max(columns, key = lambda k: len(k)))
-            print(" ".join([col.center(width) for col in columns]))
-            for i, row in enumerate(measure_reader):
-                if i == 0: continue # 1st step is empty
-                print(" ".join([f"{rsound(float(elt), 5)}".center(width) for elt in row]))
-                if i > 5: break
+    """Point coordinates and column names of a MeasureTool output (CSV, or columnar table, see 'Storage')"""
+    table = MeasurementTable(file) if find_table(file) is not None else None
+    points, columns = (table.points, table.columns) if table is not None else read_header(file)
+    if verbose:
+        print("Points: ", points)
+        width = len(max(columns, key = lambda k: len(k)))
+        print(" ".join([col.center(width) for col in columns]))
+        if table is not None:
+            rows = table.array([col for col in columns if col != ""])[1:7] # 1st step is empty
+        else:
+            with open(file) as csvfile:
+                measure_reader = csv.reader(csvfile, delimiter=";")
+                rows = [row for i, row in zip(range(9), measure_reader) if i > 2] # Skip header and 1st step
+        for row in rows:
+            print(" ".join([f"{round(float(elt), 5)}".center(width) for elt in row if elt != ""]))
     return points, columns
             
-def sim_real_difference(file, points, method=None, delay=0, batch=0):
+@traced("score")
+def sim_real_difference(file, points, method=None, delay=0, batch=0, store=None, max_lag=0):
     """Compares the simulated measurements to the real data using specific method
     file (Path): Path to CSV file containing velocity readings for current step
     points (Dict): Dictionary mapping integers to 3-tuples representing point coordinates
@@ -26,60 +33,29 @@ def sim_real_difference(file, points, method=None, delay=0, batch=0):
         None  : Return data instead
         'mad' : Mean Absolute Difference
         'mse' : Mean Square Error 
+        Or any other metric in Scoring.METRICS
     delay (int): How many time steps to skip from simulated data when comparing [Default: 0]
-    batch (int): Which batch in the real data to compare to [Default: 0]"""
-    df_simul = pd.read_csv(file, sep=";", index_col=0, header=1)
+    batch (int): Which batch in the real data to compare to, None for the mean over all batches (as a Study scores
+        trials) [Default: 0]
+    store (RealDataStore): Source of the Real Data (LDV Measurements inside Flume) [Default: None, shared store]
+    max_lag (int): Largest phase shift (time steps) compensated by aligned metrics [Default: 0]"""
+    sim = load_simulated(file, points, delay=delay) # Optional delay allows for simulation to stabilise
+    if method is None: # Return as DataFrame
+        return comparison_frame(sim, points, batch=batch or 0, store=store)
+    # Compare to real data, shifted by batch_number. Delay not needed here.
+    max_lag = max_lag if method in ALIGNED_METRICS else 0
+    _, real = real_batches(points, sim.shape[1], batches=None if batch is None else [batch], store=store,
+                           margin=max_lag)
+    average_distance = score(sim, real, metrics=[method], max_lag=max_lag)[method]["mean"]
+    return 1.0 / average_distance # Inverted as we want to maximise the objective
 
-    dfs_real = {} # Read the Real Data (LDV Measurements inside Flume)
-    for point in points.values():
-        loc = int(point[0])
-        height = "Bottom" if point[2] < 0.8 else "Top" if point[2] > 1.2 else "Middle"
-        dfs_real[loc] = pd.read_csv(CommonDirs.REAL / f"Data_Depth{1000}mm_Upstream{loc}m_{height}.txt",
-                                    sep="\s", names=["Time","Velocity"], engine="python")
-
-    running_sum = 0
-    data = {"Time": [], "Vel_X_Sim": [], "Vel_X_Real": [], "X": [], "Y": [], "Z": []}
-    for point_no, point in points.items():
-        (x,y,z) = points[point_no]
-        simulated_x_velocity = df_simul[f"Vel_{point_no}.x [m/s]"][delay:] # Optional delay allows for simulation to stabilise
-        batch_size = len(simulated_x_velocity)
-        # Compare to real data, shifted by batch_number. Delay not needed here. 
-        real_x_velocity = np.roll(dfs_real[loc]["Velocity"], batch*batch_size)[0: batch_size] # Will eventually wrap around
-        time = np.roll(dfs_real[loc]["Time"], batch*batch_size)[0: batch_size]
-        if method == "mad": # Mean Absolute Difference
-            abs_differences = np.absolute(np.subtract(simulated_x_velocity, real_x_velocity))
-            running_sum += np.mean(abs_differences)
-        elif method == "mse": # Mean Square Error
-            square_dist = np.power(np.subtract(simulated_x_velocity, real_x_velocity), 2)
-            running_sum += np.mean(square_dist)
-        else: # Return as DataFrame
-            data["Time"].extend(time); data["Vel_X_Sim"].extend(simulated_x_velocity); data["Vel_X_Real"].extend(real_x_velocity)
-            data["X"].extend([x]*len(time)); data["Y"].extend([y]*len(time)); data["Z"].extend([z]*len(time))
-    if method is None:
-        return pd.DataFrame(data)
-    else:
-        average_distance = running_sum / len(points) # Taking mean of subsets == mean of all data
-        return 1.0 / average_distance # Inverted as we want to maximise the objective
-
-def plot_measurement_by_loc(df, points, batch=0, save_path=None, show=True):
-    fig, axes = plt.subplots(nrows=math.ceil(len(points)/2), ncols=2, sharey=True,
-                            figsize=(16, math.ceil(len(points)/2)*9))
+@traced("plot")
+def plot_measurement_by_loc(df, points, batch=0, save_path=None, show=True, max_points=1000):
+    """Plots the simulated and real X velocity at every point of a comparison DataFrame (see 'comparison_frame').
+    max_points (int): Samples plotted per line, longer series are downsampled with LTTB [Default: 1000]"""
+    groups = {key: subset for key, subset in df.groupby(["X", "Y", "Z"], sort=False)} # One pass, not a mask per point
+    series = []
     for point_no in range(len(points)):
-        point = points[point_no]
-        ax = axes[(math.floor(point_no/2), point_no % 2) if len(points) > 2 else point_no]
-
-        subset = df.loc[(df.X == point[0]) & (df.Y == point[1]) & (df.Z == point[2])]
-        ax.plot(subset.Time, subset.Vel_X_Sim, color="blue", label="Simulated")
-
-        loc = int(points[point_no][0]-4)
-        ax.plot(subset.Time, subset.Vel_X_Real, color="red", label="Objective") # The Objective Function! 
-        ax.set(title=f"Measurement at X: {points[point_no][0]}m, Y: {points[point_no][1]}m, Z: {points[point_no][2]}m",
-               xlabel="Time (s)", ylabel="Velocity_X (m/s)" if point_no % 2 == 0 else None,
-               xlim=(min(subset.Time),max(subset.Time)))
-        ax.legend()
-    plt.tight_layout(h_pad=24.0)
-    if save_path is not None:
-        plt.savefig(save_path)
-    if show:
-        plt.show()
-    plt.close()
\ No newline at end of file
+        subset = groups[tuple(points[point_no])]
+        series.append((subset.Time.to_numpy(), subset.Vel_X_Sim.to_numpy(), subset.Vel_X_Real.to_numpy()))
+    plot_series(series, points, save_path=save_path, show=show, max_points=max_points)
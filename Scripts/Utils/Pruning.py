@@ -0,0 +1,168 @@
+from .Enum import Color as C
+from .Scoring import real_batches
+
+import threading, numpy as np
+from pathlib import Path
+
+class TrialPruned(Exception):
+    """Raised when a running trial is stopped early because it is unlikely to beat previous trials"""
+    def __init__(self, trial_id, step, error):
+        super().__init__(f"Trial {trial_id} pruned at step {step} (partial error {error:.5g})")
+        self.trial_id, self.step, self.error = trial_id, step, error
+
+class MeasurementTail():
+    """
+    Incrementally reads the X velocities of a MeasureTool CSV that is still being written.
+    Only complete lines appended since the previous read are parsed.
+
+    out_path (Path): Solver output directory ('<case>_out') of the trial
+    pattern (str): Glob pattern, relative to 'out_path', of the CSV to follow [Default: 'measurements/*_Vel.csv']
+    """
+
+    def __init__(self, out_path, pattern="measurements/*_Vel.csv"):
+        self.out_path = Path(out_path)
+        self.pattern = pattern
+        self.file = None
+        self.points, self.columns = None, None
+        self._offset, self._buffer, self._header = 0, b"", []
+
+    def read(self):
+        """Returns (ndarray): (new time steps × points) X velocities, empty if nothing new was written"""
+        if self.file is None:
+            matches = sorted(self.out_path.glob(self.pattern))
+            if not matches:
+                return np.empty((0, 0))
+            self.file = matches[0]
+        with open(self.file, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read()
+        self._offset += len(chunk)
+        lines = (self._buffer + chunk).split(b"\n")
+        self._buffer = lines.pop() # Last line may be incomplete
+        rows = []
+        for line in lines:
+            fields = line.decode(errors="ignore").strip().split(";")
+            if self.columns is None: # Header: point coordinates, then column names
+                self._header.append(fields)
+                if len(self._header) == 2:
+                    point_list = [float(p) for p in self._header[0][2:] if p != ""]
+                    self.points = {i: point_list[3*i:3*i+3] for i in range(len(point_list) // 3)}
+                    self.columns = [self._header[1].index(f"Vel_{i}.x [m/s]") for i in self.points]
+                continue
+            try:
+                rows.append([float(fields[col]) for col in self.columns])
+            except (ValueError, IndexError):
+                continue
+        return np.asarray(rows, dtype=np.float64).reshape(len(rows), len(self.columns) if self.columns else 0)
+
+class PartialError():
+    """
+    Running Mean Square Error of a trial against every real data batch, updated as the simulation progresses.
+    tail (MeasurementTail): Source of the simulated velocities
+    batch_size (int): Number of compared time steps expected once the trial finishes (i.e. after the delay)
+    delay (int): How many time steps to skip from simulated data when comparing [Default: 0]
+    store (RealDataStore): Source of the Real Data [Default: None, shared store]
+    """
+
+    def __init__(self, tail, batch_size, delay=0, store=None):
+        self.tail, self.batch_size, self.delay, self.store = tail, batch_size, delay, store
+        self.real = None
+        self.step, self.sum_sq = 0, None
+        self.curve = [] # (step, error) after every update with new data
+
+    def update(self):
+        """Reads newly written time steps. Returns (float): Current partial error, None if nothing was compared yet"""
+        rows = self.tail.read()
+        if len(rows) == 0:
+            return self.error
+        if self.real is None:
+            _, self.real = real_batches(self.tail.points, self.batch_size, store=self.store) # (batches × points × time)
+            self.sum_sq = np.zeros(self.real.shape[0])
+        first = self.step
+        self.step += len(rows)
+        lo, hi = max(first, self.delay) - self.delay, min(self.step - self.delay, self.real.shape[2])
+        if hi > lo:
+            sim = rows[max(first, self.delay) - first:][:hi - lo].T # (points × time)
+            self.sum_sq += np.sum(np.square(sim[None] - self.real[:, :, lo:hi]), axis=(1, 2))
+            self.curve.append((hi, self.error))
+        return self.error
+
+    @property
+    def compared(self):
+        return max(0, min(self.step - self.delay, self.real.shape[2] if self.real is not None else 0))
+
+    @property
+    def error(self):
+        if self.sum_sq is None or self.compared == 0:
+            return None
+        return float(np.mean(self.sum_sq) / (self.compared * self.real.shape[1]))
+
+class MedianPruner():
+    """
+    Prunes a trial whose partial error is worse than the median partial error of previous trials at the same step.
+    warmup_steps (int): Never prune before this many time steps were compared [Default: 120]
+    min_trials (int): Number of finished trials required before pruning starts [Default: 5]
+    """
+
+    def __init__(self, warmup_steps=120, min_trials=5):
+        self.warmup_steps, self.min_trials = warmup_steps, min_trials
+        self.curves = []
+        self._lock = threading.Lock()
+
+    def report(self, curve):
+        """Stores the (step, error) curve of a finished (not pruned) trial"""
+        if curve:
+            with self._lock:
+                self.curves.append(np.asarray(curve, dtype=np.float64))
+
+    def should_prune(self, step, error):
+        with self._lock:
+            curves = list(self.curves)
+        if step < self.warmup_steps or len(curves) < self.min_trials:
+            return False
+        errors = [np.interp(step, c[:, 0], c[:, 1]) for c in curves if c[0, 0] <= step]
+        return len(errors) >= self.min_trials and error > np.median(errors)
+
+class ThresholdPruner():
+    """
+    Prunes a trial whose partial error exceeds a multiple of the best final error found so far.
+    optimizer (BayesianOptimization): Source of the best target (1/error) so far
+    factor (float): Multiple of the best error above which a trial is pruned [Default: 3.0]
+    warmup_steps (int): Never prune before this many time steps were compared [Default: 120]
+    """
+
+    def __init__(self, optimizer, factor=3.0, warmup_steps=120):
+        self.optimizer, self.factor, self.warmup_steps = optimizer, factor, warmup_steps
+
+    def report(self, curve):
+        pass
+
+    def should_prune(self, step, error):
+        best = self.optimizer.max.get("target")
+        if step < self.warmup_steps or not best or best <= 0:
+            return False
+        return error > self.factor * (1.0 / best)
+
+class PruningWatcher():
+    """
+    Callable passed to 'run_simulation', polled while the solver runs. Raises TrialPruned once the pruner fires.
+    trial_id (str): Identifier of the trial, used in messages
+    partial (PartialError): Running error of the trial
+    pruner (MedianPruner / ThresholdPruner): Rule deciding when to stop
+    """
+
+    def __init__(self, trial_id, partial, pruner, verbose=True):
+        self.trial_id, self.partial, self.pruner, self.verbose = trial_id, partial, pruner, verbose
+
+    def __call__(self):
+        error = self.partial.update()
+        if error is not None and self.pruner.should_prune(self.partial.compared, error):
+            if self.verbose:
+                print(f"{C.YELLOW}{C.BOLD}WARNING{C.END}::Pruning trial {self.trial_id} at step " +
+                      f"{self.partial.compared} (partial MSE {error:.5g})")
+            raise TrialPruned(self.trial_id, self.partial.compared, error)
+
+    def finish(self):
+        """Reads the remaining output of a finished trial and reports its error curve to the pruner"""
+        self.partial.update()
+        self.pruner.report(self.partial.curve)
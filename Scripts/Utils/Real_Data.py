@@ -0,0 +1,98 @@
+from .Enum import Color as C, CommonDirs
+
+import os, threading, numpy as np
+from pathlib import Path
+
+def height_label(z):
+    """Maps the height (Z coordinate, m) of a measurement point to the label used in the LDV file names"""
+    return "Bottom" if z < 0.8 else "Top" if z > 1.2 else "Middle"
+
+def real_data_name(loc, height, depth=1000):
+    """Name (without suffix) of the LDV recording at a given upstream location (m), height label and depth (mm)"""
+    return f"Data_Depth{depth}mm_Upstream{loc}m_{height}"
+
+class RealDataStore():
+    """
+    Binary, memory-mapped store of the real (LDV) velocity recordings in 'Real_Data'.
+    Each text file is converted once to a '.npy' array of shape (2, 2N), holding Time and Velocity of the N samples
+    twice in a row. Any window of up to N samples, including ones that wrap around the end of the recording, is
+    therefore a contiguous slice and is returned as a zero-copy view. Being memory-mapped, recordings are read
+    lazily and the pages are shared between all processes using the same store.
+
+    real_dir (Path): Directory containing the LDV text files [Default: CommonDirs.REAL]
+    store_dir (Path): Directory for the converted arrays [Default: '<real_dir>/.store']
+    """
+
+    def __init__(self, real_dir=CommonDirs.REAL, store_dir=None):
+        self.real_dir = Path(real_dir)
+        self.store_dir = Path(store_dir) if store_dir is not None else self.real_dir / ".store"
+        self._recordings = {}
+        self._lock = threading.Lock()
+
+    def _convert_file(self, txt_path, npy_path):
+        data = np.loadtxt(txt_path, usecols=(0, 1), dtype=np.float64, ndmin=2).T # (2, N): Time, Velocity
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = npy_path.with_name(f".{npy_path.stem}-{os.getpid()}-{threading.get_ident()}.npy")
+        np.save(tmp_path, np.ascontiguousarray(np.concatenate([data, data], axis=1)))
+        os.replace(tmp_path, npy_path) # Atomic, so concurrent workers never read a partial file
+
+    def convert(self, force=False, verbose=False):
+        """Converts all text recordings whose binary version is missing or out of date
+        force (bool): Convert even if the binary version is up to date [Default: False]
+        Returns (list): Names of the converted recordings"""
+        converted = []
+        for txt_path in sorted(self.real_dir.glob("Data_*.txt")):
+            npy_path = self.store_dir / (txt_path.stem + ".npy")
+            if force or not npy_path.exists() or npy_path.stat().st_mtime < txt_path.stat().st_mtime:
+                self._convert_file(txt_path, npy_path)
+                converted.append(txt_path.stem)
+        if verbose:
+            print(f"{C.BOLD}{C.GREEN}Info{C.END} Converted {len(converted)} real data file(s) to {self.store_dir}")
+        return converted
+
+    def recording(self, name):
+        """Memory-mapped (2, 2N) array of a recording, converting it first if needed"""
+        with self._lock:
+            if name not in self._recordings:
+                txt_path, npy_path = self.real_dir / (name + ".txt"), self.store_dir / (name + ".npy")
+                if not npy_path.exists() or (txt_path.exists() and npy_path.stat().st_mtime < txt_path.stat().st_mtime):
+                    if not txt_path.exists():
+                        raise FileNotFoundError(f"No real data recording named '{name}' in {self.real_dir}")
+                    self._convert_file(txt_path, npy_path)
+                self._recordings[name] = np.load(npy_path, mmap_mode="r")
+            return self._recordings[name]
+
+    def length(self, name):
+        """Number of samples (N) in a recording"""
+        return self.recording(name).shape[1] // 2
+
+    def window(self, name, start, length):
+        """
+        Zero-copy view of 'length' consecutive samples, starting at sample 'start' (wraps around the recording).
+        Returns (ndarray): Read-only (2, length) view holding Time and Velocity
+        """
+        rec = self.recording(name)
+        n = rec.shape[1] // 2
+        length = min(length, n)
+        start = start % n
+        return rec[:, start:start + length]
+
+    def batch_window(self, name, batch, batch_size):
+        """
+        Zero-copy view of the real data to compare batch number 'batch' to.
+        Identical to 'np.roll(data, batch*batch_size)[0:batch_size]', i.e. batches step backwards through the recording.
+        """
+        return self.window(name, -batch * batch_size, batch_size)
+
+    def point_window(self, point, batch, batch_size, depth=1000):
+        """Zero-copy view of the real data at a measurement point (3-tuple of coordinates), see 'batch_window'"""
+        return self.batch_window(real_data_name(int(point[0]), height_label(point[2]), depth), batch, batch_size)
+
+_DEFAULT_STORE = None
+
+def default_store():
+    """Store shared by everything in this process that reads from CommonDirs.REAL"""
+    global _DEFAULT_STORE
+    if _DEFAULT_STORE is None:
+        _DEFAULT_STORE = RealDataStore()
+    return _DEFAULT_STORE
@@ -0,0 +1,156 @@
+from .Enum import Color as C
+from .Scoring import real_batches
+
+import os, math, atexit, threading, numpy as np, multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling: keeps the first and last samples and, from each of 'n_out' - 2 equal
+    buckets in between, the sample forming the largest triangle with the previously kept sample and the mean of the
+    next bucket. Peaks and troughs survive, unlike with striding or averaging.
+    Returns (ndarray): Indices of the kept samples, in increasing order (all indices if 'n_out' >= len(x))
+    """
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = (np.arange(n_out - 1) * ((n - 2) / (n_out - 2))).astype(np.int64) + 1 # Bucket k is [edges[k], edges[k+1])
+    bounds = np.append(edges, n)
+    # Mean of every bucket (and of the last sample, which follows the last bucket), independent of the kept samples
+    mean_x = np.add.reduceat(x, bounds[:-1]) / np.diff(bounds)
+    mean_y = np.add.reduceat(y, bounds[:-1]) / np.diff(bounds)
+    index = np.empty(n_out, dtype=np.int64)
+    index[0], index[-1], a = 0, n - 1, 0
+    for k in range(n_out - 2):
+        start, end = edges[k], edges[k + 1]
+        area = np.abs((x[a] - mean_x[k + 1]) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (mean_y[k + 1] - y[a]))
+        a = start + int(np.argmax(area))
+        index[k + 1] = a
+    return index
+
+def downsample(x, y, n_out=1000):
+    """Returns (2-tuple): 'x' and 'y' reduced to at most 'n_out' samples with 'lttb'"""
+    index = lttb(x, y, n_out)
+    return np.asarray(x)[index], np.asarray(y)[index]
+
+def plot_series(series, points, save_path=None, show=False, max_points=1000):
+    """
+    Simulated and real X velocity at every measurement point, one subplot per point (two per row).
+    series (list): (time, simulated, real) arrays of each point, in point order
+    points (Dict): Dictionary mapping integers to 3-tuples representing point coordinates
+    max_points (int): Samples plotted per line, longer series are downsampled with 'lttb' [Default: 1000]
+    """
+    figsize = (16, math.ceil(len(points)/2)*9)
+    if show: # Interactive, needs pyplot
+        import matplotlib.pyplot as plt
+        fig, axes = plt.subplots(nrows=math.ceil(len(points)/2), ncols=2, sharey=True, figsize=figsize)
+    else: # No global pyplot state, safe in worker threads and processes
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=figsize)
+        axes = fig.subplots(nrows=math.ceil(len(points)/2), ncols=2, sharey=True)
+    for point_no, (time, sim, real) in enumerate(series):
+        point = points[point_no]
+        ax = axes[(math.floor(point_no/2), point_no % 2) if len(points) > 2 else point_no]
+        ax.plot(*downsample(time, sim, max_points), color="blue", label="Simulated")
+        ax.plot(*downsample(time, real, max_points), color="red", label="Objective") # The Objective Function!
+        ax.set(title=f"Measurement at X: {point[0]}m, Y: {point[1]}m, Z: {point[2]}m",
+               xlabel="Time (s)", ylabel="Velocity_X (m/s)" if point_no % 2 == 0 else None,
+               xlim=(min(time), max(time)))
+        ax.legend()
+    fig.tight_layout(h_pad=24.0)
+    if save_path is not None:
+        fig.savefig(save_path)
+    if show:
+        plt.show()
+        plt.close(fig)
+    return save_path
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg") # Never open windows from a worker
+
+def _noop():
+    return None
+
+class RenderQueue():
+    """
+    Renders figures in the background, so callers (e.g. the optimisation objective) never wait on matplotlib.
+    On POSIX systems figures are rendered by a pool of forked worker processes, started as soon as the queue is
+    created: fork before the session starts its own threads. Elsewhere (spawned processes would re-run the calling
+    script) a thread pool is used instead. Once 'max_pending' figures are queued, 'submit' waits for one to finish.
+    Rendering errors are reported, never raised.
+
+    workers (int): Number of worker processes (threads) [Default: 1]
+    max_pending (int): Largest number of queued figures [Default: 16]
+    """
+
+    def __init__(self, workers=1, max_pending=16):
+        self.workers, self.max_pending = workers, max_pending
+        self.rendered, self.failed = 0, 0
+        self._pending = set()
+        self._lock = threading.Lock()
+        if "fork" in mp.get_all_start_methods():
+            self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("fork"),
+                                             initializer=_init_worker)
+            self._pool.submit(_noop).result() # Fork all workers now, while it is safe to
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Render")
+
+    def _done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.rendered += 1
+        if not future.cancelled() and future.exception() is not None:
+            print(f"{C.BOLD}{C.RED}Warning{C.END}: Could not render figure ({future.exception()!r})")
+
+    def submit(self, fn, *args, **kwargs):
+        """Queues 'fn(*args, **kwargs)' (picklable, e.g. 'plot_series'). Returns (Future): Its result"""
+        while True:
+            with self._lock:
+                pending = set(self._pending)
+            if len(pending) < self.max_pending:
+                break
+            wait(pending, return_when=FIRST_COMPLETED) # Back-pressure
+        future = self._pool.submit(fn, *args, **kwargs)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def wait(self):
+        """Blocks until every queued figure is rendered"""
+        with self._lock:
+            pending = set(self._pending)
+        wait(pending)
+
+    def close(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+_default_queue, _default_lock = None, threading.Lock()
+
+def default_queue():
+    """Render queue shared by everything in this process, created (and its workers started) on first use"""
+    global _default_queue
+    with _default_lock:
+        if _default_queue is None:
+            _default_queue = RenderQueue(workers=max(1, min(2, (os.cpu_count() or 1) // 4)))
+            atexit.register(_default_queue.close) # Finish queued figures before exiting
+    return _default_queue
+
+def comparison_series(sim, points, batch=0, store=None):
+    """(time, simulated, real) arrays of every point, comparing a trial to one real data batch (see 'plot_series').
+    sim (ndarray): (points × time) simulated velocities"""
+    time, real = real_batches(points, sim.shape[1], batches=[batch], store=store)
+    length = time.shape[-1]
+    return [(time[0, i], sim[i, :length], real[0, i]) for i in range(len(points))]
+
+def render_comparison(sim, points, batch=0, save_path=None, store=None, queue=None, max_points=1000):
+    """Queues the figure comparing a trial's simulated velocities to one real data batch (see 'comparison_series').
+    The real data is gathered here, so only plain arrays are sent to the worker.
+    Returns (Future): Resolves to 'save_path' once the figure is saved"""
+    series = comparison_series(sim, points, batch=batch, store=store)
+    return (queue or default_queue()).submit(plot_series, series, points, save_path=save_path, max_points=max_points)
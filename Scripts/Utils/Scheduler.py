@@ -0,0 +1,110 @@
+from .Enum import Color as C
+from .Tracing import span
+
+import threading, numpy as np, psutil as ps
+from contextlib import contextmanager
+
+MIN_THREADS = 2 # OpenMP threads per trial when packing automatically, with fewer serial phases (GenCase, ...) dominate
+RESERVE_MB = 1024.0 # Memory left to the system and this process
+
+def usable_cpus():
+    """Returns (list): Logical CPUs this process may run on (respects taskset / cgroup limits where supported)"""
+    try:
+        return sorted(ps.Process().cpu_affinity())
+    except (AttributeError, ps.Error): # Not supported, e.g. macOS
+        return list(range(ps.cpu_count(logical=True) or 1))
+
+def split_cpus(cpus, slots):
+    """Splits CPUs into 'slots' disjoint, contiguous sets (as even as possible).
+    Returns (list): One list of CPUs per slot"""
+    return [chunk.tolist() for chunk in np.array_split(np.asarray(cpus, dtype=int), slots) if len(chunk)]
+
+def memory_estimate(index, case_name, resolution=None, quantile=0.9):
+    """Peak memory of one simulation of a case, from the resource usage of its previous trials (see 'Trial_Index').
+    resolution (float): Only trials at this particle spacing multiplier [Default: None, any]
+    quantile (float): Quantile of the recorded peaks, leaving room for larger runs [Default: 0.9]
+    Returns (float): Megabytes, None if no trial of the case recorded its memory"""
+    if index is None:
+        return None
+    peaks = [trial["peak_ram_mb"] for trial in index.query(case=case_name, order="finished DESC", limit=50)
+             if trial["peak_ram_mb"] is not None and (resolution is None or trial["resolution"] in [None, resolution])]
+    return float(np.quantile(peaks, quantile)) if peaks else None
+
+def plan(slots=None, threads=None, memory_mb=None, cpus=None, available_mb=None, reserve_mb=RESERVE_MB):
+    """
+    How many CPU-solver trials run at once, and on which cores, without oversubscribing cores or memory.
+    slots (int): Concurrent trials [Default: None, as many as cores (MIN_THREADS or 'threads' each) and memory allow]
+    threads (int): OpenMP threads per trial [Default: None, the usable cores split evenly between the slots]
+    memory_mb (float): Peak memory of one trial, see 'memory_estimate' [Default: None, unknown, cores decide]
+    cpus (list): Logical CPUs to use [Default: None, see 'usable_cpus']
+    available_mb (float): Memory available to trials [Default: None, currently available memory]
+    reserve_mb (float): Memory kept free [Default: RESERVE_MB]
+    Returns (dict): 'slots', 'threads' and 'cpus' (one list per slot), plus the limits that were applied
+    """
+    cpus = list(cpus) if cpus is not None else usable_cpus()
+    available_mb = available_mb if available_mb is not None else ps.virtual_memory().available / 1024**2
+    by_cores = max(1, len(cpus) // (threads or MIN_THREADS))
+    by_memory = max(1, int((available_mb - reserve_mb) // memory_mb)) if memory_mb else None
+    fit = min(by_cores, by_memory) if by_memory is not None else by_cores
+    if slots is None:
+        slots = fit
+    elif slots > fit:
+        print(f"{C.YELLOW}{C.BOLD}WARNING{C.END}::{slots} concurrent trials oversubscribe this machine " +
+              f"({len(cpus)} cores" + (f", {available_mb:.0f}MB for {memory_mb:.0f}MB each" if by_memory else "") +
+              f"), at most {fit} fit")
+    sets = split_cpus(cpus, slots) if slots <= len(cpus) else [cpus] * slots # More trials than cores share them all
+    threads = threads or max(1, len(cpus) // slots)
+    return dict(slots=slots, threads=threads, cpus=sets, by_cores=by_cores, by_memory=by_memory, memory_mb=memory_mb)
+
+class CoreScheduler():
+    """
+    Hands out disjoint sets of cores to concurrent CPU-solver trials (see 'plan'). A trial waits while the available
+    memory cannot hold one more trial (the largest peak seen, see 'observe'), unless no other trial runs.
+
+    slots (int): Concurrent trials [Default: None, see 'plan']
+    threads (int): OpenMP threads per trial [Default: None, see 'plan']
+    memory_mb (float): Expected peak memory of one trial [Default: None, learned from 'observe']
+    cpus (list): Logical CPUs to use [Default: None, see 'usable_cpus']
+    reserve_mb (float): Memory kept free [Default: RESERVE_MB]
+    poll (float): Seconds between memory checks while waiting [Default: 5.0]
+    """
+
+    def __init__(self, slots=None, threads=None, memory_mb=None, cpus=None, reserve_mb=RESERVE_MB, poll=5.0):
+        self.plan = plan(slots=slots, threads=threads, memory_mb=memory_mb, cpus=cpus, reserve_mb=reserve_mb)
+        self.slots, self.threads = self.plan["slots"], self.plan["threads"]
+        self.memory_mb, self.reserve_mb, self.poll = memory_mb, reserve_mb, poll
+        self._free = list(range(self.slots))
+        self._running = 0
+        self._cond = threading.Condition()
+
+    def __repr__(self):
+        return f"CoreScheduler({self.slots} slot(s) × {self.threads} thread(s)" + \
+               (f", ~{self.memory_mb:.0f}MB per trial)" if self.memory_mb else ")")
+
+    def _fits(self):
+        if self._running == 0 or not self.memory_mb:
+            return True
+        return ps.virtual_memory().available / 1024**2 - self.reserve_mb >= self.memory_mb
+
+    @contextmanager
+    def slot(self):
+        """Waits for free cores (and memory), yields (dict): 'threads' and 'cpus' to run one trial with"""
+        with span("scheduler.wait"), self._cond:
+            while not (self._free and self._fits()):
+                self._cond.wait(timeout=self.poll if self._free else None) # Memory is freed without notification
+            index = self._free.pop(0)
+            self._running += 1
+        try:
+            yield dict(threads=self.threads, cpus=self.plan["cpus"][index])
+        finally:
+            with self._cond:
+                self._free.append(index)
+                self._running -= 1
+                self._cond.notify_all()
+
+    def observe(self, resources):
+        """Updates the expected memory of a trial with a finished trial's resource summary (see 'ResourceSampler')"""
+        peak = resources.get("peak_ram_mb")
+        if peak is not None and np.isfinite(peak):
+            with self._cond:
+                self.memory_mb = max(self.memory_mb or 0.0, float(peak))
@@ -0,0 +1,120 @@
+from .Real_Data import default_store, real_data_name, height_label
+from .Storage import find_table, MeasurementTable
+
+import numpy as np
+
+# Each metric reduces differences (batches × points × time) to one value per batch, lower is better
+METRICS = {
+    "mse": lambda diff: np.mean(np.square(diff), axis=(1, 2)), # Mean Square Error
+    "rmse": lambda diff: np.sqrt(np.mean(np.square(diff), axis=(1, 2))), # Root Mean Square Error
+    "mad": lambda diff: np.mean(np.absolute(diff), axis=(1, 2)), # Mean Absolute Difference
+    "max": lambda diff: np.max(np.absolute(diff), axis=(1, 2)), # Largest Absolute Difference
+    "bias": lambda diff: np.absolute(np.mean(diff, axis=(1, 2))), # Absolute Mean Difference (systematic offset)
+}
+# Metrics computed after shifting each point's simulated data by its best lag, see 'lagged_mse'
+ALIGNED_METRICS = ("mse_aligned",)
+
+def load_simulated(file, points, delay=0):
+    """Reads the simulated X velocities of all measurement points from a MeasureTool CSV in one pass.
+    Columnar tables (see 'Storage.ingest_csv') are read instead when the CSV was ingested, loading only these columns.
+    file (Path): Path to the '<case>_Vel.csv' file
+    points (Dict): Dictionary mapping integers to 3-tuples representing point coordinates
+    delay (int): How many time steps to skip from simulated data, allowing the simulation to stabilise [Default: 0]
+    Returns (ndarray): (points × time) array of X velocities
+    """
+    columns = [f"Vel_{point_no}.x [m/s]" for point_no in points]
+    if find_table(file) is not None:
+        return MeasurementTable(file).array(columns)[delay:].T
+    import pandas as pd # Only for CSVs, scoring tables needs no pandas
+    df_simul = pd.read_csv(file, sep=";", header=1, usecols=lambda col: col in columns)
+    return df_simul[columns].to_numpy(dtype=np.float64)[delay:].T
+
+def real_batches(points, batch_size, batches=None, store=None, depth=1000, margin=0):
+    """Gathers the real data windows of every point for several batches.
+    points (Dict): Dictionary mapping integers to 3-tuples representing point coordinates
+    batch_size (int): Number of time steps per window
+    batches (list): Batch numbers to gather, see 'RealDataStore.batch_window' [Default: None, all distinct batches]
+    store (RealDataStore): Source of the Real Data [Default: None, shared store]
+    margin (int): Extra time steps included before and after each window, e.g. for lag alignment [Default: 0]
+    Returns (2-tuple): Time and Velocity, each a (batches × points × (time + 2*margin)) array
+    """
+    store = default_store() if store is None else store
+    names = [real_data_name(int(point[0]), height_label(point[2]), depth) for point in points.values()]
+    n = min(store.length(name) for name in names)
+    batch_size = min(batch_size, n - 2 * margin)
+    batches = np.arange(max(1, n // batch_size)) if batches is None else np.atleast_1d(batches)
+    time, velocity = np.empty((2, len(batches), len(names), batch_size + 2 * margin))
+    for i, name in enumerate(names):
+        recording = store.recording(name)
+        starts = (-batches * batch_size - margin) % (recording.shape[1] // 2)
+        index = starts[:, None] + np.arange(batch_size + 2 * margin) # Never wraps, recording is stored twice
+        time[:, i], velocity[:, i] = recording[0, index], recording[1, index]
+    return time, velocity
+
+def lagged_mse(sim, real, max_lag):
+    """Mean Square Error of every point for every lag in [-max_lag, max_lag], for all batches at once.
+    Uses FFT cross-correlation (MSE = sim² + real² - 2·sim·real), so the cost is O(n log n) instead of O(n·lags).
+    sim (ndarray): (points × time) simulated velocities
+    real (ndarray): (batches × points × (time + 2*max_lag)) real velocities, see 'real_batches' with margin=max_lag
+    max_lag (int): Largest shift (in time steps) of the simulated data in either direction
+    Returns (ndarray): (batches × points × lags) MSE, index 'max_lag' corresponds to no shift
+    """
+    length = real.shape[-1] - 2 * max_lag
+    sim = sim[:, :length]
+    n_fft = 1 << int(np.ceil(np.log2(real.shape[-1] + length)))
+    cross = np.fft.irfft(np.fft.rfft(real, n_fft) * np.conj(np.fft.rfft(sim, n_fft))[None], n_fft)
+    cross = cross[..., :2 * max_lag + 1] # cross[k] = sum_t real[t + k] * sim[t]
+    real_sq = np.concatenate([np.zeros(real.shape[:-1] + (1,)), np.cumsum(np.square(real), axis=-1)], axis=-1)
+    window_sq = real_sq[..., length:length + 2 * max_lag + 1] - real_sq[..., :2 * max_lag + 1]
+    sim_sq = np.sum(np.square(sim), axis=-1)[None, :, None]
+    return np.maximum(sim_sq + window_sq - 2 * cross, 0.0) / length
+
+def best_lags(sim, real, max_lag):
+    """Lag (in time steps, positive when the simulation runs ahead of the real data) minimising each point's MSE.
+    See 'lagged_mse' for the arguments. Returns (2-tuple): (batches × points) lags and aligned MSE"""
+    mse = lagged_mse(sim, real, max_lag)
+    index = np.argmin(mse, axis=-1)
+    return index - max_lag, np.take_along_axis(mse, index[..., None], axis=-1)[..., 0]
+
+def score(sim, real, metrics=("mse", "mad"), max_lag=0):
+    """Compares simulated data to every real data batch at once.
+    sim (ndarray): (points × time) simulated velocities
+    real (ndarray): (batches × points × (time + 2*max_lag)) real velocities
+    metrics (list): Names of metrics in METRICS or ALIGNED_METRICS to compute [Default: ('mse', 'mad')]
+    max_lag (int): Margin included in 'real', and largest lag considered by aligned metrics [Default: 0]
+    Returns (dict): Metric name mapped to a dictionary with the 'mean', 'var' and 'per_batch' values
+        (aligned metrics additionally hold the (batches × points) 'lags')
+    """
+    length = min(sim.shape[-1], real.shape[-1] - 2 * max_lag)
+    diff = sim[None, :, :length] - real[:, :, max_lag:max_lag + length]
+    scores = {}
+    for metric in metrics:
+        if metric == "mse_aligned":
+            lags, aligned = best_lags(sim[:, :length], real[:, :, :length + 2 * max_lag], max_lag)
+            per_batch = np.mean(aligned, axis=1)
+            scores[metric] = {"mean": float(np.mean(per_batch)), "var": float(np.var(per_batch)),
+                              "per_batch": per_batch, "lags": lags}
+            continue
+        per_batch = METRICS[metric](diff)
+        scores[metric] = {"mean": float(np.mean(per_batch)), "var": float(np.var(per_batch)), "per_batch": per_batch}
+    return scores
+
+def score_trial(file, points, delay=0, metrics=("mse", "mad"), batches=None, store=None, max_lag=0):
+    """Loads a trial's simulated velocities once and scores them against all (or selected) real data batches.
+    See 'load_simulated', 'real_batches' and 'score' for the arguments.
+    Returns (2-tuple): Scores dictionary and the (points × time) simulated velocities (e.g. for plotting)
+    """
+    sim = load_simulated(file, points, delay=delay)
+    max_lag = max_lag if any(metric in ALIGNED_METRICS for metric in metrics) else 0
+    _, real = real_batches(points, sim.shape[1], batches=batches, store=store, margin=max_lag)
+    return score(sim, real, metrics=metrics, max_lag=max_lag), sim
+
+def comparison_frame(sim, points, batch=0, store=None):
+    """Long-format DataFrame (Time, Vel_X_Sim, Vel_X_Real, X, Y, Z) of the simulated data next to one real data batch"""
+    time, real = real_batches(points, sim.shape[1], batches=[batch], store=store)
+    time, real = time[0], real[0]
+    length = time.shape[1]
+    import pandas as pd
+    coords = np.repeat(np.asarray([points[point_no] for point_no in points], dtype=np.float64), length, axis=0)
+    return pd.DataFrame({"Time": time.ravel(), "Vel_X_Sim": sim[:, :length].ravel(), "Vel_X_Real": real.ravel(),
+                         "X": coords[:, 0], "Y": coords[:, 1], "Z": coords[:, 2]})
@@ -1,11 +1,12 @@
 from datetime import datetime
 from pathlib import Path
-import psutil as ps, GPUtil as gp, time, numpy as np
-from scipy.stats import mode
-import multiprocessing
-from subprocess import PIPE, DEVNULL, Popen, TimeoutExpired
-from shutil import copytree
+from shutil import which
+import os as _os, psutil as ps, time, numpy as np
+from subprocess import PIPE, DEVNULL, Popen, TimeoutExpired, run
 from .Enum import Color as C, CommonDirs
+from .Monitoring import ResourceSampler
+from .Storage import ingest_measurements
+from .Tracing import span
 
 def format_bytes(bytes, unit, SI=False):
     """
@@ -50,43 +51,6 @@ def format_bytes(bytes, unit, SI=False):
             unitN += "s" # Create plural unit of measure
     return f"{value:.0f}"
 
-def monitor_process(os, identifier, batch):
-    while (dualSPH := get_dualsph_proc(os)) is None: 
-        time.sleep(1)
-    dualSPH.cpu_percent()  # Reference for future CPU measurements   
-    res_path = CommonDirs.LOGS / f"{identifier.split('-')[1]}-{identifier.split('-')[0]}-RESOURCE_LOG.csv"
-    try:
-        while dualSPH.is_running():
-            if dualSPH.status() == ps.STATUS_ZOMBIE:
-                print(f"{C.YELLOW}{C.BOLD}WARNING{C.END}::MainProcess or DualSPHProcess Status = Zombie")
-                break
-            time.sleep(10)
-            cpu_info = get_cpu_stats(dualSPH)
-            gpu_info = []
-            for GPU in gp.getGPUs():
-                gpu_info.append([GPU.load * 100.0, GPU.memoryUtil * 100.0, GPU.memoryUsed, GPU.memoryTotal, GPU.temperature])
-            
-            with open(res_path, "a+") as f:
-                if res_path.stat().st_size == 0: # True if empty
-                    f.write("Batch Number,RAM Usage(MB),Virtual Memory(MB),CPU (%),CPU (FLOPS)," +
-                            "CPU Freq (Hz),CPU User Time (s),CPU System Time (s),No. Threads," + 
-                            ",".join([f"GPU_{i} (%),GPU_{i} Memory (%),GPU_{i} Memory Used (MB)," + 
-                                       f"GPU_{i} Memory Total (MB),GPU_{i} Temp (C)" for i in range(len(gpu_info))]) + 
-                            "\n") # Header
-                f.write(f"{batch}," + ",".join([f"{elt}" for elt in cpu_info]) + "," +
-                        ",".join([",".join([f"{elt}" for elt in info]) for info in gpu_info]) + "\n")
-    except ps.NoSuchProcess:
-        print(f"{C.YELLOW}{C.BOLD}WARNING{C.END}::MainProcess or DualSPHProcess Stopped Running")    
-
-def get_dualsph_proc(os):
-    name = "DualSPHysics"
-    for p in ps.process_iter(["name", "exe", "cmdline"]):
-        if name in p.info["name"] or \
-           (p.info["exe"] and name in Path(p.info["exe"]).name) or \
-           (p.info["cmdline"] and name in p.info["cmdline"][0]):
-            return p
-    return None
-
 def get_cpu_stats(p):
     with p.oneshot():
         cpu_mem = p.memory_info()
@@ -98,39 +62,126 @@ def get_cpu_stats(p):
     return [format_bytes(cpu_mem.rss, "MB"), format_bytes(cpu_mem.vms, "MB"), cpu_usage, cpu_flops,
             cpu_freq, cpu_times.user, cpu_times.system, cpu_threads]         
 
+def _signal(procs, method, signal, sudo):
+    """Sends 'terminate' / 'kill' to processes, through 'sudo kill' for those owned by root (launched with sudo)"""
+    denied = []
+    for p in procs:
+        try: getattr(p, method)()
+        except ps.NoSuchProcess: pass
+        except ps.AccessDenied: denied.append(p)
+    if denied and sudo: # Non-interactive, the credentials are still cached from the launch
+        run(["sudo", "-n", "kill", f"-{signal}"] + [str(p.pid) for p in denied], stdout=DEVNULL, stderr=DEVNULL)
+    elif denied:
+        raise ps.AccessDenied(denied[0].pid, msg=f"Cannot {method} {len(denied)} process(es), run without sudo?")
+
+def kill_process_tree(process, timeout=5, sudo=False):
+    """Terminates a process and all of its descendants (e.g. launch script, GenCase, DualSPHysics)
+    sudo (bool): The tree was launched with sudo, processes refusing signals are killed through sudo [Default: False]"""
+    try:
+        procs = process.children(recursive=True) + [process]
+    except ps.NoSuchProcess:
+        return
+    _signal(procs, "terminate", "TERM", sudo)
+    _, alive = ps.wait_procs(procs, timeout=timeout)
+    _signal(alive, "kill", "KILL", sudo)
+
+def watch_process(process, watcher, stdin=None, interval=2.0, sudo=False):
+    """Waits for a process to finish, calling 'watcher' every 'interval' seconds while it runs.
+    If the watcher raises (e.g. TrialPruned), the whole process tree is terminated and the exception propagates.
+    sudo (bool): The process was launched with sudo, see 'kill_process_tree' [Default: False]"""
+    if stdin is not None and process.stdin is not None:
+        process.stdin.write(stdin)
+        process.stdin.close()
+    try:
+        while process.poll() is None:
+            time.sleep(interval)
+            watcher()
+    except BaseException:
+        try:
+            kill_process_tree(process, sudo=sudo)
+        except Exception as e: # The watcher's exception (e.g. TrialPruned) decides what happens to the trial
+            print(f"{C.BOLD}{C.RED}Warning{C.END}: Could not stop the simulation (PID {process.pid}): {e!r}")
+        raise
+
 def run_simulation(case_def, case_name, identifier="Default", os="win64", 
                    export_vtk=False, batch=0, 
                    timestamp=datetime.now().strftime("%d_%m_%Y_%Hh_%Mm_%Ss"),
-                   copy_measurements=True, verbose=True):
-    batch_path = str(case_def.parent / (case_name + f"_{os}_GPU" + (".bat" if os == "win64" else ".sh")))
+                   copy_measurements=True, verbose=True, watcher=None, watch_interval=2.0,
+                   sample_interval=1.0, trial_id=None, on_launch=None, on_finish=None,
+                   measure_format="npy", sudo=True, device="GPU", threads=None, cpus=None):
+    """Runs a Case's launch script and waits for it to finish
+    watcher (callable): Called periodically while the solver runs, may raise to stop the simulation [Default: None]
+    watch_interval (float): Seconds between calls to 'watcher' [Default: 2.0]
+    sample_interval (float): Seconds between resource samples of the launched process tree [Default: 1.0]
+    trial_id (str): Tag of this run in the resource log [Default: None, '<identifier>-Batch<batch>']
+    on_launch (callable): Called with the launched process (psutil.Popen) before waiting for it, e.g. to journal
+        its PID [Default: None]
+    on_finish (callable): Called with the resource summary of the run (see 'ResourceSampler.summary') once the solver
+        stops, e.g. to index it [Default: None]
+    measure_format (str): How MeasureTool output is stored, 'npy' / 'npz' (columnar tables, see 'Storage') or 'csv'
+        (copied as written) [Default: 'npy']
+    sudo (bool): Run the launch script with sudo (Linux only) [Default: True]
+    device (str): Launch script variant, 'GPU' or 'CPU' ('<case>_<os>_<device>') [Default: 'GPU']
+    threads (int): OpenMP threads of the solver (OMP_NUM_THREADS) [Default: None, the solver's default]
+    cpus (list): Logical CPUs the solver (and everything the script starts) is pinned to [Default: None, any]
+    Returns (timedelta): Duration of the simulation"""
+    batch_path = str(case_def.parent / (case_name + f"_{os}_{device}" + (".bat" if os == "win64" else ".sh")))
+    env, prefix = None, ""
+    if threads is not None:
+        env = {**_os.environ, "OMP_NUM_THREADS": str(int(threads))}
+        prefix = f"env OMP_NUM_THREADS={int(threads)} " if sudo and os != "win64" else "" # sudo resets the environment
+    pinned = cpus is not None and os != "win64" and which("taskset") is not None
+    if pinned: # The script and everything it starts inherit the affinity (no preexec_fn, unsafe with trial threads)
+        prefix += f"taskset -c {','.join(str(int(cpu)) for cpu in cpus)} "
     start_time = datetime.now()
     if verbose:
         print(f"Running Batch script: {batch_path}")  
-    MainProcess = ps.Popen([("" if os=="win64" else "sudo ") + batch_path, "1" if export_vtk else "0"], shell=False if os=="win64" else True, 
-                stdin=PIPE,
-                # stdout=DEVNULL, # Don't print output of Script
-                cwd=str(case_def.parent))
+    with span("solver.launch", batch=batch):
+        MainProcess = ps.Popen([("sudo " if sudo and os != "win64" else "") + prefix + batch_path, "1" if export_vtk else "0"], shell=False if os=="win64" else True, 
+                    stdin=PIPE,
+                    # stdout=DEVNULL, # Don't print output of Script
+                    cwd=str(case_def.parent), env=env)
+        if cpus is not None and not pinned: # E.g. Windows, right after launch, before the script starts the solver
+            try:
+                MainProcess.cpu_affinity([int(cpu) for cpu in cpus])
+            except (AttributeError, ps.Error) as e: # Not supported (macOS), or owned by root
+                print(f"{C.YELLOW}{C.BOLD}WARNING{C.END}::Could not pin the simulation to CPUs {list(cpus)} ({e!r})")
+        if on_launch is not None:
+            on_launch(MainProcess)
     if Path(case_def.parent / f"{case_name}_out").exists():
         try:
-            time.sleep(5)
-            if os == "win64":
-                stdout, stderr = MainProcess.communicate(input=b"1")
-            else:
-                MainProcess.stdin.write(b"1")
+            with span("solver.overwrite_prompt", batch=batch): # Launch script asks before replacing old output
+                time.sleep(5)
+                if os == "win64":
+                    stdout, stderr = MainProcess.communicate(input=b"1")
+                else:
+                    MainProcess.stdin.write(b"1")
         except TimeoutExpired:
             pass
-    monitor = multiprocessing.Process(name="ResourceMonitor", target=monitor_process,
-                                      args=(os, identifier, batch))
-    monitor.start()                                  
-    if os != "win64":
-        stdout, stderr = MainProcess.communicate(input=b"A") # Will print to stdout, input ensures program exits
-    monitor.terminate()
+    # Follows only the processes launched here, so concurrent trials are measured separately
+    sampler = ResourceSampler(MainProcess, trial_id or f"{identifier}-Batch{batch}", interval=sample_interval).start()
+    try:
+        with span("solver.run", batch=batch):
+            if watcher is not None:
+                watch_process(MainProcess, watcher, stdin=b"A" if os != "win64" else None, interval=watch_interval,
+                              sudo=sudo and os != "win64")
+            elif os != "win64":
+                stdout, stderr = MainProcess.communicate(input=b"A") # Will print to stdout, input ensures program exits
+    finally:
+        with span("solver.resources", batch=batch):
+            sampler.stop()
+            res_path = CommonDirs.LOGS / f"{identifier.split('-')[-1]}-{identifier.split('-')[0]}-RESOURCE_LOG.csv"
+            sampler.flush(res_path, batch=batch)
+            if on_finish is not None:
+                on_finish(sampler.summary())
     duration = datetime.now()-start_time
     if verbose:
         print(f"{C.GREEN}{C.BOLD}Simulation Complete{C.END} in {duration} (HH:MM:SS)")
 
     if copy_measurements:
         # >> Store MeasureTool output in this workspace <<
-        copytree(case_def.parent / (case_name + "_out") / "measurements",
-                 CommonDirs.MEASURES / identifier / f"{case_name}-{timestamp}-Batch{batch}")
+        with span("measurements.store", batch=batch, format=measure_format):
+            ingest_measurements(case_def.parent / (case_name + "_out") / "measurements",
+                                CommonDirs.MEASURES / identifier / f"{case_name}-{timestamp}-Batch{batch}",
+                                fmt=measure_format)
     return duration
\ No newline at end of file
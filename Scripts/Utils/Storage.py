@@ -0,0 +1,135 @@
+import os, csv, json, shutil, numpy as np
+from pathlib import Path
+
+META_FILE = "meta.json"
+NPZ_FILE = "columns.npz"
+FORMATS = ["npy", "npz", "csv"] # Columnar (memory-mappable), columnar compressed, raw copy
+
+def read_header(file):
+    """Point coordinates and column names from the two header lines of a MeasureTool CSV.
+    Returns (2-tuple): Dictionary mapping integers to 3-lists of point coordinates, and the column names"""
+    with open(file, newline="") as csvfile:
+        measure_reader = csv.reader(csvfile, delimiter=";")
+        point_list = [float(point) for point in next(measure_reader)[2:] if point != ""]
+        columns = next(measure_reader)
+    return {i: point_list[3*i:3*i+3] for i in range(len(point_list) // 3)}, columns
+
+def find_table(file):
+    """Columnar table of a MeasureTool output, given the table directory or the path of the CSV it replaced.
+    Returns (Path): Table directory, None if the output was not ingested"""
+    path = Path(file)
+    table = path.with_suffix("") if path.suffix == ".csv" else path
+    return table if (table / META_FILE).exists() else None
+
+def ingest_csv(file, dest, fmt="npy", dtype=np.float32):
+    """
+    Converts a MeasureTool CSV into a columnar table: a directory holding one array per column and the header
+    (point coordinates and column names) in 'meta.json'. Stored as float32 binary, a table is about a third of the
+    size of the CSV, and reading it needs no parsing.
+    file (Path): MeasureTool CSV
+    dest (Path): Table directory, replaced if it exists
+    fmt (str): 'npy' (one file per column, memory-mappable) or 'npz' (single compressed archive) [Default: 'npy']
+    dtype (type): Type values are stored as [Default: float32]
+    Returns (Path): 'dest'
+    """
+    if fmt not in ["npy", "npz"]:
+        raise ValueError(f"Unknown table format '{fmt}', choose from ['npy', 'npz']")
+    file, dest = Path(file), Path(dest)
+    points, columns = read_header(file)
+    named = [i for i, column in enumerate(columns) if column != ""] # Lines may end with a separator
+    import pandas as pd # Only when parsing, readers of tables need no pandas
+    data = pd.read_csv(file, sep=";", skiprows=2, header=None, usecols=named, engine="c").to_numpy(dtype=np.float64)
+    staging = dest.with_name(f".{dest.name}-{os.getpid()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    arrays = {str(i): np.ascontiguousarray(data[:, j], dtype=dtype) for j, i in enumerate(named)}
+    if fmt == "npz":
+        np.savez_compressed(staging / NPZ_FILE, **arrays)
+    else:
+        for i, array in arrays.items():
+            np.save(staging / f"{i}.npy", array)
+    with open(staging / META_FILE, "w") as f:
+        json.dump({"source": file.name, "format": fmt, "dtype": np.dtype(dtype).name, "rows": len(data),
+                   "points": points, "columns": columns, "stored": {columns[int(i)]: i for i in arrays}}, f)
+    shutil.rmtree(dest, ignore_errors=True)
+    os.replace(staging, dest) # Readers never see a partially written table
+    return dest
+
+def ingest_measurements(src_dir, dest_dir, fmt="npy", keep_raw=False):
+    """
+    Stores the MeasureTool output of a trial: each CSV becomes a columnar table '<dest_dir>/<stem>' (see 'ingest_csv'),
+    other files are copied as they are.
+    src_dir (Path): MeasureTool output, e.g. '<case>_out/measurements'
+    dest_dir (Path): Directory the trial's measurements are stored in, created if needed
+    fmt (str): 'npy', 'npz' or 'csv' (plain copy, no tables) [Default: 'npy']
+    keep_raw (bool): Also copy the CSV files [Default: False]
+    Returns (Path): 'dest_dir'
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown measurement format '{fmt}', choose from {FORMATS}")
+    src_dir, dest_dir = Path(src_dir), Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    for item in src_dir.iterdir():
+        if item.suffix == ".csv" and fmt != "csv":
+            ingest_csv(item, dest_dir / item.stem, fmt=fmt)
+            if not keep_raw:
+                continue
+        if item.is_dir():
+            shutil.copytree(item, dest_dir / item.name, dirs_exist_ok=True)
+        else:
+            shutil.copy2(item, dest_dir / item.name)
+    return dest_dir
+
+def list_measurements(measure_dir):
+    """MeasureTool outputs of a trial, CSV files and columnar tables alike (a table shadows the CSV it was made from).
+    Returns (list): Paths accepted by 'MeasurementTable', 'extract_points' and 'load_simulated'"""
+    measure_dir = Path(measure_dir)
+    tables = [path for path in measure_dir.iterdir() if (path / META_FILE).exists()]
+    names = {path.name for path in tables}
+    return sorted(tables + [path for path in measure_dir.glob("*.csv") if path.stem not in names])
+
+class MeasurementTable():
+    """
+    Read access to a columnar table written by 'ingest_csv'. Columns are loaded individually, and memory-mapped when
+    stored as 'npy', so reading a few velocity columns touches only those bytes on disk.
+
+    path (Path): Table directory, or the path of the CSV it replaced
+    """
+
+    def __init__(self, path):
+        self.path = find_table(path)
+        if self.path is None:
+            raise FileNotFoundError(f"No measurement table found for '{path}'")
+        with open(self.path / META_FILE) as f:
+            self.meta = json.load(f)
+        self.points = {int(i): point for i, point in self.meta["points"].items()}
+        self.columns = self.meta["columns"]
+        self.rows = self.meta["rows"]
+        self._archive = None
+
+    def column(self, name, mmap=True):
+        """Returns (ndarray): Values of one column, read-only memory map if 'mmap' and stored as 'npy'"""
+        if name not in self.meta["stored"]:
+            raise KeyError(f"Column '{name}' not in {self.path.name}")
+        index = self.meta["stored"][name]
+        if self.meta["format"] == "npz":
+            if self._archive is None:
+                self._archive = np.load(self.path / NPZ_FILE)
+            return self._archive[index]
+        return np.load(self.path / f"{index}.npy", mmap_mode="r" if mmap else None)
+
+    def array(self, names, dtype=np.float64):
+        """Returns (ndarray): (rows × names) array of the given columns"""
+        out = np.empty((self.rows, len(names)), dtype=dtype)
+        for j, name in enumerate(names):
+            out[:, j] = self.column(name)
+        return out
+
+    def to_frame(self, names=None):
+        """Returns (DataFrame): Given (or all stored) columns, as 'pandas.read_csv' would give them from the CSV"""
+        names = list(self.meta["stored"]) if names is None else names
+        import pandas as pd
+        return pd.DataFrame(self.array(names), columns=names)
+
+    def __repr__(self):
+        return f"MeasurementTable({self.path.name}: {self.rows} rows × {len(self.meta['stored'])} columns)"
@@ -0,0 +1,586 @@
+from .Enum import Color as C, CommonDirs
+from .Optimization import CaseInfo, maximize_batch
+from .Fidelity import FIDELITY_KEY, RESOLUTION_KEY, fidelity_bounds, maximize_multi_fidelity, best_at_fidelity
+from .Params import SimParam, ParamSpace, legacy_slug
+from .Case_Handling import find_simulation_parameters, find_node, swap_duration_and_freq, duration_and_freq_params
+from .Bindings import CaseTemplate
+from .Simulation import run_simulation
+from .Workspace import TrialWorkspace, remove_stale_workspaces
+from .Cache import ResultCache, solver_version
+from .Post_Processing import extract_points
+from .Scoring import METRICS, ALIGNED_METRICS, score_trial, load_simulated
+from .Rendering import default_queue, render_comparison
+from .Pruning import TrialPruned, MeasurementTail, PartialError, PruningWatcher, MedianPruner, ThresholdPruner
+from .Surrogate import IncrementalGP
+from .Journal import TrialJournal, JOURNAL_SUFFIX, journal_path, solver_alive, unfinished_workspaces
+from .Storage import ingest_measurements, find_table
+from .Trial_Index import TrialIndex, RESOURCE_COLUMNS, param_name
+from .Tracing import Tracer, enable, disable, active, span
+from .Work_Queue import WorkQueue
+from .Scheduler import CoreScheduler, memory_estimate
+from .Cost_Model import COST_MODES, CostModel, CostAwareUtility, pareto_front, fastest_acceptable
+
+import os, copy, json, time, shutil, sqlite3, itertools, threading, numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from pathlib import Path
+from sklearn.gaussian_process.kernels import Matern
+from bayes_opt import BayesianOptimization, UtilityFunction
+from bayes_opt.logger import JSONLogger # Log progress
+from bayes_opt.event import Events # Subscription to Optimisation events
+
+STUDY_DEFAULTS = dict(
+    case=None, # Name of the directory in Cases/
+    contract=None, # Name of the hyperparameter contract in HyperParameters/
+    budget=dict(n_iter=1, init_points=1, hours=None), # Bayesian Optimisation steps, random steps, wall-clock limit
+    metric="mse", # Metric minimised, see Scoring.METRICS and Scoring.ALIGNED_METRICS
+    batch_size=1, # Trials simulated concurrently, 'auto' (CPU solver only): as many as the cores and memory fit
+    strategy="cl_min", # How running trials are treated when suggesting a batch, see 'suggest_batch'
+    resume="new", # 'new', 'latest' (newest log of the same contract) or a log file name (or list of them) in Logs/
+    use_cache=True, # Reuse the result of an identical Case (Def)inition simulated before
+    max_lag=0, # Largest phase shift (time steps) compensated for by aligned metrics
+    prune="none", # 'none', 'median' or 'threshold'
+    prune_factor=3.0, # Multiple of the best error above which the threshold rule prunes a trial
+    fidelity="none", # 'none', 'sh' (successive halving) or 'hyperband'
+    min_duration=None, # Simulated duration (s) of the lowest fidelity [Default: REAL_DURATION / eta^2]
+    eta=3, # Reduction factor between fidelities
+    candidates=9, # Candidates at the lowest fidelity (successive halving only)
+    coarsen=1.0, # Particle spacing multiplier per fidelity below the highest
+    surrogate="dense", # 'dense' (refit from scratch every step) or 'incremental' (bounded cost, see IncrementalGP)
+    cost="none", # 'none' or 'eips' (expected improvement per second of predicted run time, see Cost_Model)
+    cost_weight=1.0, # Exponent of the predicted run time in cost-aware acquisition, 0 ignores run times
+    acceptable=0.1, # Relative error above the best at which the fastest acceptable setting is reported
+    index=True, # Record every trial in the cross-session trial index, see Trial_Index
+    trace=False, # Time every phase of every trial, saved as a Chrome trace and a summary table, see Tracing
+    real_duration=15.0, # Simulated duration (s), matching the real data
+    delay=600, # Time steps skipped before comparing (~120 steps per second)
+    os=None, # 'win64' or 'linux64' [Default: current OS]
+    sudo=True, # Run the launch script with sudo (Linux only)
+    device="GPU", # Solver variant, 'GPU' or 'CPU' (launch script '<case>_<os>_<device>')
+    threads=None, # OpenMP threads per CPU trial [Default: None, the usable cores split between concurrent trials]
+    queue=None, # Work queue directory shared with workers (see Work_Queue), trials then run on the workers
+    lease=120.0, # Seconds a worker may stay silent before its trial is dispatched to another worker
+)
+
+def study_settings(**settings):
+    """Fills in defaults and validates the settings of a study. A budget may also be given as an integer (n_iter)."""
+    unknown = [key for key in settings if key not in STUDY_DEFAULTS]
+    if unknown:
+        raise KeyError(f"Unknown study setting(s) {unknown}, choose from {list(STUDY_DEFAULTS)}")
+    settings = {**copy.deepcopy(STUDY_DEFAULTS), **settings}
+    budget = settings["budget"] if isinstance(settings["budget"], dict) else dict(n_iter=int(settings["budget"]))
+    settings["budget"] = {**STUDY_DEFAULTS["budget"], **budget}
+    settings["os"] = settings["os"] or ("win64" if os.name == "nt" else "linux64")
+    if settings["metric"] not in list(METRICS) + list(ALIGNED_METRICS):
+        raise ValueError(f"Unknown metric '{settings['metric']}', choose from {list(METRICS) + list(ALIGNED_METRICS)}")
+    if settings["prune"] not in ["none", "median", "threshold"]:
+        raise ValueError(f"Unknown pruning rule '{settings['prune']}', choose from 'none', 'median' or 'threshold'")
+    if settings["surrogate"] not in ["dense", "incremental"]:
+        raise ValueError(f"Unknown surrogate '{settings['surrogate']}', choose from 'dense' or 'incremental'")
+    if settings["device"] not in ["GPU", "CPU"]:
+        raise ValueError(f"Unknown device '{settings['device']}', choose from 'GPU' or 'CPU'")
+    if settings["batch_size"] == "auto" and settings["device"] != "CPU":
+        raise ValueError("Only CPU trials are packed automatically (batch_size 'auto'), give a number of GPU trials")
+    if settings["cost"] not in COST_MODES:
+        raise ValueError(f"Unknown cost-aware acquisition '{settings['cost']}', choose from {COST_MODES}")
+    if settings["fidelity"] not in ["none", "sh", "hyperband"]:
+        raise ValueError(f"Unknown fidelity mode '{settings['fidelity']}', choose from 'none', 'sh' or 'hyperband'")
+    if (settings["delay"] / 120.0) > settings["real_duration"]:
+        raise ValueError("Delay too large relative to the simulation duration")
+    if settings["min_duration"] is None:
+        settings["min_duration"] = max(settings["real_duration"] / settings["eta"]**2, settings["delay"]/120.0 + 1.0)
+    if settings["fidelity"] != "none" and (settings["delay"] / 120.0) >= settings["min_duration"]:
+        raise ValueError("Delay too large relative to the lowest fidelity's simulation duration")
+    return settings
+
+def load_studies(path):
+    """Reads a study file, holding a single study (JSON object) or a list of studies to run back to back.
+    Returns (list): Validated settings of each study, see 'study_settings'"""
+    with open(path, "r") as f:
+        studies = json.load(f)
+    studies = studies if isinstance(studies, list) else [studies]
+    for study in studies:
+        if study.get("case") is None or study.get("contract") is None:
+            raise ValueError(f"Every study in {path} needs a 'case' and a 'contract'")
+    return [study_settings(**study) for study in studies]
+
+def find_logs(session_name, exclude=()):
+    """Optimisation logs of previous sessions that used the same contract, newest first"""
+    logs = [log for log in CommonDirs.LOGS.glob(f"*_{session_name}_OPTIMIZATION_LOG.json") if log not in exclude]
+    return sorted(logs, key=lambda log: log.stat().st_mtime, reverse=True)
+
+def legacy_log(log):
+    """Whether an optimisation log has legacy parameter slugs (see 'Params.legacy_slug'), it is never loaded"""
+    with open(log, "r") as f:
+        line = f.readline()
+    return bool(line.strip()) and any(legacy_slug(key) for key in json.loads(line)["params"])
+
+def load_session_logs(optimizer, logs, verbose=True):
+    """Registers the points of previous sessions' JSON logs with the optimizer, as bayes_opt's 'load_logs' does.
+    Logs of older versions whose parameters were written to the wrong XML node (see 'legacy_log') are skipped.
+    Returns (list): Paths of the loaded logs"""
+    loaded = []
+    for log in logs:
+        if legacy_log(log):
+            if verbose:
+                print(f"{C.YELLOW}{C.BOLD}WARNING{C.END}::Skipped {Path(log).name}, its parameters were written to " +
+                      "the wrong XML nodes by an older version")
+            continue
+        with open(log, "r") as f:
+            for line in f:
+                step = json.loads(line)
+                try:
+                    optimizer.register(params=step["params"], target=step["target"])
+                except KeyError: # Identical point was already registered
+                    pass
+        loaded.append(log)
+    return loaded
+
+class Study():
+    """
+    One Bayesian Optimisation session of a Case's simulation hyperparameters, run without any user interaction.
+
+    case (CaseInfo): Case to optimise
+    params (HyperParameters): Simulation hyperparameters (with bounds) from the contract
+    session_name (str): Name of the contract, used in log and measurement names
+    settings (dict): Study settings, see 'study_settings' [Default: None, all defaults]
+    verbose (bool): Whether to print progress [Default: True]
+    """
+
+    def __init__(self, case, params, session_name, settings=None, verbose=True):
+        self.case, self.params, self.session_name = case, params, session_name
+        self.settings = settings if settings is not None else study_settings()
+        self.verbose = verbose
+        self.session_id = datetime.now().strftime("%d_%m_%Y_%Hh_%Mm_%Ss")
+        self.run_times = []
+        self.batch_no = itertools.count() # Trial counter, also selects the real data batch shown in each figure
+        self.columns = None
+        self._log_lock = threading.Lock()
+        remove_stale_workspaces(case.case_path, case.case_name, keep=unfinished_workspaces(), verbose=verbose)
+        self.cache = ResultCache() if self.settings["use_cache"] else None
+        self.index = TrialIndex() if self.settings["index"] else None
+        self.renderer = default_queue() # Started before any trial threads exist, see RenderQueue
+        self.tracer = enable(Tracer()) if self.settings["trace"] else None
+        self.queue = WorkQueue(self.settings["queue"], lease=self.settings["lease"]) if self.settings["queue"] else None
+        self.scheduler = None
+        if self.settings["device"] == "CPU": # Concurrent trials get disjoint cores, as many as fit (see Scheduler)
+            self.scheduler = CoreScheduler(slots=None if self.settings["batch_size"] == "auto" else
+                                           self.settings["batch_size"], threads=self.settings["threads"],
+                                           memory_mb=memory_estimate(self.index, case.case_name))
+            self.settings["batch_size"] = self.scheduler.slots
+            if verbose:
+                print(f"{C.BOLD}{C.GREEN}Info{C.END} Running CPU trials with {self.scheduler}")
+        self.solver_version = solver_version(case.case_def, case.case_name, os=self.settings["os"],
+                                             device=self.settings["device"])
+        # Every trial's Case (Def)inition is rendered from one template: contract, then duration and resolution (dp)
+        tree = copy.deepcopy(case.tree)
+        swap_duration_and_freq(tree, duration=self.settings["real_duration"], freq=1.0/120.0) # Frequency should be fixed
+        self.duration_param = duration_and_freq_params(self.settings["real_duration"])[0]
+        dp, bound = tree.getroot().find(".//geometry/definition"), list(params.keys()) + [self.duration_param]
+        self.dp_param = next((p for p in params.keys() if find_node(tree.getroot(), p) is dp and p.attr == "dp"), None)
+        if self.dp_param is None and dp is not None and dp.get("dp") is not None: # Not in the contract, bind it too
+            self.dp_param = SimParam(id=".//geometry/definition", attr="dp", default=dp.get("dp"), bound=np.float64)
+            bound.append(self.dp_param)
+        self.template = CaseTemplate(tree, bound)
+        self.space = ParamSpace(params) # Suggestions -> values in template order, without parsing slugs per trial
+
+        s = self.settings
+        self.optimizer = BayesianOptimization(
+            f=self.objective, # Want to control optimisation more finely
+            pbounds=params.get_bounds() if s["fidelity"] == "none" else \
+                    fidelity_bounds(params.get_bounds(), s["min_duration"], s["real_duration"], # Shared surrogate
+                                    coarsen=s["coarsen"], eta=s["eta"]),
+            verbose=2 if verbose else 0, # verbose = 1 prints only when a maximum is observed, verbose = 0 is silent
+            random_state=1,
+        )
+        if s["surrogate"] == "incremental": # Suggest latency stays bounded as the history grows
+            self.optimizer._gp = IncrementalGP(random_state=self.optimizer._random_state)
+        # Run times of this contract's earlier trials (any session) and of every trial simulated from now on
+        self.cost_model = CostModel(self.optimizer.space.bounds, random_state=1)
+        if self.index is not None:
+            self.cost_model.load(self.index, self.optimizer.space.keys, metric=s["metric"], case=case.case_name,
+                                 session=session_name)
+        if s["prune"] == "median":
+            self.pruner = MedianPruner()
+        elif s["prune"] == "threshold":
+            self.pruner = ThresholdPruner(self.optimizer, factor=s["prune_factor"])
+        else:
+            self.pruner = None
+
+        # >> Logging / Pausing <<
+        self.log_path = CommonDirs.LOGS / f"{self.session_id}_{session_name}_OPTIMIZATION_LOG.json"
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        self.optimizer.subscribe(Events.OPTIMIZATION_STEP, JSONLogger(path=str(self.log_path)))
+        self.journal = TrialJournal(journal_path(self.log_path)) # Trials in flight, see 'recover'
+        self.optimizer.subscribe(Events.OPTIMIZATION_STEP, subscriber=self, callback=self._log_step)
+
+        self.gp_params = dict(
+            kernel=Matern(nu=2.5), #  [Default: Mattern 2.5 kernel]. Specific to problem. Recommended not to change.
+            alpha=1e-3, # [Default 1e-6] Controls how much noise GP can handle, increase for discrete parameters.
+            normalize_y=True, # [Default: True] Normalise mean 0 variance 1, recommended for unit-normalized priors
+            n_restarts_optimizer=5, # [Default: 5] Used to optimize kernel hyperparameters!
+        )
+        self.acq_params = dict(
+            acq='ucb', # UCB: Upper Confidence Bound, EI: Expected Improvement, # POI: Probability of Improvement
+            kappa=2.576, # High: Prefer Exploration, Low: Prefer Exploitation
+            kappa_decay=1, # Kappa is multiplied by this every iteration
+            kappa_decay_delay=0, # Wait before starting with decay
+            xi=0.0, # Used by EI and POI, 0.1=Exploration, 0.0=Exploitation
+        )
+
+    @classmethod
+    def from_settings(cls, settings, verbose=True):
+        """Builds a study from (validated) settings, without prompting for the case or contract"""
+        case = CaseInfo(case_name=settings["case"])
+        params, _, file_name = find_simulation_parameters(case.tree, hyp_name=CommonDirs.HYPERPARAMS / settings["contract"],
+                                                          return_name=True, record=0, verbose=False)
+        return cls(case, params, file_name.split(".")[0].split("-")[1], settings=settings, verbose=verbose)
+
+    def _log_step(self, event, instance):
+        """Logs hyper-parameter settings to file for specific Optimization step"""
+        latest = instance.res[len(instance.res)-1]
+        params, target = latest["params"], latest["target"]
+        if self.verbose:
+            print(f"{C.BOLD}{C.GREEN}Info{C.END} Optimisation Step ({C.BOLD}Target{C.END}: {target})")
+        csv_path = CommonDirs.LOGS / f"{self.session_id}_{self.session_name}_OPTIMIZATION_LOG.csv"
+        with self._log_lock, open(csv_path, "a+") as f:
+            if self.columns is None:
+                self.columns = [col for col in params.keys()]
+                f.write("Target," + ",".join(self.columns)) # Header
+            f.write(f"\n{target}," + ",".join([f"{params.get(col)}" for col in self.columns]))
+
+    def _render(self, kwargs, duration, resolution):
+        """Case (Def)inition (bytes) of a trial, from the optimizer's parameters"""
+        # Template slots: the contract's parameters (in order), the duration, then dp if it is not in the contract
+        values = self.space.strings(kwargs) + [str(self.duration_param.type(duration))] # Discrete values are cast
+        if len(values) < len(self.template.params): # Unchanged unless coarsened
+            values.append(self.template.defaults[-1])
+        if resolution != 1.0:
+            if self.dp_param is None:
+                raise KeyError("Particle distance 'dp' not found in Tree (expected at './/geometry/definition')")
+            dp = self.template.index[self.dp_param]
+            values[dp] = str(float(values[dp]) * resolution)
+        return self.template.render(values)
+
+    def _score(self, measure_dir, batch_no):
+        """Target of a trial whose MeasureTool output is in 'measure_dir', also saves its comparison figure"""
+        with span("score", batch=batch_no):
+            return self._score_trial(measure_dir, batch_no)
+
+    def _score_trial(self, measure_dir, batch_no):
+        s = self.settings
+        file_path = measure_dir / (self.case.case_path.name + "_Vel.csv")
+        points, columns = extract_points(file_path, verbose=False)
+
+        # Single pass over the simulated data, compared to every batch of the real data at once (less noisy than one batch)
+        metrics = list(dict.fromkeys([s["metric"], "mse", "mad"] + (["mse_aligned"] if s["max_lag"] > 0 else [])))
+        with span("score.metrics", batch=batch_no):
+            scores, sim = score_trial(file_path, points, delay=s["delay"], metrics=metrics, max_lag=s["max_lag"])
+        target = 1.0 / scores[s["metric"]]["mean"] # Inverted as we want to maximise the objective
+        if self.verbose:
+            print(f"{C.BOLD}{C.GREEN}Info{C.END} Batch {batch_no}: " +
+                  ", ".join([f"{m.upper()} {v['mean']:.5g} (var {v['var']:.3g})" for m, v in scores.items()]))
+        with span("plot.queue", batch=batch_no):
+            render_comparison(sim, points, batch=batch_no, save_path=file_path.parent / "Figure.jpg", # In the background
+                              queue=self.renderer)
+        return target
+
+    def _figure(self, measure_dir, batch_no):
+        """Queues the comparison figure of a trial scored elsewhere (see 'Work_Queue')"""
+        file_path = measure_dir / (self.case.case_path.name + "_Vel.csv")
+        if file_path.exists() or find_table(file_path) is not None:
+            points, _ = extract_points(file_path, verbose=False)
+            sim = load_simulated(file_path, points, delay=self.settings["delay"])
+            with span("plot.queue", batch=batch_no):
+                render_comparison(sim, points, batch=batch_no, save_path=measure_dir / "Figure.jpg",
+                                  queue=self.renderer)
+
+    def objective(self, **kwargs):
+        with span("trial"):
+            return self._trial(**kwargs)
+
+    def _trial(self, **kwargs):
+        s, case = self.settings, self.case
+        batch_no = next(self.batch_no)
+        trial_id = f"{self.session_id}-Batch{batch_no}"
+        params = {k: v for k, v in kwargs.items() # As registered with the optimizer (resolution only if coarsened)
+                  if k != RESOLUTION_KEY or k in self.optimizer.space.keys}
+        duration = float(kwargs.pop(FIDELITY_KEY, s["real_duration"])) # Shorter during multi-fidelity screening
+        resolution = float(kwargs.pop(RESOLUTION_KEY, 1.0))
+        with span("case.render", batch=batch_no):
+            xml = self._render(kwargs, duration, resolution)
+
+        identifier = f"{self.session_name}-{self.session_id}"
+        timestamp = datetime.now().strftime("%d_%m_%Y_%Hh_%Mm_%Ss")
+        measure_dir = CommonDirs.MEASURES / identifier / f"{case.case_name}-{timestamp}-Batch{batch_no}"
+        self.journal.record(trial_id, "suggested", params=params, resolution=resolution, duration=duration,
+                            batch=batch_no, measure_dir=str(measure_dir))
+        indexed = dict(batch=batch_no, duration=duration, resolution=resolution, measure_dir=str(measure_dir),
+                       started=datetime.now().isoformat(timespec="seconds"))
+        workspace, pruned, run_time, resources, remote = None, False, None, {}, None
+        try:
+            with span("cache.lookup", batch=batch_no):
+                key = self.cache.key(xml, self.solver_version) if self.cache is not None else None
+                cached = self.cache is not None and self.cache.get(key, measure_dir) is not None
+            if cached: # Identical simulation was run before
+                if self.verbose:
+                    print(f"{C.BOLD}{C.GREEN}Info{C.END} Reusing cached simulation result ({self.cache})")
+            elif self.queue is not None: # Simulated and scored by whichever worker claims it (no pruning)
+                with span("queue.wait", batch=batch_no):
+                    remote = self.queue.run(trial_id, dict(
+                        case_name=case.case_name, xml=xml.decode(), identifier=identifier, batch=batch_no,
+                        metric=s["metric"], delay=s["delay"], max_lag=s["max_lag"], sudo=s["sudo"], device=s["device"]),
+                        measure_dir=measure_dir)
+                run_time = timedelta(seconds=remote["run_time"])
+                resources.update(remote.get("resources") or {})
+                self.run_times.append(run_time)
+                if self.cache is not None:
+                    with span("cache.store", batch=batch_no):
+                        self.cache.put(key, measure_dir, params=kwargs)
+            else:
+                # Kept until the journal marks the trial finished, so a restarted session can recover it
+                with span("workspace.create", batch=batch_no):
+                    workspace = TrialWorkspace(case.case_def, case.case_name, trial_id=trial_id, keep=True).create()
+                    workspace.write_case(xml) # Each trial gets its own Case (Def)inition and output directory
+                watcher = None
+                if self.pruner is not None: # Follow the error while the solver runs
+                    expected_steps = int(round(duration * 120.0)) + 1 - s["delay"]
+                    watcher = PruningWatcher(f"Batch{batch_no}", PartialError(MeasurementTail(workspace.out_path),
+                                             expected_steps, delay=s["delay"]), self.pruner, verbose=self.verbose)
+                launched = lambda process: self.journal.record(trial_id, "launched", pid=process.pid,
+                                                               create_time=process.create_time(),
+                                                               workspace=str(workspace.path))
+                # >> Run the simulation (warning: SLOW) <<
+                try:
+                    with self.scheduler.slot() if self.scheduler is not None else nullcontext({}) as pinned:
+                        run_time = run_simulation(workspace.case_def, case.case_name, identifier=identifier,
+                                                  export_vtk=False, batch=batch_no, os=s["os"], timestamp=timestamp,
+                                                  copy_measurements=True, verbose=False, watcher=watcher,
+                                                  on_launch=launched, on_finish=resources.update, sudo=s["sudo"],
+                                                  device=s["device"], **pinned) # Cores and threads of a CPU trial
+                except TrialPruned as e: # Penalise, but no better than the worst trial so far
+                    target, pruned = min([1.0 / e.error] + list(self.optimizer.space.target)), True
+                if self.scheduler is not None:
+                    self.scheduler.observe(resources)
+                if not pruned:
+                    if watcher is not None:
+                        watcher.finish()
+                    self.run_times.append(run_time)
+                    if self.cache is not None:
+                        with span("cache.store", batch=batch_no):
+                            self.cache.put(key, measure_dir, params=kwargs)
+            if remote is not None: # Scored by the worker, only the figure is left
+                target = remote["target"]
+                self._figure(measure_dir, batch_no)
+            elif not pruned:
+                target = self._score(measure_dir, batch_no)
+        except Exception as e:
+            self.journal.record(trial_id, "failed", error=repr(e))
+            self._index_trial(trial_id, params, state="failed", error=repr(e), **indexed)
+            self._remove(workspace)
+            raise
+        self.journal.record(trial_id, "completed", target=target, pruned=pruned)
+        if run_time is not None and not pruned: # Cached trials cost nothing, pruned ones were cut short
+            self.cost_model.record(self.optimizer.space.params_to_array(params), run_time.total_seconds(), target)
+        self._index_trial(trial_id, params, state="completed", target=target, pruned=pruned,
+                          run_time=run_time.total_seconds() if run_time is not None else None,
+                          **{k: v for k, v in resources.items() if k in RESOURCE_COLUMNS}, **indexed)
+        self._remove(workspace)
+        return target
+
+    def _index_trial(self, trial_id, params, **fields):
+        """Records a finished trial in the trial index. Indexing is bookkeeping only, failing to index just warns."""
+        if self.index is None:
+            return
+        try:
+            self.index.record(trial_id, params=params, **{
+                **dict(session_id=self.session_id, session_name=self.session_name, case_name=self.case.case_name,
+                       metric=self.settings["metric"], log_path=str(self.log_path), source="study",
+                       finished=datetime.now().isoformat(timespec="seconds")), **fields})
+        except sqlite3.Error as e:
+            print(f"{C.BOLD}{C.RED}Warning{C.END}: Could not index trial {trial_id} ({e!r})")
+
+    def _remove(self, workspace):
+        if workspace is not None:
+            with span("workspace.remove"):
+                workspace.keep = False
+                workspace.cleanup()
+
+    def _recover_trial(self, journal, trial):
+        """Reattaches to (waits for) a journaled trial's solver if it still runs, then harvests its output.
+        Trials that never launched, or whose solver stopped before finishing, are simulated again.
+        Returns (2-tuple): Parameters (as registered with the optimizer) and target"""
+        case, params = self.case, trial["params"]
+        if RESOLUTION_KEY in self.optimizer.space.keys: # Journaled apart by earlier versions
+            params = {**params, RESOLUTION_KEY: trial.get("resolution", 1.0)}
+        workspace = Path(trial["workspace"]) if trial.get("workspace") else None
+        if trial["state"] == "launched" and solver_alive(trial):
+            if self.verbose:
+                print(f"{C.BOLD}{C.GREEN}Info{C.END} Reattaching to trial {trial['trial']} (PID {trial['pid']})")
+            while solver_alive(trial):
+                time.sleep(5.0)
+        out_path = workspace / f"{case.case_name}_out" if workspace is not None else None
+        steps = len(MeasurementTail(out_path).read()) if out_path is not None else 0 # Complete time steps written
+        if steps >= int(round(trial["duration"] * 120.0)) + 1: # Solver finished while the session was down
+            measure_dir = Path(trial["measure_dir"])
+            ingest_measurements(out_path / "measurements", measure_dir)
+            if self.cache is not None:
+                kwargs = {k: v for k, v in params.items() if k not in [FIDELITY_KEY, RESOLUTION_KEY]}
+                xml = self._render(kwargs, trial["duration"], trial.get("resolution", 1.0))
+                self.cache.put(self.cache.key(xml, self.solver_version), measure_dir, params=kwargs)
+            target = self._score(measure_dir, trial["batch"])
+            journal.record(trial["trial"], "completed", target=target, harvested=True)
+            self._index_trial(trial["trial"], params, state="completed", target=target, batch=trial["batch"],
+                              duration=trial["duration"], resolution=trial.get("resolution", 1.0),
+                              measure_dir=str(measure_dir), session_id=trial["trial"].rsplit("-Batch", 1)[0],
+                              log_path=str(journal.path).replace(JOURNAL_SUFFIX, "_OPTIMIZATION_LOG.json"))
+            if self.verbose:
+                print(f"{C.BOLD}{C.GREEN}Info{C.END} Harvested trial {trial['trial']} (Target: {target})")
+        else:
+            journal.record(trial["trial"], "failed", error="Not finished when the session stopped, simulated again")
+            resolution = trial.get("resolution", 1.0)
+            target = self.objective(**{**params, **({RESOLUTION_KEY: resolution} if resolution != 1.0 else {})})
+        if workspace is not None:
+            shutil.rmtree(workspace, ignore_errors=True)
+        return params, target
+
+    def recover(self, journal):
+        """Recovers the unfinished trials of a previous session's journal, registering their targets.
+        Returns (int): Number of recovered trials"""
+        journal = journal if isinstance(journal, TrialJournal) else TrialJournal(journal)
+        trials = sorted(journal.unfinished(), key=lambda trial: not solver_alive(trial)) # Reattach first
+        if not trials:
+            return 0
+        if self.verbose:
+            print(f"{C.CYAN}{C.BOLD}INFO{C.END}: Recovering {len(trials)} unfinished trial(s) of {journal.path.name}")
+        workers = max(self.settings["batch_size"], sum(solver_alive(trial) for trial in trials))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Recover") as pool:
+            futures = [pool.submit(self._recover_trial, journal, trial) for trial in trials]
+            for future in as_completed(futures):
+                try:
+                    params, target = future.result()
+                except Exception as e:
+                    print(f"{C.BOLD}{C.RED}Warning{C.END}: Could not recover trial ({e!r})")
+                    continue
+                try:
+                    self.optimizer.register(params=params, target=target)
+                except KeyError: # Identical point was already registered, e.g. from the resumed log
+                    pass
+        return len(trials)
+
+    def resume(self, policy=None):
+        """Makes the optimizer aware of points from previous sessions.
+        policy (str / list): 'new' (nothing), 'latest' (newest log of the same contract) or log file name(s) in Logs/
+            [Default: None, the study's 'resume' setting]
+        Returns (list): Paths of the loaded logs"""
+        policy = self.settings["resume"] if policy is None else policy
+        if policy in [None, "new"]:
+            return []
+        if policy == "latest": # Newest log that can be loaded
+            logs = [log for log in find_logs(self.session_name, exclude=[self.log_path]) if not legacy_log(log)][:1]
+        else:
+            logs = [CommonDirs.LOGS / log for log in ([policy] if isinstance(policy, (str, Path)) else policy)]
+        if logs:
+            logs = load_session_logs(self.optimizer, logs, verbose=self.verbose)
+            for log in logs: # Trials still running (or finished unseen) when those sessions stopped
+                self.recover(journal_path(log))
+        if self.verbose:
+            print(f"{C.CYAN}{C.BOLD}INFO{C.END}: Optimizer is now aware of {len(self.optimizer.space)} points.")
+        return logs
+
+    def _utility(self):
+        self.optimizer.set_gp_params(**self.gp_params)
+        utility = UtilityFunction(kind=self.acq_params["acq"], kappa=self.acq_params["kappa"], xi=self.acq_params["xi"],
+                                  kappa_decay=self.acq_params["kappa_decay"],
+                                  kappa_decay_delay=self.acq_params["kappa_decay_delay"])
+        if self.settings["cost"] != "none": # Prefer cheap points that promise as much, see Cost_Model
+            return CostAwareUtility(utility, self.cost_model, kind=self.settings["cost"],
+                                    weight=self.settings["cost_weight"])
+        return utility
+
+    def run(self, resume=None):
+        """Runs the study until its budget (steps, or hours if given) is used up.
+        resume (str / list): Overrides the study's resume policy, see 'resume' [Default: None]
+        Returns (dict): Summary with the best combination found, run times and number of registered points"""
+        s, budget = self.settings, self.settings["budget"]
+        self.resume(resume)
+        deadline = time.monotonic() + 3600.0 * budget["hours"] if budget["hours"] else None
+        #  init_points: How many steps of **random** exploration you want to perform.
+        #  n_iter: How many steps of bayesian optimization you want to perform.
+        init_points = max(0, budget["init_points"] - len(self.optimizer.space)) # Don't re-explore a resumed space
+        remaining = budget["n_iter"]
+        utility = self._utility()
+        while remaining > 0 and (deadline is None or time.monotonic() < deadline):
+            n_iter = remaining if deadline is None else 1 # With a time limit, check the deadline after every step
+            if s["fidelity"] != "none": # Many short simulations, only the most promising are simulated for longer
+                maximize_multi_fidelity(self.optimizer, utility, s["min_duration"], s["real_duration"],
+                                        mode=s["fidelity"], n_iter=n_iter, n_candidates=s["candidates"], eta=s["eta"],
+                                        coarsen=s["coarsen"], batch_size=s["batch_size"], strategy=s["strategy"],
+                                        verbose=self.verbose)
+            else: # Keep trials running (one at a time by default), a failed trial is reported and skipped
+                launched = maximize_batch(self.optimizer, utility, init_points=init_points, n_iter=remaining,
+                                          batch_size=s["batch_size"], strategy=s["strategy"], deadline=deadline,
+                                          verbose=self.verbose) # One call, stops launching at the deadline
+                n_iter = max(0, launched - init_points)
+            remaining -= n_iter
+            init_points = 0
+        if remaining > 0 and self.verbose:
+            print(f"{C.YELLOW}{C.BOLD}WARNING{C.END}::Time budget of {budget['hours']}h used up, " +
+                  f"{remaining} step(s) not run")
+        self.renderer.wait() # Figures of the last trials
+        if self.save_trace() is not None and active() is self.tracer: # Studies run after this one trace themselves
+            disable()
+        return self.summary()
+
+    def save_trace(self):
+        """Writes the phases traced so far (see 'Tracing') to Logs/, as Chrome trace-event JSON and a summary CSV.
+        Returns (Path): Path of the trace, None if this study is not traced"""
+        if self.tracer is None:
+            return None
+        prefix = CommonDirs.LOGS / f"{self.session_id}_{self.session_name}"
+        self.tracer.write_summary(Path(f"{prefix}_TRACE_SUMMARY.csv"))
+        return self.tracer.to_chrome(Path(f"{prefix}_TRACE.json"))
+
+    def tradeoffs(self):
+        """Accuracy against run time of the trials simulated at full fidelity (including earlier sessions' trials of the
+        contract, see 'CostModel.load').
+        Returns (2-tuple): Pareto front (fastest first) and the fastest acceptable trial (see the 'acceptable' setting,
+            None if no trial is known), each trial a dictionary of target, run time (s) and parameters"""
+        X, seconds, targets = self.cost_model.observations()
+        keys = self.optimizer.space.keys
+        if FIDELITY_KEY in keys: # Shorter simulations are neither as accurate nor as slow
+            targets = np.where(X[:, keys.index(FIDELITY_KEY)] >= self.settings["real_duration"] - 1e-9, targets, np.nan)
+        if RESOLUTION_KEY in keys: # Nor are coarser ones
+            targets = np.where(np.abs(X[:, keys.index(RESOLUTION_KEY)] - 1.0) < 1e-9, targets, np.nan)
+        trial = lambda i: dict(target=float(targets[i]), run_time=float(seconds[i]),
+                               params=dict(zip(keys, X[i].tolist())))
+        fastest = fastest_acceptable(targets, seconds, tolerance=self.settings["acceptable"])
+        return [trial(i) for i in pareto_front(targets, seconds)], trial(fastest) if fastest is not None else None
+
+    def summary(self):
+        best = self.optimizer.max if self.settings["fidelity"] == "none" else \
+               best_at_fidelity(self.optimizer, self.settings["real_duration"])
+        front, fastest = self.tradeoffs()
+        return dict(case=self.case.case_name, contract=self.session_name, session_id=self.session_id,
+                    log=self.log_path.name, points=len(self.optimizer.space), best=best,
+                    run_times=[str(rt) for rt in self.run_times], cache=str(self.cache) if self.cache else None,
+                    phases=self.tracer.summary() if self.tracer is not None else None, pareto=front, fastest=fastest)
+
+    def report(self):
+        print(f"{C.BOLD}Run Times (HH:MM:SS){C.END}:\n", "\n".join([f"Iter {i}: {rt}" for i, rt in enumerate(self.run_times)]))
+        if self.cache is not None:
+            print(self.cache)
+        if self.tracer is not None:
+            print(f"{C.BOLD}Phases (ms, share of trial time){C.END}:\n{self.tracer.format_summary()}")
+        summary = self.summary()
+        if summary["pareto"]:
+            print(f"{C.BOLD}Accuracy vs Run Time (Pareto front, fastest first){C.END}:\n" + "\n".join(
+                [f"Target {t['target']:.5g} in {timedelta(seconds=round(t['run_time']))}: " +
+                 ", ".join([f"{param_name(k)}={v:.4g}" for k, v in t["params"].items()]) for t in summary["pareto"]]))
+        if summary["fastest"] is not None:
+            print(f"{C.BOLD}{C.PURPLE}Fastest Acceptable Combination{C.END} (error at most " +
+                  f"{100.0 * self.settings['acceptable']:.0f}% above the best, " +
+                  f"{timedelta(seconds=round(summary['fastest']['run_time']))}):\n" +
+                  ", ".join([f"{param_name(k)}={v:.6g}" for k, v in summary["fastest"]["params"].items()]))
+        print(f"{C.BOLD}{C.PURPLE}Max of Optimized Combinations{C.END}:\n{summary['best']}")
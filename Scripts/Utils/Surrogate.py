@@ -0,0 +1,168 @@
+import warnings, numpy as np
+from scipy.linalg import cholesky, cho_solve, solve_triangular
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.gaussian_process import GaussianProcessRegressor
+from sklearn.gaussian_process.kernels import Matern
+from sklearn.utils import check_random_state
+
+def _cholesky(K, jitter=0.0):
+    """Lower Cholesky factor, adding diagonal jitter until the matrix is numerically positive definite"""
+    scale = np.mean(np.diag(K)) if len(K) else 1.0
+    for _ in range(6):
+        try:
+            return cholesky(K + jitter * scale * np.eye(len(K)), lower=True, check_finite=False)
+        except np.linalg.LinAlgError:
+            jitter = max(1e-10, jitter * 10)
+    raise np.linalg.LinAlgError("Kernel matrix is not positive definite, consider increasing alpha")
+
+class IncrementalGP(BaseEstimator, RegressorMixin):
+    """
+    Drop-in replacement for the Gaussian Process of a BayesianOptimization (i.e. 'optimizer._gp') whose cost stays
+    bounded as the number of observations grows. Like sklearn's GaussianProcessRegressor, 'fit' receives all
+    observations every time, but the work done depends on what changed since the previous fit:
+        - New observations appended to the previous ones extend the Cholesky factor, O(n² k) instead of O(n³)
+        - Kernel hyperparameters are only re-optimised every 'refit_every' new points (or when the data doubles), on at
+          most 'opt_points' observations, otherwise they are kept fixed
+        - Above 'sparse_threshold' observations, a Deterministic Training Conditional approximation with 'n_inducing'
+          inducing points is used, so fitting costs O(m² k) and predicting O(m²) per point regardless of n
+
+    kernel (Kernel): Covariance function, hyperparameters are its initial values [Default: None, Matern(nu=2.5)]
+    alpha (float): Noise variance added to the diagonal (in normalised units if 'normalize_y') [Default: 1e-6]
+    normalize_y (bool): Normalise targets to mean 0 and variance 1 [Default: True]
+    n_restarts_optimizer (int): Restarts when re-optimising kernel hyperparameters [Default: 5]
+    random_state (int / RandomState): Source of randomness of restarts and subsets [Default: None]
+    refit_every (int): New observations after which hyperparameters are re-optimised [Default: 25]
+    opt_points (int): Largest number of observations used to re-optimise hyperparameters [Default: 500]
+    sparse_threshold (int): Number of observations above which inducing points are used [Default: 1000]
+    n_inducing (int): Number of inducing points of the sparse approximation [Default: 300]
+    """
+
+    def __init__(self, kernel=None, alpha=1e-6, normalize_y=True, n_restarts_optimizer=5, random_state=None,
+                 refit_every=25, opt_points=500, sparse_threshold=1000, n_inducing=300):
+        self.kernel = kernel
+        self.alpha = alpha
+        self.normalize_y = normalize_y
+        self.n_restarts_optimizer = n_restarts_optimizer
+        self.random_state = random_state
+        self.refit_every = refit_every
+        self.opt_points = opt_points
+        self.sparse_threshold = sparse_threshold
+        self.n_inducing = n_inducing
+
+    # >> Hyperparameters <<
+    def _needs_optimisation(self, X):
+        if not hasattr(self, "kernel_") or self._kernel_source != self._prior():
+            return True
+        n = len(X)
+        return n - self._opt_n >= self.refit_every or n >= 2 * self._opt_n
+
+    def _prior(self):
+        return self.kernel if self.kernel is not None else Matern(nu=2.5)
+
+    def _optimise(self, X, y):
+        """Fits kernel hyperparameters with sklearn on (a subset of) the observations"""
+        rng = check_random_state(self.random_state)
+        index = np.arange(len(X))
+        if len(X) > self.opt_points: # Keep the best observations, fill up with a random sample of the rest
+            best = np.argsort(y)[::-1][:self.opt_points // 4]
+            rest = np.setdiff1d(index, best)
+            index = np.concatenate([best, rng.choice(rest, self.opt_points - len(best), replace=False)])
+        gp = GaussianProcessRegressor(kernel=self._prior(), alpha=self.alpha, normalize_y=self.normalize_y,
+                                      n_restarts_optimizer=self.n_restarts_optimizer, random_state=rng)
+        with warnings.catch_warnings(): # Sklearn's GP is noisy when fitting hyperparameters
+            warnings.simplefilter("ignore")
+            gp.fit(X[index], y[index])
+        self.kernel_ = gp.kernel_
+        self._kernel_source = self._prior()
+        self._opt_n = len(X)
+
+    # >> Fitting <<
+    def fit(self, X, y):
+        X, y = np.asarray(X, dtype=np.float64), np.asarray(y, dtype=np.float64).ravel()
+        self._y_mean, self._y_std = (np.mean(y), np.std(y)) if self.normalize_y else (0.0, 1.0)
+        self._y_std = self._y_std if self._y_std > 0 else 1.0
+        appended = hasattr(self, "X_train_") and len(X) >= len(self.X_train_) and \
+                   np.array_equal(X[:len(self.X_train_)], self.X_train_)
+        if self._needs_optimisation(X):
+            self._optimise(X, y)
+            appended = False # Kernel changed, factorise again
+        if len(X) > self.sparse_threshold:
+            self._fit_sparse(X, y, appended and getattr(self, "sparse_", False))
+        else:
+            self._fit_dense(X, y, appended and not getattr(self, "sparse_", False))
+        self.X_train_, self.y_train_ = X, y
+        return self
+
+    def _fit_dense(self, X, y, appended):
+        n_old = len(self.X_train_) if appended else 0
+        if n_old == 0:
+            K = self.kernel_(X) + self.alpha * np.eye(len(X))
+            self.L_ = _cholesky(K)
+        elif len(X) > n_old: # Extend the factor: [[L, 0], [B^T, C]]
+            X_new = X[n_old:]
+            B = solve_triangular(self.L_, self.kernel_(self.X_train_, X_new), lower=True, check_finite=False)
+            try:
+                C = cholesky(self.kernel_(X_new) + self.alpha * np.eye(len(X_new)) - B.T @ B, lower=True,
+                             check_finite=False)
+                self.L_ = np.block([[self.L_, np.zeros((n_old, len(X_new)))], [B.T, C]])
+            except np.linalg.LinAlgError: # E.g. duplicate points, refactorise with jitter
+                self.L_ = _cholesky(self.kernel_(X) + self.alpha * np.eye(len(X)))
+        self.alpha_ = cho_solve((self.L_, True), (y - self._y_mean) / self._y_std, check_finite=False)
+        self.sparse_ = False
+
+    def _inducing_points(self, X, y):
+        """Best observations plus a farthest-point (space-filling) selection of the others"""
+        m = min(self.n_inducing, len(X))
+        scale = np.ptp(X, axis=0)
+        Xs = (X - X.min(axis=0)) / np.where(scale > 0, scale, 1.0)
+        chosen = list(np.argsort(y)[::-1][:max(1, m // 10)])
+        distance = np.min([np.sum((Xs - Xs[i])**2, axis=1) for i in chosen], axis=0)
+        while len(chosen) < m:
+            i = int(np.argmax(distance))
+            chosen.append(i)
+            distance = np.minimum(distance, np.sum((Xs - Xs[i])**2, axis=1))
+        return X[chosen]
+
+    def _fit_sparse(self, X, y, appended):
+        n_old = len(self.X_train_) if appended else 0
+        if n_old == 0:
+            self.Z_ = self._inducing_points(X, y)
+            self._Lz = _cholesky(self.kernel_(self.Z_), jitter=1e-8)
+            self._S, self._r, self._s = 0.0, 0.0, 0.0
+        X_new, y_new = X[n_old:], y[n_old:]
+        if len(X_new): # Statistics of V = Lz⁻¹ Kzn (inducing points are fixed, so Lz is too)
+            V = solve_triangular(self._Lz, self.kernel_(self.Z_, X_new), lower=True, check_finite=False)
+            self._S = self._S + V @ V.T # V Vᵀ
+            self._r = self._r + V @ y_new # V y
+            self._s = self._s + V.sum(axis=1) # V 1
+        # Σ⁻¹ = Kzz + σ⁻² Kzn Knz = Lz (I + σ⁻² V Vᵀ) Lzᵀ: the inner matrix is at least the identity, so its factor
+        # needs no jitter however large σ⁻² V Vᵀ is
+        self._Lb = _cholesky(np.eye(len(self.Z_)) + self._S / self.alpha)
+        b = (self._r - self._y_mean * self._s) / self._y_std # V y (normalised)
+        c = cho_solve((self._Lb, True), b, check_finite=False)
+        self.alpha_ = solve_triangular(self._Lz.T, c, lower=False, check_finite=False) / self.alpha
+        self.sparse_ = True
+
+    # >> Prediction <<
+    def predict(self, X, return_std=False, return_cov=False):
+        X = np.asarray(X, dtype=np.float64)
+        if self.sparse_:
+            Kxz = self.kernel_(X, self.Z_)
+            mean = Kxz @ self.alpha_
+            if return_std or return_cov:
+                Vz = solve_triangular(self._Lz, Kxz.T, lower=True, check_finite=False) # Kzz⁻¹ via Lz
+                Vm = solve_triangular(self._Lb, Vz, lower=True, check_finite=False) # Σ via Lz Lb
+        else:
+            Kxn = self.kernel_(X, self.X_train_)
+            mean = Kxn @ self.alpha_
+            if return_std or return_cov:
+                V = solve_triangular(self.L_, Kxn.T, lower=True, check_finite=False)
+        mean = mean * self._y_std + self._y_mean
+        if return_cov:
+            cov = self.kernel_(X) - (Vz.T @ Vz - Vm.T @ Vm if self.sparse_ else V.T @ V)
+            return mean, cov * self._y_std**2
+        if return_std:
+            var = self.kernel_.diag(X) - (np.sum(Vz**2, axis=0) - np.sum(Vm**2, axis=0) if self.sparse_ else
+                                          np.sum(V**2, axis=0))
+            return mean, np.sqrt(np.maximum(var, 0.0)) * self._y_std
+        return mean
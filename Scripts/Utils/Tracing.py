@@ -0,0 +1,143 @@
+from .Enum import Color as C
+
+import os, json, time, functools, threading, numpy as np
+from contextlib import nullcontext
+
+_NULL = nullcontext() # Reusable, returned by 'span' while tracing is disabled
+_tracer = None # Active Tracer, see 'enable'
+
+class Tracer():
+    """
+    Collects timed spans (phases) of the optimisation pipeline, e.g. patching the Case (Def)inition, waiting for the
+    solver, copying or parsing measurements, scoring and plotting. Spans of concurrent trials are kept apart by thread.
+    Exported as Chrome trace-event JSON (open in chrome://tracing or https://ui.perfetto.dev) and summarised per phase.
+    Spans only cover this process: figures rendered by worker processes appear as their (queueing) call only.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.threads = {}
+        self._origin = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    def _record(self, name, start, end, args):
+        thread = threading.current_thread()
+        event = dict(name=name, cat=name.split(".")[0], ph="X", pid=os.getpid(), tid=thread.ident,
+                     ts=(start - self._origin) / 1e3, dur=(end - start) / 1e3) # Microseconds
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+            self.threads.setdefault(thread.ident, thread.name)
+
+    class _Span():
+        __slots__ = ("tracer", "name", "args", "start")
+
+        def __init__(self, tracer, name, args):
+            self.tracer, self.name, self.args = tracer, name, args
+
+        def __enter__(self):
+            self.start = time.perf_counter_ns()
+            return self
+
+        def __exit__(self, exc_type, exc_value, traceback):
+            if exc_type is not None:
+                self.args = {**self.args, "error": exc_type.__name__}
+            self.tracer._record(self.name, self.start, time.perf_counter_ns(), self.args)
+
+    def span(self, name, **args):
+        """Context manager timing the enclosed block as phase 'name' (e.g. 'solver.wait'), 'args' are kept with it"""
+        return Tracer._Span(self, name, args)
+
+    def to_chrome(self, path):
+        """Writes all spans as Chrome trace-event JSON. Returns (Path): 'path'"""
+        with self._lock:
+            events, threads = list(self.events), dict(self.threads)
+        meta = [dict(name="thread_name", ph="M", pid=os.getpid(), tid=tid, args=dict(name=name))
+                for tid, name in threads.items()]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms"}, f)
+        return path
+
+    def summary(self, total="trial"):
+        """Time spent in every phase, longest first.
+        total (str): Phase whose summed duration is 100%, e.g. a whole trial [Default: 'trial', else the trace's span]
+        Returns (list): One dictionary per phase (count, total/mean/median/p95/max seconds and share of 'total')"""
+        with self._lock:
+            events = list(self.events)
+        durations = {}
+        for event in events:
+            durations.setdefault(event["name"], []).append(event["dur"] / 1e6)
+        if total in durations:
+            reference = sum(durations[total])
+        else:
+            reference = (max([e["ts"] + e["dur"] for e in events], default=0) -
+                         min([e["ts"] for e in events], default=0)) / 1e6
+        rows = []
+        for name, values in durations.items():
+            values = np.asarray(values)
+            rows.append(dict(phase=name, count=len(values), total=float(values.sum()), mean=float(values.mean()),
+                             median=float(np.median(values)), p95=float(np.percentile(values, 95)),
+                             max=float(values.max()), share=float(values.sum() / reference) if reference > 0 else None))
+        return sorted(rows, key=lambda row: -row["total"])
+
+    def format_summary(self, total="trial"):
+        """Returns (str): 'summary' as a table, times in milliseconds"""
+        rows = self.summary(total=total)
+        if not rows:
+            return "No spans recorded"
+        width = max(len("Phase"), *[len(row["phase"]) for row in rows])
+        lines = [f"{C.BOLD}{'Phase':<{width}} {'Count':>6} {'Total':>10} {'Mean':>10} {'Median':>10} {'P95':>10} " +
+                 f"{'Max':>10} {'Share':>7}{C.END}"]
+        for row in rows:
+            lines.append(f"{row['phase']:<{width}} {row['count']:>6} " +
+                         " ".join([f"{1e3 * row[k]:>10.1f}" for k in ["total", "mean", "median", "p95", "max"]]) +
+                         (f" {100.0 * row['share']:>6.1f}%" if row["share"] is not None else f" {'-':>7}"))
+        return "\n".join(lines)
+
+    def write_summary(self, path, total="trial"):
+        """Writes 'summary' as CSV (times in seconds). Returns (Path): 'path'"""
+        rows = self.summary(total=total)
+        with open(path, "w") as f:
+            f.write("Phase,Count,Total (s),Mean (s),Median (s),P95 (s),Max (s),Share")
+            for row in rows:
+                f.write(f"\n{row['phase']}," + ",".join([f"{row[k]}" for k in
+                                                         ["count", "total", "mean", "median", "p95", "max", "share"]]))
+        return path
+
+def enable(tracer=None):
+    """Starts tracing into 'tracer' [Default: None, a new Tracer]. Returns (Tracer): The active tracer"""
+    global _tracer
+    _tracer = tracer if tracer is not None else Tracer()
+    return _tracer
+
+def disable():
+    """Stops tracing. Returns (Tracer): The tracer that was active, if any"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+def active():
+    """Returns (Tracer): The active tracer, None while tracing is disabled"""
+    return _tracer
+
+def span(name, **args):
+    """Times the enclosed block as phase 'name' if tracing is enabled, otherwise does (almost) nothing:
+        with span("solver.wait", batch=3):
+            ..."""
+    tracer = _tracer
+    return _NULL if tracer is None else tracer.span(name, **args)
+
+def traced(name=None):
+    """Decorator timing every call of a function as phase 'name' [Default: None, the function's name]"""
+    def decorator(fn):
+        phase = name or fn.__name__
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return fn(*args, **kwargs)
+            with tracer.span(phase):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
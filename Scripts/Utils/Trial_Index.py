@@ -0,0 +1,256 @@
+from .Enum import Color as C, CommonDirs
+from .Params import SimParam, legacy_slug
+from .Journal import TrialJournal, JOURNAL_SUFFIX
+
+import re, json, sqlite3, threading, pandas as pd
+from pathlib import Path
+
+INDEX_PATH = CommonDirs.LOGS / "Trial_Index.sqlite"
+TRIAL_COLUMNS = ["session_id", "session_name", "case_name", "batch", "state", "error", "target", "metric", "pruned",
+                 "duration", "resolution", "run_time", "started", "finished", "peak_ram_mb", "mean_cpu_percent",
+                 "peak_cpu_percent", "peak_gpu_percent", "peak_gpu_memory_mb", "measure_dir", "log_path", "source"]
+RESOURCE_COLUMNS = ["peak_ram_mb", "mean_cpu_percent", "peak_cpu_percent", "peak_gpu_percent", "peak_gpu_memory_mb"]
+OPERATORS = ["<=", ">=", "==", "!=", "<", ">", "="]
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+    trial_id TEXT PRIMARY KEY, session_id TEXT, session_name TEXT, case_name TEXT, batch INTEGER, state TEXT,
+    error TEXT, target REAL, metric TEXT, pruned INTEGER, duration REAL, resolution REAL, run_time REAL,
+    started TEXT, finished TEXT, peak_ram_mb REAL, mean_cpu_percent REAL, peak_cpu_percent REAL,
+    peak_gpu_percent REAL, peak_gpu_memory_mb REAL, measure_dir TEXT, log_path TEXT, source TEXT);
+CREATE TABLE IF NOT EXISTS params (
+    trial_id TEXT NOT NULL REFERENCES trials(trial_id) ON DELETE CASCADE, slug TEXT NOT NULL,
+    name TEXT COLLATE NOCASE, value, PRIMARY KEY (trial_id, slug));
+CREATE INDEX IF NOT EXISTS trials_case_target ON trials(case_name, target DESC);
+CREATE INDEX IF NOT EXISTS trials_session ON trials(session_id, batch);
+CREATE INDEX IF NOT EXISTS params_name_value ON params(name, value);
+"""
+
+def param_name(key):
+    """Short, queryable name of an optimiser parameter: the secondary key's value (e.g. 'Visco'), else
+    '<tag>.<attribute>', with '[count]' if the tag is not the first match. Other keys (e.g. 'Fidelity') and legacy
+    slugs (see 'Params.legacy_slug') are their own name."""
+    if "::" not in key or legacy_slug(key):
+        return key
+    param = SimParam.from_slug(key)
+    name = param.sec_key[1] if param.sec_key[1] is not None else f"{param.id.split('/')[-1]}.{param.attr}"
+    return name + (f"[{param.count}]" if param.count else "")
+
+def parse_condition(condition):
+    """'<name> <operator> <value>' (e.g. 'Visco < 0.02') or a (name, operator, value) tuple, as a 3-tuple"""
+    if not isinstance(condition, str):
+        name, op, value = condition
+    else:
+        match = re.fullmatch(r"\s*([^<>=!\s]+)\s*(" + "|".join(map(re.escape, OPERATORS)) + r")\s*(\S.*?)\s*", condition)
+        if match is None:
+            raise ValueError(f"Cannot parse condition '{condition}', expected e.g. 'Visco < 0.02'")
+        name, op, value = match.groups()
+        try:
+            value = float(value)
+        except ValueError:
+            value = value.strip("'\"")
+    if op not in OPERATORS:
+        raise ValueError(f"Unknown operator '{op}', choose from {OPERATORS}")
+    return name, "=" if op == "==" else op, value
+
+class TrialIndex():
+    """
+    SQLite index of every trial of every session: parameters, target, run time, resource usage and the paths of its
+    measurements and logs. Concurrent sessions and trials may write (WAL mode), keep it on a local disk.
+
+    path (Path): Database file, created if needed [Default: INDEX_PATH]
+    timeout (float): Seconds a write waits for the database to be unlocked [Default: 30.0]
+    """
+
+    def __init__(self, path=INDEX_PATH, timeout=30.0):
+        self.path = Path(path)
+        self.timeout = timeout
+        self._local = threading.local() # sqlite3 connections may not be shared between threads
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL") # Persistent, readers do not block writers
+            conn.execute("PRAGMA synchronous=NORMAL") # Safe in WAL mode, only the latest commits may be lost
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    # >> Writing <<
+    def _record(self, conn, trial_id, params, fields):
+        unknown = [key for key in fields if key not in TRIAL_COLUMNS]
+        if unknown:
+            raise KeyError(f"Unknown trial field(s) {unknown}, choose from {TRIAL_COLUMNS}")
+        columns = ["trial_id"] + list(fields)
+        update = ", ".join(f"{col}=excluded.{col}" for col in fields) if fields else None
+        sql = (f"INSERT INTO trials ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) " +
+               (f"ON CONFLICT(trial_id) DO UPDATE SET {update}" if update else "ON CONFLICT(trial_id) DO NOTHING"))
+        conn.execute(sql, [trial_id] + [json.dumps(v) if isinstance(v, (dict, list)) else v for v in fields.values()])
+        if params is not None:
+            conn.execute("DELETE FROM params WHERE trial_id = ?", (trial_id,))
+            conn.executemany("INSERT INTO params (trial_id, slug, name, value) VALUES (?, ?, ?, ?)",
+                             [(trial_id, key, param_name(key), value) for key, value in params.items()])
+
+    def record(self, trial_id, params=None, **fields):
+        """Adds a trial, or updates the given fields of a recorded trial (other fields are kept).
+        params (dict): Optimiser parameters (slugs or names) mapped to values, replacing those recorded [Default: None]
+        fields (kwargs): Columns of TRIAL_COLUMNS"""
+        with self._connection() as conn: # One transaction
+            self._record(conn, trial_id, params, fields)
+
+    def record_many(self, trials):
+        """Records (trial_id, params, fields) 3-tuples in a single transaction, e.g. when backfilling"""
+        with self._connection() as conn:
+            for trial_id, params, fields in trials:
+                self._record(conn, trial_id, params, fields)
+
+    def remove(self, trial_ids):
+        with self._connection() as conn:
+            conn.executemany("DELETE FROM trials WHERE trial_id = ?", [(trial_id,) for trial_id in trial_ids])
+
+    # >> Querying <<
+    def query(self, case=None, session=None, state="completed", where=(), order="target DESC", limit=None,
+              legacy=False):
+        """
+        Trials matching all the given criteria.
+        case (str): Case name [Default: None, any]
+        session (str): Session ID or contract name [Default: None, any]
+        state (str): Trial state, e.g. 'completed' or 'failed' [Default: 'completed', None for any]
+        where (list): Conditions on parameters, e.g. ['Visco < 0.02', ('CFLnumber', '>=', 0.2)], see 'param_name'
+        order (str): Column of TRIAL_COLUMNS to sort by, optionally followed by 'ASC' or 'DESC' [Default: 'target DESC']
+        limit (int): Largest number of trials returned [Default: None, all]
+        legacy (bool): Include trials of logs whose parameters were written to the wrong XML nodes (source 'legacy',
+            see 'backfill') [Default: False]
+        Returns (list): Dictionaries of trial fields, with 'params' mapping parameter names to values
+        """
+        clauses, args = [], []
+        if case is not None:
+            clauses.append("t.case_name = ?"); args.append(case)
+        if session is not None:
+            clauses.append("(t.session_id = ? OR t.session_name = ?)"); args += [session, session]
+        if state is not None:
+            clauses.append("t.state = ?"); args.append(state)
+        if not legacy:
+            clauses.append("t.source IS NOT 'legacy'")
+        for condition in ([where] if isinstance(where, str) else where):
+            name, op, value = parse_condition(condition)
+            clauses.append(f"EXISTS (SELECT 1 FROM params p WHERE p.trial_id = t.trial_id AND p.name = ? AND p.value {op} ?)")
+            args += [name, value]
+        column, _, direction = order.partition(" ")
+        if column not in TRIAL_COLUMNS + ["trial_id"] or direction.strip().upper() not in ["", "ASC", "DESC"]:
+            raise ValueError(f"Cannot order by '{order}', choose a column from {TRIAL_COLUMNS}")
+        sql = ("SELECT t.*, (SELECT json_group_object(p.name, p.value) FROM params p WHERE p.trial_id = t.trial_id) "
+               "AS params FROM trials t" + (" WHERE " + " AND ".join(clauses) if clauses else "") +
+               f" ORDER BY t.{column} IS NULL, t.{column} {direction.strip().upper()}" + # Missing values last
+               (" LIMIT ?" if limit is not None else ""))
+        rows = self._connection().execute(sql, args + ([int(limit)] if limit is not None else [])).fetchall()
+        return [{**dict(row), "params": json.loads(row["params"] or "{}")} for row in rows]
+
+    def best(self, n=20, **criteria):
+        """The 'n' trials with the highest target, see 'query' for the criteria.
+        E.g. index.best(20, case="Flume", where=["Visco < 0.02"])"""
+        return self.query(order="target DESC", limit=n, **criteria)
+
+    def to_frame(self, **criteria):
+        """Returns (DataFrame): Matching trials (see 'query'), one column per parameter name"""
+        trials = self.query(**criteria)
+        return pd.DataFrame([{**{k: v for k, v in trial.items() if k != "params"}, **trial["params"]} for trial in trials])
+
+    def sessions(self):
+        """Returns (list): Number of trials, best target and time span of every session"""
+        rows = self._connection().execute(
+            "SELECT session_id, session_name, case_name, COUNT(*) AS trials, MAX(target) AS best, "
+            "MIN(started) AS started, MAX(finished) AS finished FROM trials GROUP BY session_id ORDER BY started").fetchall()
+        return [dict(row) for row in rows]
+
+    def param_names(self, case=None):
+        """Returns (list): Names of the parameters recorded (for a case), usable in 'where' conditions"""
+        sql = "SELECT DISTINCT p.name FROM params p JOIN trials t ON t.trial_id = p.trial_id " + \
+              "WHERE t.source IS NOT 'legacy'" + (" AND t.case_name = ?" if case is not None else "")
+        return sorted(row[0] for row in self._connection().execute(sql, [case] if case is not None else []))
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM trials").fetchone()[0]
+
+# >> Backfilling from the logs of earlier sessions <<
+LOG_SUFFIX = "_OPTIMIZATION_LOG.json"
+SESSION_ID = r"\d\d_\d\d_\d{4}_\d\dh_\d\dm_\d\ds" # datetime format of Study.session_id
+
+def _resource_summaries(path):
+    """Per trial summary of a '<session_id>-<contract>-RESOURCE_LOG.csv', keyed on batch number"""
+    df = pd.read_csv(path)
+    summaries = {}
+    for batch, samples in df.groupby("Batch Number"):
+        summary = {"run_time": float(samples["Time (s)"].max()), "peak_ram_mb": float(samples["RAM Usage(MB)"].max()),
+                   "mean_cpu_percent": float(samples["CPU (%)"].mean()), "peak_cpu_percent": float(samples["CPU (%)"].max())}
+        if "GPU (%)" in samples and samples["GPU (%)"].notna().any():
+            summary["peak_gpu_percent"] = float(samples["GPU (%)"].max())
+            summary["peak_gpu_memory_mb"] = float(samples["GPU Memory Used (MB)"].max())
+        summaries[int(batch)] = summary
+    return summaries
+
+def _measure_dirs(session_dir):
+    """'<case>-<timestamp>-Batch<n>' directories of a session, keyed on batch number"""
+    dirs = {}
+    for path in session_dir.iterdir() if session_dir.is_dir() else []:
+        match = re.fullmatch(r"(.+)-[^-]+-Batch(\d+)", path.name)
+        if path.is_dir() and match:
+            dirs[int(match.group(2))] = {"case_name": match.group(1), "measure_dir": str(path)}
+    return dirs
+
+def backfill(index, logs_dir=CommonDirs.LOGS, measures_dir=CommonDirs.MEASURES, overwrite=False, verbose=True):
+    """
+    Indexes the trials of earlier sessions from their optimisation logs, journals, resource logs and measurement
+    directories. Without a journal, the n-th line of a log is taken as batch n; trials of legacy logs (see
+    'Params.legacy_slug') are indexed with source 'legacy', see 'query'.
+    index (TrialIndex): Index to fill
+    overwrite (bool): Replace trials that are already indexed [Default: False, skip them]
+    Returns (int): Number of trials recorded
+    """
+    logs_dir, measures_dir = Path(logs_dir), Path(measures_dir)
+    existing = dict(index._connection().execute("SELECT trial_id, source FROM trials").fetchall())
+    trials = []
+    for log in sorted(logs_dir.glob(f"*{LOG_SUFFIX}")):
+        stem = log.name[:-len(LOG_SUFFIX)]
+        match = re.fullmatch(f"({SESSION_ID})_(.+)", stem)
+        session_id, session_name = match.groups() if match else (stem.split("_")[0], stem.split("_", 1)[-1])
+        journal = {trial["trial"]: trial for trial in TrialJournal(logs_dir / (stem + JOURNAL_SUFFIX)).trials().values()}
+        resources = _resource_summaries(logs_dir / f"{session_id}-{session_name}-RESOURCE_LOG.csv") \
+                    if (logs_dir / f"{session_id}-{session_name}-RESOURCE_LOG.csv").exists() else {}
+        measures = _measure_dirs(measures_dir / f"{session_name}-{session_id}")
+        with open(log, "r") as f:
+            steps = [json.loads(line) for line in f if line.strip()]
+        legacy = any(legacy_slug(key) for step in steps for key in step["params"])
+        common = dict(session_id=session_id, session_name=session_name, log_path=str(log),
+                      source="legacy" if legacy else "backfill")
+        journaled = {json.dumps(trial.get("params"), sort_keys=True) for trial in journal.values()}
+        for i, step in enumerate(steps):
+            if journal: # Journaled trials are indexed below, with their actual batch numbers
+                if json.dumps(step["params"], sort_keys=True) in journaled:
+                    continue
+                trial_id, batch = f"{stem}-Log{i}", None
+            else:
+                trial_id, batch = (f"{session_id}-Batch{i}", i) if match else (f"{stem}-Log{i}", None)
+            fields = dict(common, state="completed", target=step["target"], batch=batch,
+                          finished=step.get("datetime", {}).get("datetime"))
+            trials.append((trial_id, step["params"], {**fields, **resources.get(batch, {}), **measures.get(batch, {})}))
+        for trial_id, trial in journal.items():
+            if trial["state"] not in ["completed", "failed"] or "params" not in trial:
+                continue
+            batch = trial.get("batch")
+            fields = dict(common, state=trial["state"], target=trial.get("target"), error=trial.get("error"),
+                          batch=batch, duration=trial.get("duration"), resolution=trial.get("resolution"),
+                          pruned=trial.get("pruned"), finished=trial.get("time"), measure_dir=trial.get("measure_dir"))
+            trials.append((trial_id, trial["params"], {**fields, **resources.get(batch, {}),
+                                                      **{k: v for k, v in measures.get(batch, {}).items() if k == "case_name"}}))
+    # Legacy trials indexed by earlier versions (under the names of the wrong parameters) are always replaced
+    trials = [trial for trial in trials if overwrite or trial[0] not in existing or
+              (trial[2]["source"] == "legacy" and existing[trial[0]] != "legacy")]
+    index.record_many(trials)
+    if verbose:
+        print(f"{C.BOLD}{C.GREEN}Info{C.END} Indexed {len(trials)} trial(s) from {logs_dir}")
+    return len(trials)
@@ -0,0 +1,276 @@
+from .Enum import Color as C
+
+import os, json, time, uuid, shutil, socket, threading
+from pathlib import Path
+
+STATES = ["pending", "leased", "done"] # One subdirectory each, plus 'results/' for the trials' measurements
+
+class RemoteTrialFailed(Exception):
+    """Raised by 'WorkQueue.run' when a trial failed on a worker, or was abandoned by too many workers"""
+    def __init__(self, trial_id, error):
+        super().__init__(f"Trial {trial_id} failed remotely: {error}")
+        self.trial_id, self.error = trial_id, error
+
+def _write_json(path, data):
+    """Writes JSON next to 'path' first, then renames it into place: readers never see a partial file"""
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+    with open(tmp, "w") as f:
+        json.dump(data, f, default=str)
+    os.replace(tmp, path)
+
+def _create_json(path, data, tag):
+    """Writes JSON to 'path' only if nothing is there yet (atomic create-if-absent, also over NFS).
+    Returns (bool): False if 'path' already existed, it is left unchanged"""
+    tmp = path.with_name(f".{path.name}.{tag}")
+    with open(tmp, "w") as f:
+        json.dump(data, f, default=str)
+    try:
+        os.link(tmp, path)
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        os.unlink(tmp)
+
+def _take(path):
+    """Takes sole ownership of a leased file by renaming it to a private name next to it, which no other coordinator,
+    worker or 'claim' can reach. Returns (Path): The private file, None if another process moved 'path' first"""
+    private = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+    try:
+        os.rename(path, private) # Atomic: exactly one process takes it
+    except FileNotFoundError:
+        return None
+    return private
+
+def _give_back(private, path):
+    """Returns a file taken by '_take' unchanged, unless 'path' was written again meanwhile (that version is newer)"""
+    try:
+        os.link(private, path)
+    except FileExistsError:
+        pass
+    finally:
+        os.unlink(private)
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError): # Moved (claimed, requeued) in the meantime
+        return None
+
+class Lease():
+    """A worker's claim on one trial, kept alive by 'renew' (see 'WorkQueue.claim')"""
+
+    def __init__(self, queue, trial_id, item, token):
+        self.queue, self.trial_id, self.item, self.token = queue, trial_id, item, token
+        self.path = queue.path / "leased" / f"{trial_id}.json"
+        self.results_dir = queue.path / "results" / f"{trial_id}-{token}" # Private, in case the lease is lost
+
+    def renew(self):
+        """Extends the lease. Returns (bool): False if it expired and the trial was handed to another worker"""
+        data = _read_json(self.path)
+        if data is None or data.get("lease", {}).get("token") != self.token:
+            return False
+        try:
+            os.utime(self.path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def keep_alive(self, interval=None):
+        """Renews the lease every 'interval' seconds (a third of the lease) on a daemon thread.
+        Returns (threading.Event): Set it to stop renewing"""
+        stop = threading.Event()
+        interval = interval or self.queue.lease / 3.0
+        def beat():
+            while not stop.wait(interval):
+                if self.renew():
+                    continue
+                if stop.wait(1.0): # Briefly missing while a coordinator checks whether it expired, try once more
+                    return
+                if not self.renew():
+                    print(f"{C.BOLD}{C.RED}Warning{C.END}: Lost the lease of trial {self.trial_id}")
+                    return
+        threading.Thread(target=beat, name=f"Lease-{self.trial_id}", daemon=True).start()
+        return stop
+
+class WorkQueue():
+    """
+    Trials shared between one coordinator (the optimiser) and any number of workers, through a directory on a file
+    system they all mount (e.g. NFS, SMB). Needs no server: every transition is an atomic rename.
+        pending/<trial>.json : Published by the coordinator, waiting for a worker
+        leased/<trial>.json  : Claimed by a worker, which touches it regularly while the trial runs
+        done/<trial>.json    : Result (target, run time, ...) or error, read and removed by the coordinator
+        results/<trial>-<lease>/ : The trial's measurements, moved to the coordinator's Measures/ once done
+    A lease that is not renewed for 'lease' seconds (the worker died, or lost its connection) expires, and its trial is
+    dispatched again, at most 'max_attempts' times. Expiry is judged against the file system's clock, not the hosts'.
+    A late result of an expired lease is still accepted if it arrives first, results of one trial are interchangeable.
+
+    path (Path): Queue directory, created if needed
+    lease (float): Seconds without renewal after which a lease expires [Default: 120]
+    max_attempts (int): Dispatches of a trial before it is failed [Default: 3]
+    """
+
+    def __init__(self, path, lease=120.0, max_attempts=3):
+        self.path = Path(path)
+        self.lease, self.max_attempts = lease, max_attempts
+        for state in STATES + ["results"]:
+            (self.path / state).mkdir(parents=True, exist_ok=True)
+
+    def _now(self):
+        """Current time of the file system holding the queue (it sets the mtimes, so expiry ignores host clock skew)"""
+        clock = self.path / ".clock"
+        clock.touch()
+        return clock.stat().st_mtime
+
+    # >> Coordinator <<
+    def submit(self, trial_id, item):
+        """Publishes a trial. 'item' (JSON-serialisable dict) is handed to the worker as it is"""
+        _write_json(self.path / "pending" / f"{trial_id}.json",
+                    {"trial_id": trial_id, "attempt": 0, "lease_seconds": self.lease, **item})
+
+    def requeue_expired(self, verbose=True):
+        """Hands trials whose lease expired back to the workers, or fails them after 'max_attempts'.
+        Returns (list): IDs of the requeued trials"""
+        now, requeued = self._now(), []
+        for path in (self.path / "leased").glob("*.json"):
+            try:
+                if now - path.stat().st_mtime < self.lease:
+                    continue
+            except FileNotFoundError: # Finished in the meantime
+                continue
+            # Owned before it is changed: a worker claiming the requeued trial gets a new file at 'path', which must
+            # never be removed here (nor may two coordinator threads requeue the same lease twice)
+            private = _take(path)
+            if private is None: # Finished, or requeued by another thread
+                continue
+            if now - private.stat().st_mtime < self.lease: # Renewed just before it was taken, hand it back
+                _give_back(private, path)
+                continue
+            item = _read_json(private)
+            if item is None:
+                os.unlink(private)
+                continue
+            trial_id, lease = item["trial_id"], item.pop("lease", {})
+            if item["attempt"] >= self.max_attempts:
+                _create_json(self.path / "done" / f"{trial_id}.json", {"trial_id": trial_id, "error": # Unless it
+                             f"Lease expired {item['attempt']} time(s), last held by {lease.get('worker')}"}, # finished
+                             uuid.uuid4().hex)
+                os.unlink(private)
+            else:
+                _write_json(private, item)
+                os.rename(private, self.path / "pending" / f"{trial_id}.json")
+                requeued.append(trial_id)
+            if verbose:
+                print(f"{C.YELLOW}{C.BOLD}WARNING{C.END}::Lease of trial {trial_id} held by {lease.get('worker')} " +
+                      f"expired, {'dispatched again' if trial_id in requeued else 'giving up'}")
+        return requeued
+
+    def poll(self, trial_id):
+        """Returns (dict): Result of a finished trial (removed from the queue), None while it is pending or running"""
+        path = self.path / "done" / f"{trial_id}.json"
+        result = _read_json(path)
+        if result is not None:
+            path.unlink()
+        return result
+
+    def run(self, trial_id, item, measure_dir=None, poll=1.0):
+        """Publishes a trial and waits for a worker to finish it, requeueing expired leases meanwhile.
+        measure_dir (Path): Where the trial's measurements are moved to [Default: None, left in 'results/']
+        Returns (dict): Result reported by the worker, see 'serve'"""
+        self.submit(trial_id, item)
+        while (result := self.poll(trial_id)) is None:
+            time.sleep(poll)
+            self.requeue_expired()
+        results = self.path / "results" / result["results"] if result.get("results") else None
+        if result.get("error") is None and measure_dir is not None and results is not None and results.exists():
+            Path(measure_dir).parent.mkdir(parents=True, exist_ok=True)
+            shutil.rmtree(measure_dir, ignore_errors=True)
+            shutil.move(str(results), str(measure_dir))
+        for leftover in (self.path / "results").glob(f"{trial_id}-*"): # Failed, or from workers that lost the lease
+            if results is None or leftover.name != results.name:
+                shutil.rmtree(leftover, ignore_errors=True)
+        if result.get("error") is not None:
+            raise RemoteTrialFailed(trial_id, result["error"])
+        return result
+
+    def counts(self):
+        """Returns (dict): Number of trials in each state"""
+        return {state: len(list((self.path / state).glob("*.json"))) for state in STATES}
+
+    # >> Worker <<
+    def claim(self, worker_id=None):
+        """Takes the oldest pending trial, if any. Returns (Lease): The claim, None if nothing is pending"""
+        worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        pending = sorted((self.path / "pending").glob("*.json"), key=lambda p: p.stat().st_mtime
+                         if p.exists() else float("inf"))
+        for path in pending:
+            leased = self.path / "leased" / path.name
+            item = _read_json(path) # Before it is leased, where a coordinator may hold it briefly (see '_take')
+            if item is None:
+                continue
+            try:
+                os.utime(path) # A fresh mtime, so the lease does not look expired before it is written
+                os.rename(path, leased) # Atomic: exactly one worker wins
+            except FileNotFoundError: # Claimed by another worker first
+                continue
+            token = uuid.uuid4().hex
+            item["attempt"] += 1
+            item["lease"] = {"worker": worker_id, "token": token, "host": socket.gethostname(), "pid": os.getpid()}
+            _write_json(leased, item)
+            return Lease(self, item["trial_id"], item, token)
+        return None
+
+    def complete(self, lease, result):
+        """Reports a trial's result (or {"error": ...}), with the measurements in 'lease.results_dir' if it exists.
+        Returns (bool): False if another worker reported first (these measurements are then discarded)"""
+        first = _create_json(self.path / "done" / f"{lease.trial_id}.json", # The first result wins
+                             {"trial_id": lease.trial_id, "worker": lease.item["lease"]["worker"],
+                              "results": lease.results_dir.name if lease.results_dir.exists() else None, **result},
+                             lease.token)
+        if not first:
+            shutil.rmtree(lease.results_dir, ignore_errors=True)
+        private = _take(lease.path) # Removed only if it is still this lease, not another worker's claim of the trial
+        if private is not None:
+            data = _read_json(private)
+            if data is not None and data.get("lease", {}).get("token") == lease.token:
+                os.unlink(private)
+            else:
+                _give_back(private, lease.path)
+        return first
+
+def serve(queue, execute, worker_id=None, poll=2.0, idle_exit=None, max_trials=None, verbose=True):
+    """
+    Worker loop: claims trials one at a time, keeps their lease alive while 'execute(item, lease)' runs them and
+    reports what it returns (a JSON-serialisable dict, e.g. target and run time) or the error it raises.
+    queue (WorkQueue): Queue to take trials from
+    execute (callable): Runs one trial, may store measurements in 'lease.results_dir'
+    poll (float): Seconds between looking for pending trials while idle [Default: 2.0]
+    idle_exit (float): Stop after this many seconds without work [Default: None, never]
+    max_trials (int): Stop after this many trials [Default: None, never]
+    Returns (int): Number of trials run
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    done, idle_since = 0, time.monotonic()
+    while max_trials is None or done < max_trials:
+        lease = queue.claim(worker_id)
+        if lease is None:
+            if idle_exit is not None and time.monotonic() - idle_since > idle_exit:
+                break
+            time.sleep(poll)
+            continue
+        if verbose:
+            print(f"{C.BOLD}{C.GREEN}Info{C.END} {worker_id} running trial {lease.trial_id} " +
+                  f"(attempt {lease.item['attempt']})")
+        stop = lease.keep_alive(interval=lease.item.get("lease_seconds", queue.lease) / 3.0)
+        try:
+            result = execute(lease.item, lease)
+        except Exception as e:
+            result = {"error": repr(e)}
+            print(f"{C.BOLD}{C.RED}Warning{C.END}: Trial {lease.trial_id} failed ({e!r})")
+        finally:
+            stop.set()
+        if not queue.complete(lease, result) and verbose:
+            print(f"{C.YELLOW}{C.BOLD}WARNING{C.END}::Trial {lease.trial_id} was finished by another worker first")
+        done, idle_since = done + 1, time.monotonic()
+    return done
@@ -0,0 +1,102 @@
+from .Enum import Color as C
+
+import os, sys, shutil, subprocess, weakref, psutil as ps
+
+WORKSPACE_PREFIX = "." # Hidden, so workspaces are not offered as Cases
+OWNER_FILE = ".owner"
+
+def link_or_copy(src, dst):
+    """Places a (large, read-only) file at 'dst' as cheaply as the filesystem allows.
+    Tries a hardlink first, then a copy-on-write reflink, and only then falls back to a full copy."""
+    try:
+        os.link(src, dst)
+        return dst
+    except OSError:
+        pass
+    if sys.platform.startswith("linux"):
+        if subprocess.run(["cp", "--reflink=always", str(src), str(dst)],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0:
+            return dst
+    return shutil.copy2(src, dst)
+
+class TrialWorkspace():
+    """
+    Private, lightweight copy of a Case directory in which a single trial can be simulated.
+    Static inputs (e.g. casedata.dsphdata, materials.xml, .FCStd, launch scripts) are hardlinked (or reflinked), the
+    Case (Def)inition is written fresh and the solver's '<case>_out' directory is private to the trial.
+    The workspace is a sibling of the Case directory, so relative paths in the launch scripts remain valid.
+    Removed automatically on exit of the 'with' block, or when the object is garbage collected.
+
+    case_def (Path): Path to the Case (Def)inition XML of the original case
+    case_name (str): Name of the case (also name of its directory)
+    trial_id (str): Unique identifier of the trial, used in the workspace's directory name
+    keep (bool): Do not remove the workspace when done, e.g. for debugging or reattaching later [Default: False]
+    """
+
+    def __init__(self, case_def, case_name, trial_id, keep=False):
+        self.case_path = case_def.parent
+        self.case_name = case_name
+        self.trial_id = trial_id
+        self.keep = keep
+        self.path = self.case_path.parent / f"{WORKSPACE_PREFIX}{case_name}-{trial_id}"
+        self.case_def = self.path / case_def.name
+        self.out_path = self.path / f"{case_name}_out"
+        self._finalizer = None
+
+    def create(self):
+        """Populates the workspace with links to the Case's static inputs"""
+        if self.path.exists():
+            shutil.rmtree(self.path)
+        self.path.mkdir(parents=True)
+        (self.path / OWNER_FILE).write_text(str(os.getpid()))
+        for item in self.case_path.iterdir():
+            if item.name == f"{self.case_name}_out" or item.name == self.case_def.name or "backup" in item.name:
+                continue # Outputs are private to the trial, Case (Def)inition is written per trial
+            if item.is_dir():
+                shutil.copytree(item, self.path / item.name, copy_function=link_or_copy, symlinks=True)
+            else:
+                link_or_copy(item, self.path / item.name)
+        if not self.keep:
+            self._finalizer = weakref.finalize(self, shutil.rmtree, str(self.path), True)
+        return self
+
+    def write_case(self, tree):
+        """Writes the (patched) XML Element Tree, or a rendered Case (Def)inition (bytes, see 'CaseTemplate'),
+        as this workspace's Case (Def)inition"""
+        if isinstance(tree, bytes):
+            self.case_def.write_bytes(tree)
+        else:
+            tree.write(self.case_def, method="xml")
+
+    def cleanup(self):
+        """Removes the workspace and everything the trial produced inside it"""
+        if self._finalizer is not None:
+            self._finalizer()
+        elif not self.keep:
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self.create()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+
+def find_workspaces(case_path, case_name):
+    """Lists all trial workspaces that were created for a specific case"""
+    return [p for p in case_path.parent.glob(f"{WORKSPACE_PREFIX}{case_name}-*") if p.is_dir()]
+
+def remove_stale_workspaces(case_path, case_name, keep=(), verbose=True):
+    """Removes workspaces left behind by crashed sessions (i.e. whose owning process no longer exists)
+    keep (set): Workspaces to leave in place regardless, e.g. journaled trials that may be recovered [Default: ()]"""
+    removed = []
+    for path in find_workspaces(case_path, case_name):
+        if path in keep:
+            continue
+        owner = path / OWNER_FILE
+        pid = int(owner.read_text()) if owner.exists() and owner.read_text().isdigit() else None
+        if pid is None or not ps.pid_exists(pid):
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(path)
+    if verbose and removed:
+        print(f"{C.YELLOW}{C.BOLD}WARNING{C.END}::Removed {len(removed)} stale workspace(s) of case '{case_name}'")
+    return removed
@@ -0,0 +1,49 @@
+"""
+Utilities for optimising DualSPHysics simulation hyperparameters.
+Submodules (and the names below) are imported on first use, so e.g. a worker that only runs simulations never loads
+sklearn, bayes_opt or matplotlib:
+    from Utils import run_simulation # Loads Utils.Simulation (and what it needs) only
+"""
+import importlib
+
+# Name -> submodule defining it
+_EXPORTS = {
+    "CommonDirs": "Enum",
+    "CaseInfo": "Optimization",
+    "HyperParameters": "Params", "SimParam": "Params", "ParamSpace": "Params",
+    "parse_case": "Case_Handling", "swap_params": "Case_Handling", "update_case_file": "Case_Handling",
+    "find_simulation_parameters": "Case_Handling",
+    "CaseTemplate": "Bindings",
+    "TrialWorkspace": "Workspace",
+    "run_simulation": "Simulation",
+    "ingest_measurements": "Storage", "read_header": "Storage", "MeasurementTable": "Storage",
+    "METRICS": "Scoring", "ALIGNED_METRICS": "Scoring", "load_simulated": "Scoring", "score_trial": "Scoring",
+    "extract_points": "Post_Processing", "sim_real_difference": "Post_Processing",
+    "plot_series": "Rendering", "comparison_series": "Rendering", "render_comparison": "Rendering",
+    "RenderQueue": "Rendering",
+    "span": "Tracing", "Tracer": "Tracing",
+    "Study": "Study", "study_settings": "Study",
+    "TrialIndex": "Trial_Index",
+    "WorkQueue": "Work_Queue", "serve": "Work_Queue",
+    "CoreScheduler": "Scheduler",
+    "CostModel": "Cost_Model", "CostAwareUtility": "Cost_Model",
+}
+_MODULES = ["Async_Runner", "Bindings", "Cache", "Case_Handling", "Cost_Model", "Design", "Enum", "Fidelity",
+            "Interaction", "Journal", "Monitoring", "Optimization", "Params", "Post_Processing", "Pruning",
+            "Real_Data", "Rendering", "Scheduler", "Scoring", "Simulation", "Storage", "Study", "Surrogate",
+            "Tracing", "Trial_Index", "Work_Queue", "Workspace"]
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    elif name in _MODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    globals()[name] = value # Later lookups skip this function
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__ + _MODULES)
@@ -10,10 +10,11 @@ if str(script_path) not in sys.path:
 
 from Utils.Interaction import choose_run_and_metric
 from Utils.Post_Processing import extract_points, sim_real_difference, plot_measurement_by_loc
+from Utils.Storage import list_measurements
 
 if __name__ == "__main__":
     measure_dir, file = choose_run_and_metric()
-    measures = {f: batch_no for batch_no, f in enumerate(measure_dir.glob("*.csv"))}
+    measures = {f: batch_no for batch_no, f in enumerate(list_measurements(measure_dir))}
     points, columns = extract_points(file, verbose=False)
     delay=int(input("Delay in time steps"))
     df = sim_real_difference(file, points, method=None,
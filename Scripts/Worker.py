@@ -0,0 +1,145 @@
+import sys, json, socket, argparse
+from pathlib import Path
+
+base_path = Path(__file__).parent.parent
+script_path = base_path / "Scripts"
+if str(script_path) not in sys.path: sys.path.append(str(script_path))
+
+import Utils # Lazy, each role below loads only the modules it uses
+
+# Slow to import, and no role needs them up front (pandas only once a CSV is parsed, matplotlib once a figure is drawn)
+HEAVY = ["sklearn", "scipy", "bayes_opt", "matplotlib", "pandas", "GPUtil"]
+OS = "win64" if sys.platform == "win32" else "linux64"
+
+EXAMPLE = """
+Roles print one JSON line with their result, e.g.:
+  python Worker.py run ../Cases/.Flume-<trial>/Flume_Def.xml -i Default-<session> -b 3   {"duration": 812.4, ...}
+  python Worker.py score Measures/<session>/<trial>/Flume_Vel.csv -m mse mad             {"mse": {"mean": ...}, ...}
+  python Worker.py plot Measures/<session>/<trial>/Flume_Vel.csv -b 3 -o Figure.jpg
+  python Worker.py serve /mnt/shared/Queue                                              Run trials of a coordinator
+  python Worker.py score --imports-only                                                 Modules a role loads
+"""
+
+def run(args):
+    """Simulates a (workspace's) Case (Def)inition and stores its measurements"""
+    case_name = args.case or args.case_def.stem.removesuffix("_Def")
+    resources = {}
+    duration = Utils.run_simulation(args.case_def, case_name, identifier=args.identifier, os=args.os, batch=args.batch,
+                                    verbose=False, on_finish=resources.update, measure_format=args.fmt,
+                                    copy_measurements=not args.no_copy, sudo=not args.no_sudo, device=args.device,
+                                    threads=args.threads, cpus=args.cpus)
+    return dict(duration=duration.total_seconds(), resources=resources)
+
+def score(args):
+    """Scores a trial's measurements against all batches of the real data"""
+    points = Utils.extract_points(args.file, verbose=False)[0]
+    scores, _ = Utils.score_trial(args.file, points, delay=args.delay, metrics=args.metrics, max_lag=args.max_lag)
+    return {metric: {"mean": value["mean"], "var": value["var"]} for metric, value in scores.items()}
+
+def plot(args):
+    """Draws (synchronously) the figure comparing a trial to one batch of the real data"""
+    points = Utils.extract_points(args.file, verbose=False)[0]
+    sim = Utils.load_simulated(args.file, points, delay=args.delay)
+    out = args.out or Path(args.file).parent / "Figure.jpg"
+    Utils.plot_series(Utils.comparison_series(sim, points, batch=args.batch), points, save_path=out,
+                      max_points=args.max_points)
+    return dict(figure=str(out))
+
+def execute(item, lease, fmt="npy"):
+    """Runs one trial taken from a work queue: simulates it in a private workspace of the local copy of its case,
+    stores the measurements in the lease's results directory and scores them as the coordinator's study would"""
+    case_def = Utils.parse_case(Utils.CommonDirs.CASES / item["case_name"])[0]
+    resources = {}
+    with Utils.TrialWorkspace(case_def, item["case_name"], trial_id=f"{item['trial_id']}-{lease.token[:8]}") as ws:
+        ws.write_case(item["xml"].encode())
+        duration = Utils.run_simulation(ws.case_def, item["case_name"], identifier=item["identifier"], os=OS,
+                                        batch=item["batch"], copy_measurements=False, verbose=False,
+                                        on_finish=resources.update, sudo=item["sudo"], device=item.get("device", "GPU"))
+        Utils.ingest_measurements(ws.out_path / "measurements", lease.results_dir, fmt=fmt)
+    file = lease.results_dir / f"{item['case_name']}_Vel.csv"
+    points = Utils.extract_points(file, verbose=False)[0]
+    target = Utils.sim_real_difference(file, points, method=item["metric"], delay=item["delay"], batch=None,
+                                       max_lag=item["max_lag"])
+    return dict(target=target, run_time=duration.total_seconds(), resources=resources, host=socket.gethostname())
+
+def serve(args):
+    """Runs trials published to a work queue (see Utils/Work_Queue.py) until stopped"""
+    queue = Utils.WorkQueue(args.queue)
+    count = Utils.serve(queue, lambda item, lease: execute(item, lease, fmt=args.fmt), worker_id=args.worker,
+                        poll=args.poll, idle_exit=args.idle_exit, max_trials=args.max_trials)
+    return dict(trials=count)
+
+ROLES = {"run": (run, ["run_simulation"]),
+         "score": (score, ["extract_points", "score_trial"]),
+         "plot": (plot, ["extract_points", "load_simulated", "comparison_series", "plot_series"]),
+         "serve": (serve, ["WorkQueue", "serve", "parse_case", "TrialWorkspace", "run_simulation",
+                           "ingest_measurements", "extract_points", "sim_real_difference"])}
+
+def loaded_modules():
+    """Returns (list): Heavy top-level packages imported so far"""
+    return [name for name in HEAVY if name in sys.modules]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='>> Single-purpose worker: run, score or plot one trial <<',
+                                     epilog=EXAMPLE, formatter_class=argparse.RawDescriptionHelpFormatter)
+    roles = parser.add_subparsers(dest="role", required=True)
+    runner = roles.add_parser("run", help="Simulate a Case (Def)inition")
+    runner.add_argument('case_def', type=Path, nargs='?', help="Path to the Case (Def)inition XML, e.g. in a workspace")
+    runner.add_argument('-n', dest="case", type=str, default=None,
+                        help="Case name [Default: from the file name, '<case>_Def.xml']")
+    runner.add_argument('-i', dest="identifier", type=str, default="Default",
+                        help="'<contract>-<session>', names the measurements' directory and resource log " +
+                             "[Default: Default]")
+    runner.add_argument('-b', dest="batch", type=int, default=0, help="Trial (batch) number [Default: 0]")
+    runner.add_argument('--os', dest="os", type=str, default=OS,
+                        choices=["win64", "linux64"], help="Launch script variant [Default: current OS]")
+    runner.add_argument('-d', dest="device", type=str, default="GPU", choices=["GPU", "CPU"],
+                        help="Solver variant, launch script '<case>_<os>_<device>' [Default: GPU]")
+    runner.add_argument('-t', dest="threads", type=int, default=None,
+                        help="OpenMP threads of the CPU solver [Default: the solver's default]")
+    runner.add_argument('--cpus', dest="cpus", type=int, nargs='+', default=None,
+                        help="Logical CPUs the solver is pinned to [Default: any]")
+    runner.add_argument('--no-copy', dest="no_copy", action="store_true", help="Leave the measurements in '<case>_out'")
+    runner.add_argument('--no-sudo', dest="no_sudo", action="store_true", help="Run the launch script without sudo")
+    scorer = roles.add_parser("score", help="Score a trial's measurements")
+    plotter = roles.add_parser("plot", help="Plot a trial against the real data")
+    for role in [scorer, plotter]:
+        role.add_argument('file', type=Path, nargs='?', help="'<case>_Vel.csv' of a trial (or the table it became)")
+        role.add_argument('--delay', dest="delay", type=int, default=600,
+                          help="Time steps skipped before comparing [Default: 600]")
+    scorer.add_argument('-m', dest="metrics", type=str, nargs='+', default=["mse", "mad"],
+                        help="Metrics, see Utils/Scoring.py [Default: mse mad]")
+    scorer.add_argument('--max-lag', dest="max_lag", type=int, default=0,
+                        help="Largest phase shift compensated by aligned metrics [Default: 0]")
+    plotter.add_argument('-b', dest="batch", type=int, default=0, help="Real data batch shown [Default: 0]")
+    plotter.add_argument('-o', dest="out", type=Path, default=None,
+                         help="Figure path [Default: Figure.jpg next to the measurements]")
+    plotter.add_argument('--max-points', dest="max_points", type=int, default=1000,
+                         help="Samples plotted per line [Default: 1000]")
+    server = roles.add_parser("serve", help="Run trials from a work queue shared with a coordinator")
+    server.add_argument('queue', type=Path, nargs='?', help="Queue directory, as given to the coordinator's study")
+    server.add_argument('-w', dest="worker", type=str, default=None, help="Worker name [Default: '<host>-<pid>']")
+    server.add_argument('--poll', dest="poll", type=float, default=2.0,
+                        help="Seconds between looking for trials while idle [Default: 2]")
+    server.add_argument('--idle-exit', dest="idle_exit", type=float, default=None,
+                        help="Stop after this many idle seconds [Default: never]")
+    server.add_argument('-n', dest="max_trials", type=int, default=None,
+                        help="Stop after this many trials [Default: never]")
+    for role in [runner, server]:
+        role.add_argument('-f', dest="fmt", type=str, default="npy", choices=["npy", "npz", "csv"] if role is runner
+                          else ["npy", "npz"], help="How measurements are stored, see Utils/Storage.py [Default: npy]")
+    for role in [runner, scorer, plotter, server]:
+        role.add_argument('--imports-only', dest="imports_only", action="store_true",
+                          help="Only load what the role needs, then print which heavy packages were imported")
+    args = parser.parse_args()
+
+    fn, names = ROLES[args.role]
+    for name in names: # Everything the role needs, before any work (so startup cost is measurable on its own)
+        getattr(Utils, name)
+    if args.imports_only:
+        print(json.dumps(dict(role=args.role, heavy=loaded_modules())))
+        sys.exit(0)
+    required = {"run": "case_def", "score": "file", "plot": "file", "serve": "queue"}[args.role]
+    if getattr(args, required) is None:
+        parser.error(f"the following arguments are required: {required}")
+    print(json.dumps(fn(args), default=str))